@@ -0,0 +1,49 @@
+import json
+import secrets
+from collections.abc import AsyncIterator
+from dataclasses import asdict
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import StreamingResponse
+
+from app.config import settings
+from app.services.cache import cache_service
+
+router = APIRouter()
+
+
+async def require_admin(authorization: str = Header(None)) -> None:
+    """Vérifier le jeton admin (Authorization: Bearer <ADMIN_TOKEN>)."""
+    if not settings.admin_token:
+        raise HTTPException(status_code=404, detail="Not Found")
+    expected = f"Bearer {settings.admin_token}"
+    if not authorization or not secrets.compare_digest(authorization, expected):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+
+@router.delete("/cache", dependencies=[Depends(require_admin)])
+async def purge_cache(
+    pattern: str = Query(..., min_length=1, description="Key pattern, e.g. lyrics:*"),
+    scan_count: int = Query(None, ge=1, le=10000, description="SCAN COUNT hint"),
+    batch_size: int = Query(None, ge=1, le=10000, description="Keys per UNLINK"),
+    rate: float = Query(None, ge=0, description="Max keys deleted per second (0 = unthrottled)"),
+):
+    """
+    Purger les clés de cache correspondant à un pattern.
+
+    La purge est incrémentale (SCAN + UNLINK) et son avancement est streamé
+    en NDJSON, une ligne par lot.
+    """
+    async def progress() -> AsyncIterator[bytes]:
+        try:
+            async for step in cache_service.purge_pattern(
+                pattern,
+                scan_count=scan_count,
+                unlink_batch=batch_size,
+                max_keys_per_second=rate,
+            ):
+                yield (json.dumps(asdict(step)) + "\n").encode()
+        except Exception as e:
+            yield (json.dumps({"error": str(e)}) + "\n").encode()
+
+    return StreamingResponse(progress(), media_type="application/x-ndjson")
@@ -1,9 +1,19 @@
 from fastapi import APIRouter
 
+from app.services.breaker import breakers
+from app.services.cache import cache_service
+from app.services.scheduler import schedulers
+
 router = APIRouter()
 
 
 @router.get("/health")
 async def health_check():
-    """Health check endpoint."""
-    return {"status": "healthy", "service": "lyriks-api"}
+    """Health check endpoint (disjoncteurs et files d'attente upstream inclus)."""
+    return {
+        "status": "healthy",
+        "service": "lyriks-api",
+        "cache": cache_service.stats(),
+        "upstreams": breakers.states(),
+        "outbound": schedulers.states(),
+    }
@@ -1,19 +1,38 @@
-import base64
+from collections.abc import AsyncIterator
+from dataclasses import replace
+
 import httpx
-from fastapi import APIRouter, Query, HTTPException
-from fastapi.responses import Response
+from fastapi import APIRouter, Query, HTTPException, Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from pydantic import BaseModel
+from starlette.types import Receive, Scope, Send
+
+from app.services.http import http_clients
+from app.services.metrics import image_bytes_proxied
+from app.services.image_store import StoredImage, image_store
+from app.services.image_transform import (
+    ImageFit,
+    ImageFormat,
+    ImageVariant,
+    UnsupportedImageError,
+    image_transformer,
+    source_format,
+)
+from app.services.images import (
+    VALID_IMAGE_TYPES,
+    ImageRejectedError,
+    base_content_type,
+    get_data_uri_json,
+    get_image,
+    iter_and_store,
+    open_image,
+)
 
 router = APIRouter()
 
-# Valid image MIME types
-VALID_IMAGE_TYPES = {
-    "image/jpeg",
-    "image/jpg",
-    "image/png",
-    "image/gif",
-    "image/webp",
-    "image/svg+xml",
+CACHE_HEADERS = {
+    "Cache-Control": "public, max-age=86400",
+    "Access-Control-Allow-Origin": "*",
 }
 
 
@@ -23,52 +42,151 @@ class ImageValidationResponse(BaseModel):
     error: str | None = None
 
 
+class UpstreamImageResponse(StreamingResponse):
+    """
+    Relaye le corps upstream chunk par chunk.
+
+    La réponse upstream est toujours fermée : fin normale, dépassement de taille
+    ou déconnexion du client (qui annule le streaming).
+
+    Pas d'`ETag` sur cette réponse : il est dérivé du contenu, connu seulement
+    une fois le corps transmis (l'en-tête est déjà parti). Le navigateur garde
+    l'image `max-age` ; la requête suivante est servie depuis le disque avec
+    son `ETag`, et les revalidations ultérieures répondent 304.
+    """
+
+    def __init__(self, url: str, upstream: httpx.Response, headers: dict[str, str]):
+        self._upstream = upstream
+        super().__init__(
+            self._count(iter_and_store(url, upstream)),
+            media_type=base_content_type(upstream) or "image/jpeg",
+            headers=headers,
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self._upstream.aclose()
+
+    @staticmethod
+    async def _count(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        async for chunk in chunks:
+            image_bytes_proxied.inc("upstream", amount=len(chunk))
+            yield chunk
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag in candidates or "*" in candidates
+
+
+def _stored_response(image: StoredImage, request: Request) -> Response:
+    """Servir une image du cache disque (ou 304 si le navigateur l'a déjà)."""
+    headers = {**CACHE_HEADERS, "ETag": image.client_etag}
+    if _etag_matches(request, image.client_etag):
+        return Response(status_code=304, headers=headers)
+    image_bytes_proxied.inc("cache", amount=image.size)
+    # FileResponse : le corps est lu par chunks depuis le disque (zero-copy via
+    # l'extension ASGI pathsend quand le serveur la supporte)
+    return FileResponse(image.path, media_type=image.content_type, headers=headers)
+
+
 @router.get("")
-async def proxy_image(url: str = Query(..., description="Image URL to proxy")):
+async def proxy_image(
+    request: Request,
+    url: str = Query(..., description="Image URL to proxy"),
+    width: int = Query(None, ge=16, le=2000, description="Target width in pixels (optional)"),
+    height: int = Query(None, ge=16, le=2000, description="Target height in pixels (optional)"),
+    fit: ImageFit = Query("cover", description="cover (crop to fill) or contain (fit inside)"),
+    format: ImageFormat = Query(None, description="Output format (optional, transcodes the image)"),
+    quality: int = Query(80, ge=1, le=100, description="Encoder quality"),
+):
     """
     Proxy an external image and return it with proper CORS headers.
-    Also supports returning as base64 data URI.
+
+    Images are kept in a disk cache and revalidated against upstream
+    (ETag / Last-Modified) once stale. On a miss, the body is streamed to the
+    client while being written to the cache.
+
+    With width/height/format, a resized and/or transcoded variant is
+    returned instead (cached per source and variant). Without `format`, the
+    variant keeps the source format.
     """
+    if width or height or format:
+        variant = ImageVariant(width=width, height=height, fit=fit, quality=quality)
+        return await _proxy_variant(request, url, variant, format)
+
+    stored = await image_store.lookup(url)
+    if stored is not None and stored.fresh:
+        return _stored_response(stored, request)
+
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, follow_redirects=True)
-            response.raise_for_status()
+        upstream = await open_image(url, headers=stored.validators() if stored else None)
+    except ImageRejectedError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    except httpx.HTTPError as e:
+        if stored is not None:
+            # Upstream indisponible : la copie locale reste servie
+            return _stored_response(stored, request)
+        raise HTTPException(status_code=502, detail=f"Failed to fetch image: {str(e)}")
 
-            content_type = response.headers.get("content-type", "image/jpeg")
+    if upstream.status_code == 304 and stored is not None:
+        await upstream.aclose()
+        stored = await image_store.revalidated(
+            stored,
+            etag=upstream.headers.get("etag"),
+            last_modified=upstream.headers.get("last-modified"),
+        )
+        return _stored_response(stored, request)
 
-            return Response(
-                content=response.content,
-                media_type=content_type,
-                headers={
-                    "Cache-Control": "public, max-age=86400",
-                    "Access-Control-Allow-Origin": "*",
-                },
-            )
+    headers = dict(CACHE_HEADERS)
+    # Taille connue : le client peut afficher la progression (corps non ré-encodé)
+    content_length = upstream.headers.get("content-length")
+    if content_length and "content-encoding" not in upstream.headers:
+        headers["Content-Length"] = content_length
+
+    return UpstreamImageResponse(url, upstream, headers=headers)
 
+
+async def _proxy_variant(request: Request, url: str, variant: ImageVariant, format: ImageFormat | None) -> Response:
+    try:
+        source = await get_image(url)
+        # Simple redimensionnement : même type de contenu que l'image d'origine
+        variant = replace(variant, format=format or source_format(source.content_type))
+        image = await image_transformer.get_variant(source, variant)
+    except ImageRejectedError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    except UnsupportedImageError as e:
+        raise HTTPException(status_code=415, detail=f"Cannot transform image: {str(e)}")
     except httpx.HTTPError as e:
         raise HTTPException(status_code=502, detail=f"Failed to fetch image: {str(e)}")
 
+    return _stored_response(image, request)
+
 
 @router.get("/base64")
-async def proxy_image_base64(url: str = Query(..., description="Image URL to proxy")):
+async def proxy_image_base64(request: Request, url: str = Query(..., description="Image URL to proxy")):
     """
     Proxy an external image and return it as a base64 data URI.
     Useful for html-to-image export.
+
+    The JSON body is derived from the disk-cached image, encoded once and
+    served from disk in chunks.
     """
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, follow_redirects=True)
-            response.raise_for_status()
-
-            content_type = response.headers.get("content-type", "image/jpeg")
-            b64_data = base64.b64encode(response.content).decode("utf-8")
-            data_uri = f"data:{content_type};base64,{b64_data}"
-
-            return {"data_uri": data_uri}
-
+        image = await get_image(url)
+        body = await get_data_uri_json(image)
+    except ImageRejectedError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
     except httpx.HTTPError as e:
         raise HTTPException(status_code=502, detail=f"Failed to fetch image: {str(e)}")
 
+    return _stored_response(body, request)
+
 
 @router.get("/validate", response_model=ImageValidationResponse)
 async def validate_image_url(url: str = Query(..., description="Image URL to validate")):
@@ -77,31 +195,34 @@ async def validate_image_url(url: str = Query(..., description="Image URL to val
     Uses HEAD request to check Content-Type without downloading the full image.
     """
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            # First try HEAD request (faster, no download)
-            try:
-                response = await client.head(url, follow_redirects=True)
-                response.raise_for_status()
-            except (httpx.HTTPError, httpx.RequestError):
-                # Some servers don't support HEAD, fall back to GET with stream
-                response = await client.get(url, follow_redirects=True)
-                response.raise_for_status()
-
-            content_type = response.headers.get("content-type", "")
-            # Extract base MIME type (remove charset, etc.)
-            base_content_type = content_type.split(";")[0].strip().lower()
-
-            if base_content_type in VALID_IMAGE_TYPES:
-                return ImageValidationResponse(
-                    valid=True,
-                    content_type=base_content_type,
-                )
-            else:
-                return ImageValidationResponse(
-                    valid=False,
-                    content_type=base_content_type if base_content_type else None,
-                    error=f"URL does not point to a valid image (got {base_content_type or 'unknown type'})",
-                )
+        client = http_clients.get("image")
+        # First try HEAD request (faster, no download)
+        try:
+            response = await client.head(url, follow_redirects=True, timeout=10.0)
+            response.raise_for_status()
+        except (httpx.HTTPError, httpx.RequestError):
+            # Some servers don't support HEAD, fall back to GET with stream
+            # (headers only: the body is never read)
+            request = client.build_request("GET", url, timeout=10.0)
+            response = await client.send(request, stream=True, follow_redirects=True)
+            await response.aclose()
+            response.raise_for_status()
+
+        content_type = response.headers.get("content-type", "")
+        # Extract base MIME type (remove charset, etc.)
+        base_content_type = content_type.split(";")[0].strip().lower()
+
+        if base_content_type in VALID_IMAGE_TYPES:
+            return ImageValidationResponse(
+                valid=True,
+                content_type=base_content_type,
+            )
+        else:
+            return ImageValidationResponse(
+                valid=False,
+                content_type=base_content_type if base_content_type else None,
+                error=f"URL does not point to a valid image (got {base_content_type or 'unknown type'})",
+            )
 
     except httpx.TimeoutException:
         return ImageValidationResponse(
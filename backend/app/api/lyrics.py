@@ -1,12 +1,160 @@
+import asyncio
+from collections.abc import AsyncIterator
+
 from fastapi import APIRouter, Query, HTTPException
+from fastapi.responses import StreamingResponse
 
+from app.config import settings
+from app.api.responses import FastJSONResponse, cached_json_response, fresh_json_response, upstream_unavailable_error
+from app.services.breaker import CircuitOpenError
+from app.services.codecs import dumps_json, loads_json
 from app.services.lrclib import lrclib_client
+from app.services.lyrics_index import PassageIndex, passage_index_cache
+from app.services.lyrics_search import lyrics_search
 from app.services.cache import cache_service
+from app.services.scheduler import UpstreamBusyError
+from app.services.singleflight import single_flight
+from app.services.timing import span
 from app.models.lyrics import Lyrics
-from app.models.responses import LyricsResponse
+from app.models.requests import LyricsQuery, LyricsBatchRequest
+from app.models.responses import LyricsBatchResponse, LyricsResponse
 
 router = APIRouter()
 
+# Le payload est mis en cache avec `cached: false` ; `cached` suit `lyrics` au
+# premier niveau, donc la dernière occurrence est la bonne (les guillemets dans
+# les chaînes sont échappés, aucune valeur ne peut contenir ce motif)
+CACHED_FALSE_MARKERS = (b'"cached":false', b'"cached": false')
+
+
+def mark_cached(data: bytes) -> bytes:
+    """Passer `cached` à true dans un payload JSON sans le re-parser."""
+    for marker in CACHED_FALSE_MARKERS:
+        position = data.rfind(marker)
+        if position != -1:
+            return data[:position] + b'"cached":true' + data[position + len(marker):]
+    payload = loads_json(data)
+    payload["cached"] = True
+    return dumps_json(payload)
+
+
+def passage_mode(
+    start_line: int | None,
+    end_line: int | None,
+    start: float | None,
+    end: float | None,
+    at: float | None,
+) -> str | None:
+    """Mode de sélection demandé (lines, window, at), ou None pour toutes les lignes."""
+    modes = []
+    if start_line is not None or end_line is not None:
+        modes.append("lines")
+    if start is not None or end is not None:
+        modes.append("window")
+    if at is not None:
+        modes.append("at")
+    if len(modes) > 1:
+        raise HTTPException(status_code=400, detail="Use only one of line range, time window or timestamp")
+    if start is not None and end is not None and start > end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    return modes[0] if modes else None
+
+
+def select_passage(
+    index: PassageIndex,
+    mode: str,
+    start_line: int | None,
+    end_line: int | None,
+    start: float | None,
+    end: float | None,
+    at: float | None,
+) -> dict:
+    """Réponse restreinte au passage demandé."""
+    if not index.payload.get("lyrics"):
+        # Lyrics introuvables : rien à découper
+        return index.payload
+    if mode == "lines":
+        lines = index.line_range(start_line or 0, end_line)
+    else:
+        if not index.synced:
+            raise HTTPException(status_code=400, detail="Time-based selection requires synced lyrics")
+        if mode == "window":
+            lines = index.window(start or 0.0, end if end is not None else float("inf"))
+        else:
+            lines = index.at(at)
+    return index.with_lines(lines)
+
+
+def lyrics_cache_key(track: str, artist: str, track_id: str | None) -> str:
+    return f"lyrics:{track_id or f'{artist}:{track}'}".lower()
+
+
+async def fetch_lyrics_payload(
+    track: str,
+    artist: str,
+    album: str | None,
+    duration: float | None,
+    track_id: str | None,
+) -> dict:
+    """Interroger lrclib et construire la réponse sérialisée (sans la mettre en cache)."""
+    # Convert duration to int if provided
+    duration_int = int(duration) if duration is not None else None
+
+    data = await lrclib_client.get_lyrics(
+        track_name=track,
+        artist_name=artist,
+        album_name=album,
+        duration=duration_int,
+    )
+
+    if data:
+        with span("parse"):
+            lyrics = Lyrics.from_lrclib(data)
+        response = LyricsResponse(
+            track_id=track_id or "",
+            track_name=track,
+            artist_name=artist,
+            lyrics=lyrics,
+            cached=False,
+        )
+    else:
+        response = LyricsResponse(
+            track_id=track_id or "",
+            track_name=track,
+            artist_name=artist,
+            lyrics=None,
+            cached=False,
+            error="Lyrics not found",
+        )
+
+    with span("serialize"):
+        return response.model_dump(mode="json")
+
+
+def lyrics_loader(item: LyricsQuery, cache_key: str, write: bool = True):
+    """
+    Chargement d'une entrée avec mise en cache (pour SingleFlight).
+
+    Avec `write=False`, l'appelant met en cache et indexe lui-même (écriture groupée du batch).
+    """
+    async def fetch() -> dict:
+        payload = await fetch_lyrics_payload(
+            item.track, item.artist, item.album, item.duration, item.track_id
+        )
+        if not write:
+            return payload
+        lyrics_search.submit(cache_key, payload)
+        # Mettre en cache même si non trouvé
+        await cache_service.set(
+            cache_key,
+            payload,
+            ttl=settings.lyrics_cache_ttl,
+            stale_ttl=settings.lyrics_cache_stale_ttl,
+        )
+        return payload
+
+    return fetch
+
 
 @router.get("", response_model=LyricsResponse)
 async def get_lyrics(
@@ -15,53 +163,164 @@ async def get_lyrics(
     album: str = Query(None, description="Album name (optional)"),
     duration: float = Query(None, description="Track duration in seconds (optional)"),
     track_id: str = Query(None, description="Track ID (for cache key)"),
+    start_line: int = Query(None, ge=0, description="First line index to return (inclusive)"),
+    end_line: int = Query(None, ge=0, description="Line index to stop at (exclusive)"),
+    start: float = Query(None, ge=0, description="Return lines shown from this time (seconds)"),
+    end: float = Query(None, ge=0, description="Return lines shown until this time (seconds)"),
+    at: float = Query(None, ge=0, description="Return the line shown at this time (seconds)"),
 ):
     """
     Récupérer les lyrics d'une chanson via lrclib.
 
-    Les lyrics sont mis en cache pendant 24 heures.
+    Les lyrics sont mis en cache pendant 24 heures, puis servis périmés
+    pendant leur rafraîchissement en arrière-plan.
+
+    Optionnellement, seul un passage est renvoyé : une plage de lignes
+    (`start_line`, `end_line`), les lignes affichées pendant `[start, end]`,
+    ou la ligne affichée à l'instant `at`.
     """
-    # Convert duration to int if provided
-    duration_int = int(duration) if duration is not None else None
+    mode = passage_mode(start_line, end_line, start, end, at)
+    item = LyricsQuery(track=track, artist=artist, album=album, duration=duration, track_id=track_id)
+    cache_key = lyrics_cache_key(track, artist, track_id)
+    fetch = lyrics_loader(item, cache_key)
 
-    # Vérifier le cache
-    cache_key = f"lyrics:{track_id or f'{artist}:{track}'}".lower()
-    cached = await cache_service.get(cache_key)
-    if cached:
-        cached["cached"] = True
-        return LyricsResponse(**cached)
+    # Vérifier le cache : les octets stockés (déjà validés) sont servis directement
+    entry = await cache_service.get_raw_entry(cache_key, stale_ttl=settings.lyrics_cache_stale_ttl)
+    if entry:
+        if entry.stale:
+            # Réponse immédiate avec la valeur périmée ; si lrclib échoue, elle reste servie
+            single_flight.refresh(cache_key, fetch)
+        if not lyrics_search.is_known(cache_key):
+            # Entrée mise en cache avant l'index de recherche (ou sortie du LRU des
+            # clés connues) : indexée en arrière-plan si elle n'y est pas déjà
+            lyrics_search.submit(cache_key, entry.data, replace=False)
+        if mode is None:
+            return cached_json_response(mark_cached(entry.data), entry.stale)
+        # Index (payload parsé + timestamps triés) construit une fois par entrée
+        index = passage_index_cache.get(cache_key, entry.data)
+        passage = select_passage(index, mode, start_line, end_line, start, end, at)
+        return cached_json_response(dumps_json({**passage, "cached": True}), entry.stale)
 
     try:
-        data = await lrclib_client.get_lyrics(
-            track_name=track,
-            artist_name=artist,
-            album_name=album,
-            duration=duration_int,
+        # Un seul appel lrclib par clé, même si des centaines de requêtes ratent le cache en même temps
+        payload = await single_flight.do(cache_key, fetch)
+    except (CircuitOpenError, UpstreamBusyError) as e:
+        raise upstream_unavailable_error(e)
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Lyrics API error: {str(e)}")
+
+    if mode is not None:
+        payload = select_passage(PassageIndex(payload), mode, start_line, end_line, start, end, at)
+    return fresh_json_response(payload)
+
+
+@router.post("/batch", response_model=LyricsBatchResponse)
+async def get_lyrics_batch(
+    body: LyricsBatchRequest,
+    stream: bool = Query(False, description="Stream results as NDJSON as they complete"),
+):
+    """
+    Récupérer les lyrics de plusieurs chansons (jusqu'à 50).
+
+    Le cache est lu en un seul MGET ; les absents sont demandés à lrclib en
+    parallèle (concurrence bornée), via SingleFlight avec les mêmes clés que
+    `GET /api/lyrics` : un miss déjà en cours ailleurs n'est pas rechargé.
+    Les entrées chargées par le batch sont écrites en un seul aller-retour.
+    Une erreur lrclib n'affecte que l'entrée concernée.
+    """
+    items = body.items
+    keys = [lyrics_cache_key(item.track, item.artist, item.track_id) for item in items]
+    entries = await cache_service.get_many(keys, stale_ttl=settings.lyrics_cache_stale_ttl)
+
+    results: list[dict | None] = [None] * len(items)
+    # Une même chanson peut apparaître plusieurs fois : un seul appel par clé
+    misses: dict[str, list[int]] = {}
+    for i, (item, key, entry) in enumerate(zip(items, keys, entries)):
+        if entry is None:
+            misses.setdefault(key, []).append(i)
+            continue
+        if entry.stale:
+            single_flight.refresh(key, lyrics_loader(item, key))
+        entry.value["cached"] = True
+        results[i] = entry.value
+
+    semaphore = asyncio.Semaphore(settings.lyrics_batch_concurrency)
+    # Entrées chargées par ce batch (pas celles partagées avec un chargement déjà
+    # en cours, que leur propre loader met en cache) : écrites ensemble à la fin
+    to_cache: dict[str, dict] = {}
+
+    async def load(key: str, item: LyricsQuery) -> tuple[str, dict]:
+        loader = lyrics_loader(item, key, write=False)
+
+        async def fetch() -> dict:
+            payload = await loader()
+            to_cache[key] = payload
+            return payload
+
+        async with semaphore:
+            try:
+                return key, await single_flight.do(key, fetch)
+            except Exception as e:
+                error = LyricsResponse(
+                    track_id=item.track_id or "",
+                    track_name=item.track,
+                    artist_name=item.artist,
+                    lyrics=None,
+                    error=f"Lyrics API error: {str(e)}",
+                )
+                return key, error.model_dump(mode="json")
+
+    tasks = [asyncio.ensure_future(load(key, items[indexes[0]])) for key, indexes in misses.items()]
+
+    if stream:
+        return StreamingResponse(
+            _stream_batch(results, misses, tasks, to_cache),
+            media_type="application/x-ndjson",
         )
 
-        if data:
-            lyrics = Lyrics.from_lrclib(data)
-            response = LyricsResponse(
-                track_id=track_id or "",
-                track_name=track,
-                artist_name=artist,
-                lyrics=lyrics,
-                cached=False,
-            )
-        else:
-            response = LyricsResponse(
-                track_id=track_id or "",
-                track_name=track,
-                artist_name=artist,
-                lyrics=None,
-                cached=False,
-                error="Lyrics not found",
-            )
+    for key, payload in await asyncio.gather(*tasks):
+        for i in misses[key]:
+            results[i] = payload
+    await _cache_batch(to_cache)
 
-        # Mettre en cache (24 heures) même si non trouvé
-        await cache_service.set(cache_key, response.model_dump(mode="json"), ttl=86400)
+    # Payloads déjà sérialisables (cache ou model_dump) : pas de revalidation
+    return FastJSONResponse({"results": results})
 
-        return response
 
-    except Exception as e:
-        raise HTTPException(status_code=502, detail=f"Lyrics API error: {str(e)}")
+async def _stream_batch(
+    results: list[dict | None],
+    misses: dict[str, list[int]],
+    tasks: list[asyncio.Task],
+    to_cache: dict[str, dict],
+) -> AsyncIterator[bytes]:
+    """Une ligne JSON par entrée : les hits d'abord, puis les misses dans l'ordre d'arrivée."""
+    try:
+        for i, result in enumerate(results):
+            if result is not None:
+                yield _ndjson_line(i, result)
+        for next_done in asyncio.as_completed(tasks):
+            key, payload = await next_done
+            for i in misses[key]:
+                yield _ndjson_line(i, payload)
+    finally:
+        # Client déconnecté : les entrées pas encore lancées ne le seront pas ;
+        # celles déjà chargées sont mises en cache
+        for task in tasks:
+            task.cancel()
+        await _cache_batch(to_cache)
+
+
+def _ndjson_line(index: int, result: dict) -> bytes:
+    return dumps_json({"index": index, "result": result}) + b"\n"
+
+
+async def _cache_batch(values: dict[str, dict]) -> None:
+    if not values:
+        return
+    for key, payload in values.items():
+        lyrics_search.submit(key, payload)
+    await cache_service.set_many(
+        values,
+        ttl=settings.lyrics_cache_ttl,
+        stale_ttl=settings.lyrics_cache_stale_ttl,
+    )
@@ -0,0 +1,18 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import PlainTextResponse
+
+from app.config import settings
+from app.services.metrics import metrics
+
+router = APIRouter()
+
+# Format d'exposition texte de Prometheus
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@router.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Métriques Prometheus (requêtes, upstreams, cache, images), tous workers confondus."""
+    if not settings.metrics_enabled:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return PlainTextResponse(await metrics.render(), media_type=CONTENT_TYPE)
@@ -0,0 +1,185 @@
+import time
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import settings
+from app.services.metrics import http_in_flight, http_request_duration, http_requests
+from app.services.rate_limit import RateLimiter, rate_limiter
+from app.services.timing import RequestProfiler, RequestTimings, current_timings, request_profiler
+
+
+def route_costs(costs: dict[str, int]) -> list[tuple[str, int]]:
+    """Préfixes du plus spécifique au plus général (le premier qui correspond l'emporte)."""
+    return sorted(costs.items(), key=lambda item: len(item[0]), reverse=True)
+
+
+def route_template(scope: Scope) -> str:
+    """Modèle de chemin complet de la route servie (`/api/search/suggest`), `unmatched` sinon."""
+    # Les versions récentes de FastAPI gardent dans `route` le chemin relatif au routeur
+    effective = scope.get("fastapi", {}).get("effective_route_context")
+    if effective is not None:
+        return effective.path
+    return getattr(scope.get("route"), "path", "unmatched")
+
+
+class RateLimitMiddleware:
+    """
+    Middleware ASGI de limitation de débit sur `/api`.
+
+    ASGI pur (pas de BaseHTTPMiddleware) : la décision est prise en mémoire
+    et les en-têtes `RateLimit-*` sont ajoutés au démarrage de la réponse,
+    sans envelopper le corps. Au-delà de la limite : 429 avec `Retry-After`.
+    """
+
+    def __init__(self, app: ASGIApp, limiter: RateLimiter | None = None):
+        self.app = app
+        self.limiter = limiter or rate_limiter
+        self.costs = route_costs(settings.rate_limit_costs)
+        self.exempt = tuple(settings.rate_limit_exempt)
+        self.policy = f"{int(self.limiter.capacity)};w=60".encode()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.limiter.enabled or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+        path = scope["path"]
+        if not path.startswith("/api/") or path.startswith(self.exempt):
+            await self.app(scope, receive, send)
+            return
+
+        decision = self.limiter.consume(self.client_key(scope), self.cost(path))
+        headers = [
+            (b"ratelimit-limit", str(decision.limit).encode()),
+            (b"ratelimit-remaining", str(decision.remaining).encode()),
+            (b"ratelimit-reset", str(decision.reset).encode()),
+            (b"ratelimit-policy", self.policy),
+        ]
+
+        if not decision.allowed:
+            response = JSONResponse({"detail": "Too many requests"}, status_code=429)
+            response.raw_headers += [*headers, (b"retry-after", str(decision.retry_after).encode())]
+            await response(scope, receive, send)
+            return
+
+        async def send_with_headers(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", ()), *headers]
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+    def cost(self, path: str) -> int:
+        for prefix, cost in self.costs:
+            if path == prefix or path.startswith(prefix + "/"):
+                return cost
+        return 1
+
+    @staticmethod
+    def client_key(scope: Scope) -> str:
+        if settings.rate_limit_trust_proxy:
+            for name, value in scope["headers"]:
+                if name == b"x-forwarded-for":
+                    return value.split(b",", 1)[0].strip().decode("latin-1")
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI mesurant chaque requête HTTP (latence, statut, requêtes en cours).
+
+    La route est le modèle de chemin (`/api/lyrics`), jamais le chemin brut :
+    le nombre de séries reste borné. Les requêtes qui n'atteignent aucune
+    route (404, 429 du rate limiting) sont regroupées sous `unmatched`.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        http_in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            http_in_flight.dec()
+            route = route_template(scope)
+            method = scope["method"]
+            http_request_duration.observe(time.perf_counter() - started, method, route)
+            http_requests.inc(method, route, str(status))
+
+
+class ServerTimingMiddleware:
+    """
+    Middleware ASGI ajoutant l'en-tête `Server-Timing` (durée de chaque étape).
+
+    Les étapes sont mesurées par `span()` dans les services (Redis, appels
+    upstream, parsing LRC, sérialisation) et cumulées dans un objet porté
+    par une variable de contexte ; l'en-tête est écrit au début de la réponse.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not settings.server_timing_enabled:
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+
+        async def send_with_timing(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = [
+                    *message.get("headers", ()),
+                    (b"server-timing", timings.header().encode("latin-1")),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_timings.reset(token)
+
+
+class ProfilingMiddleware:
+    """
+    Middleware ASGI profilant les requêtes tirées au sort ou demandées (`X-Profile`).
+
+    Le profil couvre la requête jusqu'au dernier octet envoyé ; il est écrit
+    sur disque ensuite, hors de la boucle et après la réponse.
+    """
+
+    def __init__(self, app: ASGIApp, profiler: RequestProfiler | None = None):
+        self.app = app
+        self.profiler = profiler or request_profiler
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.profiler.enabled or not self.profiler.wanted(scope["headers"]):
+            await self.app(scope, receive, send)
+            return
+        profile = self.profiler.start()
+        if profile is None:
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.profiler.stop(profile)
+        await self.profiler.save(profile, scope["method"], scope["path"], time.perf_counter() - started)
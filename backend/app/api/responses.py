@@ -0,0 +1,44 @@
+import math
+from typing import Any
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse, Response
+
+from app.services.breaker import CircuitOpenError
+from app.services.scheduler import UpstreamBusyError
+from app.services.codecs import dumps_json
+from app.services.timing import span
+
+# En-tête indiquant l'origine de la réponse : HIT, STALE (rafraîchie en arrière-plan) ou MISS
+CACHE_STATUS_HEADER = "X-Cache"
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse sérialisée avec orjson (si disponible) ; le contenu doit déjà être du JSON natif."""
+
+    def render(self, content: Any) -> bytes:
+        with span("serialize"):
+            return dumps_json(content)
+
+
+def cached_json_response(data: bytes, stale: bool) -> Response:
+    """Servir une valeur du cache telle quelle : ni parsing, ni validation, ni re-sérialisation."""
+    return Response(
+        content=data,
+        media_type="application/json",
+        headers={CACHE_STATUS_HEADER: "STALE" if stale else "HIT"},
+    )
+
+
+def fresh_json_response(payload: dict) -> FastJSONResponse:
+    """Réponse à un cache miss (payload déjà produit par `model_dump(mode="json")`)."""
+    return FastJSONResponse(payload, headers={CACHE_STATUS_HEADER: "MISS"})
+
+
+def upstream_unavailable_error(error: CircuitOpenError | UpstreamBusyError) -> HTTPException:
+    """503 immédiat (circuit ouvert ou file saturée), avec le délai avant le prochain essai."""
+    return HTTPException(
+        status_code=503,
+        detail=f"{error.upstream} temporarily unavailable",
+        headers={"Retry-After": str(max(1, math.ceil(error.retry_after)))},
+    )
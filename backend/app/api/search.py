@@ -1,14 +1,72 @@
+from collections import OrderedDict
+
 from fastapi import APIRouter, Query, HTTPException
 
+from app.config import settings
+from app.api.responses import cached_json_response, fresh_json_response, upstream_unavailable_error
 from app.services.genius import genius_client
 # Spotify integration kept aside for future use
 # from app.services.spotify import spotify_client
+from app.services.breaker import CircuitOpenError
 from app.services.cache import cache_service
+from app.services.scheduler import UpstreamBusyError
+from app.services.singleflight import single_flight
+from app.services.lyrics_search import lyrics_search
+from app.services.suggest import suggest_index
+from app.services.codecs import dumps_json, loads_json
 from app.models.track import Track
-from app.models.responses import SearchResponse
+from app.utils.text import normalize_text
+from app.models.lyrics import LyricLine
+from app.models.responses import LyricsSearchResponse, LyricsSearchResult, SearchResponse, SuggestResponse, TrackSuggestion
 
 router = APIRouter()
 
+
+def search_cache_key(q: str) -> str:
+    """Clé indépendante de la casse, des espaces, des variantes Unicode (et des accents) et de `limit`."""
+    return f"search:genius:{normalize_text(q, accents=not settings.search_fold_accents)}"
+
+
+def slice_results(payload: dict, q: str, limit: int) -> dict:
+    """Réponse pour `limit` à partir du jeu de résultats complet en cache."""
+    results = payload["results"][:limit]
+    return {**payload, "query": q, "results": results, "total": len(results)}
+
+
+class RenderedSearchCache:
+    """
+    Corps JSON des réponses servies depuis le cache, par (clé, requête, limit), en LRU borné.
+
+    Comme pour les index de passages, un rendu reste valable tant que
+    l'entrée en cache est identique : les hits suivants ne re-parsent ni ne
+    re-sérialisent le jeu de résultats complet.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[tuple[str, str, int], tuple[bytes, bytes]] = OrderedDict()
+
+    def get(self, key: str, data: bytes, q: str, limit: int) -> bytes:
+        slot = (key, q, limit)
+        entry = self._entries.get(slot)
+        if entry is not None and (entry[0] is data or entry[0] == data):
+            self._entries.move_to_end(slot)
+            return entry[1]
+
+        body = dumps_json(slice_results(loads_json(data), q, limit))
+        self._entries[slot] = (data, body)
+        self._entries.move_to_end(slot)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return body
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+rendered_search_cache = RenderedSearchCache(max_entries=settings.search_rendered_max_entries)
+
+
 @router.get("", response_model=SearchResponse)
 async def search_tracks(
     q: str = Query(..., min_length=1, max_length=200, description="Search query"),
@@ -17,27 +75,95 @@ async def search_tracks(
     """
     Rechercher des chansons via Genius.
 
-    Les résultats sont mis en cache pendant 1 heure.
+    Les résultats sont mis en cache pendant 1 heure, puis servis périmés
+    pendant leur rafraîchissement en arrière-plan. Le jeu complet
+    (`search_max_results`) est récupéré une fois par requête canonique,
+    puis découpé selon `limit`.
     """
-    # Vérifier le cache
-    cache_key = f"search:genius:{q.lower()}:{limit}"
-    cached = await cache_service.get(cache_key)
-    if cached:
-        return SearchResponse(**cached)
+    cache_key = search_cache_key(q)
 
-    try:
-        results = await genius_client.search_songs(q, limit)
+    async def fetch() -> dict:
+        results = await genius_client.search_songs(q, settings.search_max_results)
+        tracks = [Track.from_genius(r) for r in results]
+        # Alimente l'autocomplétion (popularité : apparitions + vues Genius)
+        suggest_index.add_tracks(tracks, results)
 
         response = SearchResponse(
             query=q,
-            results=[Track.from_genius(r) for r in results],
+            results=tracks,
             total=len(results),
         )
 
-        # Mettre en cache (1 heure)
-        await cache_service.set(cache_key, response.model_dump(mode="json"), ttl=3600)
+        # Mettre en cache
+        payload = response.model_dump(mode="json")
+        await cache_service.set(
+            cache_key,
+            payload,
+            ttl=settings.search_cache_ttl,
+            stale_ttl=settings.search_cache_stale_ttl,
+        )
+        return payload
 
-        return response
+    # Vérifier le cache
+    entry = await cache_service.get_raw_entry(cache_key, stale_ttl=settings.search_cache_stale_ttl)
+    if entry:
+        if entry.stale:
+            single_flight.refresh(cache_key, fetch)
+        return cached_json_response(rendered_search_cache.get(cache_key, entry.data, q, limit), entry.stale)
 
+    try:
+        payload = await single_flight.do(cache_key, fetch)
+    except (CircuitOpenError, UpstreamBusyError) as e:
+        raise upstream_unavailable_error(e)
     except Exception as e:
         raise HTTPException(status_code=502, detail=f"Genius API error: {str(e)}")
+
+    return fresh_json_response(slice_results(payload, q, limit))
+
+
+@router.get("/lyrics", response_model=LyricsSearchResponse)
+async def search_lyrics(
+    q: str = Query(..., min_length=2, max_length=200, description="Words from a lyric line"),
+    limit: int = Query(10, ge=1, le=50, description="Number of tracks"),
+):
+    """
+    Retrouver une chanson à partir d'un extrait de paroles.
+
+    Recherche locale (index plein texte des paroles déjà récupérées), sans
+    appel upstream : les mots doivent se suivre dans une ligne, le dernier
+    peut être incomplet (saisie en cours).
+    """
+    matches = await lyrics_search.search(q, limit)
+    response = LyricsSearchResponse(
+        query=q,
+        results=[
+            LyricsSearchResult(
+                track_id=match.track_id,
+                track_name=match.track_name,
+                artist_name=match.artist_name,
+                album_name=match.album_name,
+                lines=[LyricLine(index=index, text=text) for index, text in match.lines],
+            )
+            for match in matches
+        ],
+        total=len(matches),
+    )
+    return response
+
+
+@router.get("/suggest", response_model=SuggestResponse)
+async def suggest_tracks(
+    q: str = Query(..., min_length=1, max_length=100, description="Beginning of a title or artist"),
+    limit: int = Query(8, ge=1, le=20, description="Number of suggestions"),
+):
+    """
+    Autocomplétion des titres à partir des chansons déjà vues.
+
+    Entièrement locale (aucun appel Genius) ; les chansons les plus souvent
+    rencontrées et les plus vues sur Genius sont proposées en premier.
+    """
+    suggestions = suggest_index.suggest(q, limit)
+    return SuggestResponse(
+        query=q,
+        suggestions=[TrackSuggestion(**s.to_dict()) for s in suggestions],
+    )
@@ -15,6 +15,67 @@ class Settings(BaseSettings):
     # Redis
     redis_url: str = "redis://localhost:6379"
 
+    # Durées de cache (secondes) : fraîcheur, puis fenêtre où la valeur périmée
+    # est servie pendant son rafraîchissement en arrière-plan
+    search_cache_ttl: int = 3600
+    search_cache_stale_ttl: int = 86400
+    lyrics_cache_ttl: int = 86400
+    lyrics_cache_stale_ttl: int = 7 * 86400
+
+    # Recherche : le jeu complet est récupéré une fois puis découpé selon `limit` ;
+    # les accents sont ignorés dans la clé de cache si `search_fold_accents`
+    search_max_results: int = 50
+    search_fold_accents: bool = True
+    # Réponses de recherche déjà rendues (par requête et `limit`) gardées en mémoire
+    search_rendered_max_entries: int = 512
+    # Genius : taille maximale d'une page /search et nombre de pages au plus par recherche
+    genius_page_size: int = 20
+    genius_max_pages: int = 5
+
+    # lrclib : délai avant de lancer /search en parallèle de /get (0 = immédiat),
+    # et score minimal (0..1) d'un résultat /search accepté sans attendre /get
+    lrclib_hedge_delay: float = 0.25
+    lrclib_min_score: float = 0.75
+
+    # Nombre d'appels lrclib simultanés pour /api/lyrics/batch
+    lyrics_batch_concurrency: int = 8
+
+    # Recherche plein texte locale dans les paroles déjà récupérées (SQLite FTS5)
+    lyrics_search_db: str = "data/lyrics_search.sqlite3"
+    lyrics_search_flush_interval: float = 2.0
+    lyrics_search_batch_size: int = 200
+    lyrics_search_max_pending: int = 5000
+    # Clés indexées gardées en mémoire pour ne pas ré-indexer à chaque cache hit
+    lyrics_search_max_known: int = 100_000
+
+    # Autocomplétion : index de préfixes des chansons vues, sauvegardé sur disque
+    suggest_max_tracks: int = 50000
+    suggest_snapshot_path: str = "data/suggest.json"
+    suggest_snapshot_interval: float = 60.0
+
+    # Index des passages (sélection par lignes / par temps) gardés en mémoire
+    lyrics_index_max_entries: int = 1024
+
+    # Cache mémoire (L1) devant Redis
+    cache_local_max_bytes: int = 32 * 1024 * 1024
+    cache_local_invalidation: bool = True
+
+    # Encodage des valeurs Redis : json, orjson ou msgpack ; compression
+    # none, zlib, zstd ou lz4 au-delà du seuil (octets)
+    cache_codec: str = "orjson"
+    cache_compression: str = "zstd"
+    cache_compression_threshold: int = 1024
+
+    # Purge incrémentale (SCAN + UNLINK)
+    cache_purge_scan_count: int = 500
+    cache_purge_unlink_batch: int = 500
+    # 0 = pas de limitation de débit
+    cache_purge_max_keys_per_second: float = 5000
+
+    # Coalescing des cache misses (verrou Redis entre workers)
+    singleflight_lock_ttl: float = 15.0
+    singleflight_wait_timeout: float = 15.0
+
     # Spotify API
     spotify_client_id: str = ""
     spotify_client_secret: str = ""
@@ -25,8 +86,84 @@ class Settings(BaseSettings):
     # CORS
     cors_origins: str = "http://localhost:3000"
 
-    # Rate Limiting
-    rate_limit_per_minute: int = 60
+    # HTTP clients (pool partagé par upstream)
+    http_max_connections: int = 100
+    http_max_keepalive_connections: int = 20
+    http_keepalive_expiry: float = 30.0
+    http_connect_timeout: float = 5.0
+    http_http2: bool = False
+    http_prewarm_connections: int = 2
+    genius_timeout: float = 10.0
+    lrclib_timeout: float = 10.0
+    spotify_timeout: float = 10.0
+    image_timeout: float = 15.0
+
+    # Disjoncteurs par upstream : fenêtre glissante (s), taux d'erreur déclencheur,
+    # durée d'ouverture (s) ; délai d'appel = percentile de latence × multiplicateur
+    breaker_window: float = 30.0
+    breaker_min_requests: int = 10
+    breaker_error_threshold: float = 0.5
+    breaker_open_duration: float = 15.0
+    breaker_timeout_percentile: float = 0.99
+    breaker_timeout_multiplier: float = 3.0
+    breaker_min_timeout: float = 1.0
+
+    # Débit sortant par upstream (requêtes/s, 0 = illimité) ; au-delà, file d'attente
+    # bornée à priorités, attente maximale (s) des appels utilisateurs / d'arrière-plan
+    genius_max_rps: float = 10.0
+    lrclib_max_rps: float = 20.0
+    spotify_max_rps: float = 10.0
+    upstream_max_queue: int = 200
+    upstream_max_wait: float = 2.0
+    upstream_background_max_wait: float = 30.0
+    # Pause (s) après un 429 sans en-tête Retry-After
+    upstream_default_backoff: float = 1.0
+
+    # Image proxy
+    image_max_bytes: int = 10 * 1024 * 1024
+    image_chunk_size: int = 64 * 1024
+    image_cache_dir: str = "data/images"
+    image_cache_max_bytes: int = 1024 * 1024 * 1024
+    image_cache_ttl: int = 86400
+    image_cache_sweep_interval: int = 300
+    image_transform_workers: int = 2
+
+    # Métriques Prometheus (/metrics). Plusieurs workers : répertoire partagé où
+    # chacun écrit ses compteurs toutes les `metrics_flush_interval` secondes
+    # (à vider au redéploiement) ; vide = un seul process
+    metrics_enabled: bool = True
+    metrics_dir: str = ""
+    metrics_flush_interval: float = 5.0
+
+    # En-tête Server-Timing (durée par étape : redis, upstreams, parse, serialize)
+    server_timing_enabled: bool = True
+    # Profilage cProfile de requêtes : une fraction tirée au sort (0 = aucune), ou
+    # sur demande avec `X-Profile: <admin_token>` ; fichiers .prof dans `profile_dir`
+    profile_sample_rate: float = 0.0
+    profile_dir: str = "data/profiles"
+    profile_max_files: int = 100
+
+    # Admin (endpoints désactivés si vide)
+    admin_token: str = ""
+
+    # Rate Limiting (0 = désactivé) : jetons par minute et par client, coût de
+    # chaque préfixe de route (1 par défaut), synchronisation Redis entre workers (s).
+    # Budget dimensionné sur une vraie page : le front recherche avec limit=20,
+    # appelle le backend directement pour chaque miniature, et la saisie
+    # (debounce) relance une recherche à chaque pause. Une page ≈ 4 recherches
+    # (12) + 20 miniatures (40) = 52 : on doit pouvoir en parcourir ~5 par minute.
+    rate_limit_per_minute: int = 300
+    rate_limit_costs: dict[str, int] = {
+        "/api/search": 3,
+        "/api/search/suggest": 1,
+        "/api/search/lyrics": 1,
+        "/api/image": 2,
+        "/api/lyrics/batch": 10,
+    }
+    rate_limit_exempt: list[str] = ["/api/health"]
+    rate_limit_sync_interval: float = 1.0
+    # Identifier le client par X-Forwarded-For (uniquement derrière un proxy de confiance)
+    rate_limit_trust_proxy: bool = False
 
     @property
     def cors_origins_list(self) -> list[str]:
@@ -1,8 +1,44 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.config import settings
+from app.api.metrics import router as metrics_router
+from app.api.middleware import MetricsMiddleware, ProfilingMiddleware, RateLimitMiddleware, ServerTimingMiddleware
 from app.api.router import router
+from app.services.cache import cache_service
+from app.services.http import http_clients
+from app.services.image_store import image_store
+from app.services.image_transform import image_transformer
+from app.services.lyrics_search import lyrics_search
+from app.services.metrics import metrics
+from app.services.rate_limit import rate_limiter
+from app.services.suggest import suggest_index
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Clients HTTP partagés : ouverts (et préchauffés) au démarrage, fermés à l'arrêt
+    await http_clients.start()
+    await cache_service.start()
+    await image_store.start()
+    await lyrics_search.start()
+    await suggest_index.start()
+    await rate_limiter.start()
+    await metrics.start()
+    try:
+        yield
+    finally:
+        await metrics.close()
+        await rate_limiter.close()
+        await suggest_index.close()
+        await lyrics_search.close()
+        image_transformer.close()
+        await image_store.close()
+        await cache_service.close()
+        await http_clients.close()
+
 
 app = FastAPI(
     title=settings.app_name,
@@ -10,8 +46,12 @@ app = FastAPI(
     version="1.0.0",
     docs_url="/docs",
     redoc_url="/redoc",
+    lifespan=lifespan,
 )
 
+# Rate limiting (ajouté avant CORS : les réponses 429 reçoivent aussi les en-têtes CORS)
+app.add_middleware(RateLimitMiddleware)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -19,10 +59,27 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[
+        "X-Cache",
+        "RateLimit-Limit",
+        "RateLimit-Remaining",
+        "RateLimit-Reset",
+        "RateLimit-Policy",
+        "Retry-After",
+        "Server-Timing",
+    ],
 )
 
+# Profilage et Server-Timing (autour de tout le traitement applicatif)
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(ServerTimingMiddleware)
+
+# Métriques (le plus à l'extérieur : mesure aussi les 429 et le coût des autres middlewares)
+app.add_middleware(MetricsMiddleware)
+
 # Include routers
 app.include_router(router)
+app.include_router(metrics_router)
 
 @app.get("/")
 async def root():
@@ -3,17 +3,31 @@ from pydantic import BaseModel
 from dataclasses import dataclass
 
 
-@dataclass
+@dataclass(slots=True)
+class ParsedWord:
+    timestamp: float
+    text: str
+
+
+@dataclass(slots=True)
 class ParsedLyricLine:
     timestamp: float
     text: str
     index: int
+    words: list[ParsedWord] | None = None
+
+
+class LyricWord(BaseModel):
+    text: str
+    timestamp: float
 
 
 class LyricLine(BaseModel):
     index: int
     text: str
     timestamp: float | None = None
+    # Timing mot à mot, seulement si le LRC source en contient
+    words: list[LyricWord] | None = None
 
 
 class Lyrics(BaseModel):
@@ -45,31 +59,150 @@ class Lyrics(BaseModel):
             duration=data.get("duration"),
             instrumental=data.get("instrumental", False),
             lines=[
-                LyricLine(index=line.index, text=line.text, timestamp=line.timestamp if line.timestamp > 0 else None)
+                LyricLine(
+                    index=line.index,
+                    text=line.text,
+                    timestamp=line.timestamp if synced else None,
+                    words=[LyricWord(text=w.text, timestamp=w.timestamp) for w in line.words] if line.words else None,
+                )
                 for line in parsed_lines
             ],
             synced=synced,
         )
 
 
+_TIME_TAG = r"\[(\d+):(\d{1,2})(?:[.:](\d{1,3}))?\]"
+
+# Une ligne LRC utile : soit `[offset:±ms]`, soit un ou plusieurs timestamps
+# ([mm:ss], [mm:ss.xx], [mm:ss.xxx]) suivis du texte. Appliqué en un seul
+# `finditer` sur tout le fichier ; les autres lignes ([ar:], [ti:], ...) sont ignorées.
+LINE_PATTERN = re.compile(
+    r"^[ \t]*(?:"
+    r"\[offset:[ \t]*([+-]?\d+)[ \t]*\]"
+    r"|" + _TIME_TAG + r"[ \t]*"
+    r"((?:\[\d+:\d{1,2}(?:[.:]\d{1,3})?\][ \t]*)*)"
+    r"(.*)"
+    # `\r` : fichiers en fin de ligne CRLF (renvoyés tels quels par lrclib)
+    r")[ \t\r]*$",
+    re.MULTILINE | re.IGNORECASE,
+)
+TIME_PATTERN = re.compile(_TIME_TAG)
+# Timing mot à mot (LRC « enhanced ») : <mm:ss.xx> suivi du texte jusqu'au tag
+# suivant (un "<" qui n'ouvre pas de tag, comme "<3", fait partie du texte).
+# Les secondes (fraction comprise) sont capturées d'un bloc : une seule conversion
+WORD_PATTERN = re.compile(r"<(\d+):(\d{1,2}(?:[.:]\d{1,3})?)>([^<]*(?:<(?!\d+:)[^<]*)*)")
+
+# .5 = 500 ms, .50 = 500 ms, .500 = 500 ms
+_FRACTION_SCALE = (1, 10, 100, 1000)
+
+
+def _seconds(minutes: str, seconds: str, fraction: str | None) -> float:
+    value = int(minutes) * 60 + int(seconds)
+    if fraction:
+        value += int(fraction) / _FRACTION_SCALE[len(fraction)]
+    return value
+
+
+def _parse_words(text: str, line_timestamp: float, shift: float) -> tuple[str, list[ParsedWord] | None]:
+    """Séparer le texte et les timings mot à mot d'une ligne (None si elle n'en a pas)."""
+    first = WORD_PATTERN.search(text)
+    if first is None:
+        return text, None
+    head = text[:first.start()]
+    words = []
+    if head.strip():
+        words.append(ParsedWord(timestamp=line_timestamp, text=head.strip()))
+    pieces = [head]
+    append = words.append
+    for minutes, seconds, segment in WORD_PATTERN.findall(text, first.start()):
+        pieces.append(segment)
+        segment = segment.strip()
+        if segment:
+            # "05.5", "05.50" et "05:500" valent tous 5,5 s
+            timestamp = int(minutes) * 60 + float(seconds if ":" not in seconds else seconds.replace(":", "."))
+            if shift:
+                timestamp = round(timestamp - shift, 3) if timestamp > shift else 0.0
+            append(ParsedWord(timestamp, segment))
+    # Les syllabes ("Hel<..>lo") se recollent : on ne retire que les tags
+    return " ".join("".join(pieces).split()), words
+
+
 def parse_synced_lyrics(synced_lyrics: str) -> list[ParsedLyricLine]:
-    """Parser les lyrics au format LRC."""
-    lines = []
-    pattern = r"\[(\d{2}):(\d{2})\.(\d{2})\]\s*(.*)"
-
-    for line in synced_lyrics.strip().split("\n"):
-        match = re.match(pattern, line)
-        if match:
-            minutes, seconds, centiseconds, text = match.groups()
-            timestamp = int(minutes) * 60 + int(seconds) + int(centiseconds) / 100
-            if text.strip():
+    """
+    Parser les lyrics au format LRC, en une passe.
+
+    Gère les timestamps à la milliseconde, plusieurs timestamps par ligne
+    (la ligne est répétée à chaque instant), le tag `[offset:±ms]` et le
+    timing mot à mot `<mm:ss.xx>`. Les lignes sont triées par timestamp.
+    """
+    lines, offset, consistent = _parse_synced(synced_lyrics, None)
+    if not consistent:
+        # `[offset]` après des lignes déjà lues (rare) : seconde passe avec l'offset final
+        lines, _, _ = _parse_synced(synced_lyrics, offset)
+    return lines
+
+
+def _parse_synced(synced_lyrics: str, known_offset: int | None) -> tuple[list[ParsedLyricLine], int, bool]:
+    """
+    Lignes parsées, dernier offset du fichier, et si cet offset est celui appliqué à toutes les lignes.
+
+    L'offset est appliqué au fil de la lecture (pas de seconde boucle sur
+    chaque mot) : `known_offset` impose l'offset et fait ignorer les tags.
+    """
+    lines: list[ParsedLyricLine] = []
+    offset = known_offset or 0
+    # Offset positif : les paroles apparaissent plus tôt (précision : la milliseconde)
+    shift = offset / 1000
+    consistent = True
+    in_order = True
+    last = 0.0
+
+    for match in LINE_PATTERN.finditer(synced_lyrics):
+        offset_ms, minutes, seconds, fraction, more_times, text = match.groups()
+        if offset_ms is not None:
+            if known_offset is not None:
+                continue
+            if lines and int(offset_ms) != offset:
+                consistent = False
+            offset = int(offset_ms)
+            shift = offset / 1000
+            continue
+        text = text.rstrip()
+        if not text:
+            continue
+
+        raw = _seconds(minutes, seconds, fraction)
+        timestamp = round(max(0.0, raw - shift), 3) if shift else raw
+        words = None
+        if "<" in text:
+            # Pré-test bon marché : la plupart des lignes n'ont pas de timing mot à mot
+            text, words = _parse_words(text, timestamp, shift)
+
+        lines.append(ParsedLyricLine(timestamp=timestamp, text=text, index=0, words=words))
+        in_order = in_order and timestamp >= last
+        last = timestamp
+
+        if more_times:
+            # Ligne répétée (refrain) : une entrée par timestamp, mots décalés d'autant
+            for repeat in TIME_PATTERN.findall(more_times):
+                delta = _seconds(*repeat) - raw
                 lines.append(ParsedLyricLine(
-                    timestamp=timestamp,
-                    text=text.strip(),
-                    index=len(lines),
+                    timestamp=round(max(0.0, timestamp + delta), 3),
+                    text=text,
+                    index=0,
+                    words=[
+                        ParsedWord(timestamp=round(max(0.0, w.timestamp + delta), 3), text=w.text) for w in words
+                    ] if words else None,
                 ))
+            in_order = False
 
-    return lines
+    if not in_order:
+        # Tri stable : deux lignes au même instant gardent l'ordre du fichier
+        lines.sort(key=lambda line: line.timestamp)
+
+    for index, line in enumerate(lines):
+        line.index = index
+    return lines, offset, consistent
 
 
 def parse_plain_lyrics(plain_lyrics: str) -> list[ParsedLyricLine]:
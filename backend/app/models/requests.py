@@ -0,0 +1,13 @@
+from pydantic import BaseModel, Field
+
+
+class LyricsQuery(BaseModel):
+    track: str
+    artist: str
+    album: str | None = None
+    duration: float | None = None
+    track_id: str | None = None
+
+
+class LyricsBatchRequest(BaseModel):
+    items: list[LyricsQuery] = Field(..., min_length=1, max_length=50)
@@ -1,7 +1,7 @@
 from pydantic import BaseModel
 
 from app.models.track import Track
-from app.models.lyrics import Lyrics
+from app.models.lyrics import Lyrics, LyricLine
 
 
 class SearchResponse(BaseModel):
@@ -17,3 +17,34 @@ class LyricsResponse(BaseModel):
     lyrics: Lyrics | None
     cached: bool = False
     error: str | None = None
+
+
+class LyricsBatchResponse(BaseModel):
+    results: list[LyricsResponse]
+
+
+class LyricsSearchResult(BaseModel):
+    track_id: str
+    track_name: str
+    artist_name: str
+    album_name: str | None = None
+    # Lignes contenant la recherche (index d'origine)
+    lines: list[LyricLine]
+
+
+class LyricsSearchResponse(BaseModel):
+    query: str
+    results: list[LyricsSearchResult]
+    total: int
+
+
+class TrackSuggestion(BaseModel):
+    id: str
+    name: str
+    artist: str
+    artwork_url: str | None = None
+
+
+class SuggestResponse(BaseModel):
+    query: str
+    suggestions: list[TrackSuggestion]
@@ -0,0 +1,225 @@
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable
+from typing import TypeVar
+
+import httpx
+
+from app.config import settings
+from app.services.metrics import upstream_errors
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Appel refusé sans contacter l'upstream : son circuit est ouvert."""
+
+    def __init__(self, upstream: str, retry_after: float):
+        super().__init__(f"{upstream} circuit open")
+        self.upstream = upstream
+        self.retry_after = retry_after
+
+
+def is_upstream_failure(error: BaseException) -> bool:
+    """Erreurs imputables à l'upstream (réseau, délai, 5xx, 429) ; un 4xx est une réponse normale."""
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+        return status >= 500 or status == 429
+    return isinstance(error, (httpx.TransportError, TimeoutError))
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    index = min(len(sorted_values) - 1, math.ceil(fraction * len(sorted_values)) - 1)
+    return sorted_values[max(index, 0)]
+
+
+class CircuitBreaker:
+    """
+    Disjoncteur d'un upstream (fermé / ouvert / semi-ouvert).
+
+    Les appels des `window` dernières secondes alimentent un taux d'erreur
+    et les percentiles de latence. Au-delà de `error_threshold` (avec au
+    moins `min_requests` appels), le circuit s'ouvre : les appels échouent
+    immédiatement pendant `open_duration` secondes, puis un seul appel test
+    décide de la fermeture. Le délai d'un appel suit la latence observée
+    (percentile × multiplicateur, borné par `max_timeout`) au lieu
+    d'attendre systématiquement le timeout httpx.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_timeout: float,
+        window: float,
+        min_requests: int,
+        error_threshold: float,
+        open_duration: float,
+        timeout_percentile: float,
+        timeout_multiplier: float,
+        min_timeout: float,
+    ):
+        self.name = name
+        self.max_timeout = max_timeout
+        self.window = window
+        self.min_requests = min_requests
+        self.error_threshold = error_threshold
+        self.open_duration = open_duration
+        self.timeout_percentile = timeout_percentile
+        self.timeout_multiplier = timeout_multiplier
+        self.min_timeout = min_timeout
+        self.state = CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+        # (instant, latence, succès)
+        self._calls: deque[tuple[float, float, bool]] = deque()
+
+    async def call(self, func: Callable[[], Awaitable[T]]) -> T:
+        """Exécuter `func()` sous la protection du circuit, avec le délai adaptatif."""
+        self._before_call()
+        probe = self.state == HALF_OPEN
+        started = time.monotonic()
+        try:
+            result = await asyncio.wait_for(func(), timeout=self.timeout())
+        except Exception as e:
+            if isinstance(e, TimeoutError):
+                # Délai adaptatif dépassé (les timeouts httpx sont comptés par le transport)
+                upstream_errors.inc(self.name, "deadline")
+            if is_upstream_failure(e):
+                self._record(started, ok=False, probe=probe)
+            elif probe:
+                # L'upstream a répondu (erreur applicative) : il est joignable
+                self._record(started, ok=True, probe=probe)
+            raise
+        except BaseException:
+            # Annulé (requête concurrente gagnante, client parti) : rien à conclure
+            if probe:
+                self._probing = False
+            raise
+        self._record(started, ok=True, probe=probe)
+        return result
+
+    def timeout(self) -> float:
+        latencies = self._latencies()
+        if len(latencies) < self.min_requests:
+            return self.max_timeout
+        observed = percentile(latencies, self.timeout_percentile) * self.timeout_multiplier
+        return min(self.max_timeout, max(self.min_timeout, observed))
+
+    def retry_after(self) -> float:
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self._opened_at + self.open_duration - time.monotonic())
+
+    def snapshot(self) -> dict:
+        self._prune(time.monotonic())
+        latencies = self._latencies()
+        errors = sum(1 for _, _, ok in self._calls if not ok)
+        return {
+            "state": self.state,
+            "requests": len(self._calls),
+            "error_rate": round(errors / len(self._calls), 3) if self._calls else 0.0,
+            "latency_p50": round(percentile(latencies, 0.5), 4) if latencies else None,
+            "latency_p99": round(percentile(latencies, 0.99), 4) if latencies else None,
+            "timeout": round(self.timeout(), 4),
+            "retry_after": round(self.retry_after(), 3),
+        }
+
+    def reset(self) -> None:
+        self.state = CLOSED
+        self._probing = False
+        self._calls.clear()
+
+    def _before_call(self) -> None:
+        if self.state == CLOSED:
+            return
+        if self.state == OPEN:
+            if self.retry_after() > 0:
+                upstream_errors.inc(self.name, "circuit_open")
+                raise CircuitOpenError(self.name, self.retry_after())
+            self.state = HALF_OPEN
+        # Semi-ouvert : un seul appel test à la fois
+        if self._probing:
+            upstream_errors.inc(self.name, "circuit_open")
+            raise CircuitOpenError(self.name, self.open_duration)
+        self._probing = True
+
+    def _record(self, started: float, ok: bool, probe: bool) -> None:
+        now = time.monotonic()
+        if probe:
+            self._probing = False
+            if ok:
+                logger.info("Circuit %s closed", self.name)
+                self.state = CLOSED
+                # Repartir d'une fenêtre vierge : les erreurs d'avant la panne ne comptent plus
+                self._calls.clear()
+            else:
+                self._open(now)
+                return
+        self._calls.append((now, now - started, ok))
+        self._prune(now)
+        if self.state == CLOSED and len(self._calls) >= self.min_requests:
+            errors = sum(1 for _, _, call_ok in self._calls if not call_ok)
+            if errors / len(self._calls) >= self.error_threshold:
+                self._open(now)
+
+    def _open(self, now: float) -> None:
+        if self.state != OPEN:
+            logger.warning("Circuit %s open for %.1fs", self.name, self.open_duration)
+        self.state = OPEN
+        self._opened_at = now
+
+    def _prune(self, now: float) -> None:
+        while self._calls and self._calls[0][0] < now - self.window:
+            self._calls.popleft()
+
+    def _latencies(self) -> list[float]:
+        return sorted(latency for _, latency, ok in self._calls if ok)
+
+
+class CircuitBreakerRegistry:
+    """Un disjoncteur par upstream, partagé par tous ses appels."""
+
+    def __init__(self):
+        self._breakers: dict[str, CircuitBreaker] = {}
+
+    def register(self, name: str, max_timeout: float) -> CircuitBreaker:
+        """Déclarer un upstream ; `max_timeout` est son timeout httpx."""
+        breaker = self._breakers[name] = CircuitBreaker(
+            name,
+            max_timeout=max_timeout,
+            window=settings.breaker_window,
+            min_requests=settings.breaker_min_requests,
+            error_threshold=settings.breaker_error_threshold,
+            open_duration=settings.breaker_open_duration,
+            timeout_percentile=settings.breaker_timeout_percentile,
+            timeout_multiplier=settings.breaker_timeout_multiplier,
+            min_timeout=settings.breaker_min_timeout,
+        )
+        return breaker
+
+    def get(self, name: str) -> CircuitBreaker:
+        return self._breakers[name]
+
+    async def call(self, name: str, func: Callable[[], Awaitable[T]]) -> T:
+        return await self._breakers[name].call(func)
+
+    def states(self) -> dict[str, dict]:
+        """État de chaque circuit, pour la supervision."""
+        return {name: breaker.snapshot() for name, breaker in self._breakers.items()}
+
+    def reset(self) -> None:
+        for breaker in self._breakers.values():
+            breaker.reset()
+
+
+# Singleton instance
+breakers = CircuitBreakerRegistry()
@@ -1,64 +1,467 @@
-import json
+import asyncio
+import fnmatch
+import time
+import uuid
+from collections import OrderedDict
+from collections.abc import AsyncIterator
+from dataclasses import dataclass
+
 import redis.asyncio as redis
 
 from app.config import settings
+from app.services.codecs import CacheCodec, loads_json
+from app.services.metrics import cache_errors, cache_hits, cache_misses, key_prefix
+from app.services.timing import span
+
+INVALIDATION_CHANNEL = "lyriks:invalidate"
+
+# Libère le verrou uniquement s'il appartient encore à l'appelant
+RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+@dataclass
+class CacheEntry:
+    value: dict
+    # Vrai une fois la durée de fraîcheur écoulée (la valeur reste servable jusqu'à expiration)
+    stale: bool = False
+
+
+@dataclass
+class RawCacheEntry:
+    # Valeur en JSON (octets), servable telle quelle dans une réponse HTTP
+    data: bytes
+    stale: bool = False
+
+    def parsed(self) -> CacheEntry:
+        return CacheEntry(value=loads_json(self.data), stale=self.stale)
+
+
+@dataclass
+class PurgeProgress:
+    scanned: int = 0
+    deleted: int = 0
+    done: bool = False
+
+
+class LocalCache:
+    """
+    Cache mémoire (L1) borné en octets, éviction LRU.
+
+    Les valeurs sont stockées en JSON (octets) : la taille est connue, un appelant
+    ne peut pas modifier l'entrée partagée, et le JSON peut être servi tel quel.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[str, tuple[bytes, float]] = OrderedDict()
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> bytes | None:
+        entry = self.get_with_ttl(key)
+        return entry[0] if entry else None
+
+    def get_with_ttl(self, key: str) -> tuple[bytes, float] | None:
+        """Retourne (valeur, TTL restant en secondes)."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        value, expires_at = entry
+        remaining = expires_at - time.monotonic()
+        if remaining <= 0:
+            self._remove(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value, remaining
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        self.delete(key)
+        size = _entry_size(key, value)
+        if ttl <= 0 or size > self.max_bytes:
+            return
+        self._entries[key] = (value, time.monotonic() + ttl)
+        self._size += size
+        while self._size > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def delete(self, key: str) -> None:
+        if key in self._entries:
+            self._remove(key)
+
+    def delete_pattern(self, pattern: str) -> None:
+        for key in [k for k in self._entries if fnmatch.fnmatchcase(k, pattern)]:
+            self._remove(key)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._size = 0
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def _remove(self, key: str) -> None:
+        value, _ = self._entries.pop(key)
+        self._size -= _entry_size(key, value)
+
+
+def _entry_size(key: str, value: bytes) -> int:
+    return len(key) + len(value)
 
 
 class CacheService:
     def __init__(self):
         self._redis: redis.Redis | None = None
+        self._local = LocalCache(max_bytes=settings.cache_local_max_bytes)
+        self._codec = CacheCodec(
+            serializer=settings.cache_codec,
+            compression=settings.cache_compression,
+            threshold=settings.cache_compression_threshold,
+        )
+        # Identifie ce worker pour ignorer ses propres messages d'invalidation
+        self._origin = uuid.uuid4().hex
+        self._listener: asyncio.Task | None = None
+
+    async def get_client(self) -> redis.Redis:
+        """Client Redis partagé (aussi utilisé par les services qui ont leurs propres scripts)."""
+        return await self._get_client()
 
     async def _get_client(self) -> redis.Redis:
         if self._redis is None:
-            self._redis = redis.from_url(
-                settings.redis_url,
-                encoding="utf-8",
-                decode_responses=True,
-            )
+            # Valeurs binaires (codec) : pas de décodage automatique
+            self._redis = redis.from_url(settings.redis_url)
         return self._redis
 
+    async def start(self) -> None:
+        """Écouter les invalidations des autres workers (si activé)."""
+        if settings.cache_local_invalidation and self._listener is None:
+            self._listener = asyncio.create_task(self._listen_invalidations())
+
+    async def close(self) -> None:
+        """Arrêter l'écoute et fermer la connexion Redis."""
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        if self._redis is not None:
+            try:
+                await self._redis.aclose()
+            except Exception:
+                pass
+            self._redis = None
+
+    def stats(self) -> dict:
+        """Compteurs du cache mémoire (hits, misses, évictions)."""
+        return self._local.stats()
+
     async def get(self, key: str) -> dict | None:
-        """Récupérer une valeur du cache."""
+        """Récupérer une valeur du cache (mémoire, puis Redis)."""
+        entry = await self.get_entry(key)
+        return entry.value if entry else None
+
+    async def get_entry(self, key: str, stale_ttl: float = 0) -> CacheEntry | None:
+        """
+        Récupérer une valeur et son état de fraîcheur.
+
+        Une entrée écrite avec `set(..., stale_ttl=n)` est périmée pendant
+        ses `n` dernières secondes de vie.
+        """
+        entry = await self.get_raw_entry(key, stale_ttl)
+        return entry.parsed() if entry else None
+
+    async def get_raw_entry(self, key: str, stale_ttl: float = 0) -> RawCacheEntry | None:
+        """Comme `get_entry`, mais la valeur reste en JSON (pas de parsing sur les hits)."""
+        local = self._local.get_with_ttl(key)
+        if local is not None:
+            cache_hits.inc(key_prefix(key), "local")
+            data, remaining = local
+            return RawCacheEntry(data=data, stale=remaining <= stale_ttl)
+
         try:
-            client = await self._get_client()
-            value = await client.get(f"lyriks:{key}")
-            if value:
-                return json.loads(value)
+            with span("redis"):
+                client = await self._get_client()
+                async with client.pipeline(transaction=False) as pipe:
+                    pipe.get(f"lyriks:{key}")
+                    pipe.pttl(f"lyriks:{key}")
+                    value, pttl = await pipe.execute()
+            entry = self._entry_from_redis(key, value, pttl, stale_ttl)
         except Exception:
             # Si Redis n'est pas disponible, on continue sans cache
-            pass
-        return None
+            cache_errors.inc(key_prefix(key), "get")
+            entry = None
+        if entry is None:
+            cache_misses.inc(key_prefix(key))
+        return entry
+
+    async def get_many(self, keys: list[str], stale_ttl: float = 0) -> list[CacheEntry | None]:
+        """Récupérer plusieurs valeurs : mémoire d'abord, puis un seul aller-retour Redis (MGET)."""
+        entries: list[CacheEntry | None] = [None] * len(keys)
+        missing = []
+        for i, key in enumerate(keys):
+            local = self._local.get_with_ttl(key)
+            if local is not None:
+                cache_hits.inc(key_prefix(key), "local")
+                value, remaining = local
+                entries[i] = CacheEntry(value=loads_json(value), stale=remaining <= stale_ttl)
+            else:
+                missing.append(i)
+
+        if not missing:
+            return entries
 
-    async def set(self, key: str, value: dict, ttl: int = 3600) -> None:
-        """Stocker une valeur dans le cache."""
         try:
             client = await self._get_client()
-            await client.set(
-                f"lyriks:{key}",
-                json.dumps(value),
-                ex=ttl,
-            )
+            redis_keys = [f"lyriks:{keys[i]}" for i in missing]
+            with span("redis"):
+                async with client.pipeline(transaction=False) as pipe:
+                    pipe.mget(redis_keys)
+                    for redis_key in redis_keys:
+                        pipe.pttl(redis_key)
+                    values, *pttls = await pipe.execute()
+            for i, value, pttl in zip(missing, values, pttls):
+                entry = self._entry_from_redis(keys[i], value, pttl, stale_ttl)
+                entries[i] = entry.parsed() if entry else None
+        except Exception:
+            for i in missing:
+                cache_errors.inc(key_prefix(keys[i]), "get")
+        for i in missing:
+            if entries[i] is None:
+                cache_misses.inc(key_prefix(keys[i]))
+        return entries
+
+    def _entry_from_redis(self, key: str, value: bytes | None, pttl: int, stale_ttl: float) -> RawCacheEntry | None:
+        if not value:
+            return None
+        if pttl == -2:
+            # PTTL = -2 : la clé a expiré entre GET et PTTL (même pipeline) ; traitée
+            # comme absente, surtout pas gardée en mémoire sans expiration
+            return None
+        # Anciennes entrées JSON et nouveaux formats : le codec lit l'en-tête
+        data = self._codec.decode_to_json(value)
+        # PTTL = -1 : clé sans expiration
+        remaining = float("inf") if pttl == -1 else pttl / 1000
+        # Le TTL local suit le TTL restant dans Redis
+        self._local.set(key, data, ttl=remaining)
+        cache_hits.inc(key_prefix(key), "redis")
+        return RawCacheEntry(data=data, stale=remaining <= stale_ttl)
+
+    async def set(self, key: str, value: dict, ttl: int = 3600, stale_ttl: int = 0) -> None:
+        """Stocker une valeur dans le cache.
+
+        Elle est fraîche pendant `ttl` secondes, puis servie périmée pendant `stale_ttl` secondes.
+        """
+        encoded, data = self._codec.encode_json(value)
+        self._local.set(key, data, ttl=ttl + stale_ttl)
+        try:
+            with span("redis"):
+                client = await self._get_client()
+                await client.set(
+                    f"lyriks:{key}",
+                    encoded,
+                    ex=ttl + stale_ttl,
+                )
+                await self._publish_invalidation("k", key)
         except Exception:
             # Si Redis n'est pas disponible, on continue sans cache
-            pass
+            cache_errors.inc(key_prefix(key), "set")
+
+    async def set_many(self, values: dict[str, dict], ttl: int = 3600, stale_ttl: int = 0) -> None:
+        """Stocker plusieurs valeurs en un aller-retour (MSET + EXPIRE dans une transaction)."""
+        if not values:
+            return
+        encoded = {}
+        for key, value in values.items():
+            encoded[key], data = self._codec.encode_json(value)
+            self._local.set(key, data, ttl=ttl + stale_ttl)
+        try:
+            client = await self._get_client()
+            with span("redis"):
+                async with client.pipeline(transaction=True) as pipe:
+                    pipe.mset({f"lyriks:{key}": value for key, value in encoded.items()})
+                    for key in encoded:
+                        pipe.expire(f"lyriks:{key}", ttl + stale_ttl)
+                        if settings.cache_local_invalidation:
+                            pipe.publish(INVALIDATION_CHANNEL, f"{self._origin}|k|{key}")
+                    await pipe.execute()
+        except Exception:
+            for key in encoded:
+                cache_errors.inc(key_prefix(key), "set")
 
     async def delete(self, key: str) -> None:
         """Supprimer une valeur du cache."""
+        self._local.delete(key)
         try:
             client = await self._get_client()
             await client.delete(f"lyriks:{key}")
+            await self._publish_invalidation("k", key)
         except Exception:
             pass
 
     async def clear_pattern(self, pattern: str) -> None:
         """Supprimer toutes les clés correspondant à un pattern."""
+        try:
+            async for _ in self.purge_pattern(pattern):
+                pass
+        except Exception:
+            pass
+
+    async def purge_pattern(
+        self,
+        pattern: str,
+        scan_count: int | None = None,
+        unlink_batch: int | None = None,
+        max_keys_per_second: float | None = None,
+    ) -> AsyncIterator[PurgeProgress]:
+        """
+        Supprimer les clés d'un pattern par petits pas, sans bloquer Redis.
+
+        SCAN (curseur, COUNT configurable) puis UNLINK par lots : la libération
+        mémoire se fait hors du thread principal de Redis. Le débit est limité
+        pour pouvoir purger en pleine charge. Produit l'avancement après chaque lot.
+        """
+        scan_count = scan_count or settings.cache_purge_scan_count
+        unlink_batch = unlink_batch or settings.cache_purge_unlink_batch
+        if max_keys_per_second is None:
+            max_keys_per_second = settings.cache_purge_max_keys_per_second
+
+        self._local.delete_pattern(pattern)
+        client = await self._get_client()
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        progress = PurgeProgress()
+        pending: list[str] = []
+        cursor = 0
+
+        while True:
+            cursor, keys = await client.scan(cursor, match=f"lyriks:{pattern}", count=scan_count)
+            progress.scanned += len(keys)
+            pending.extend(keys)
+
+            while len(pending) >= unlink_batch or (cursor == 0 and pending):
+                batch, pending = pending[:unlink_batch], pending[unlink_batch:]
+                progress.deleted += await client.unlink(*batch)
+                yield progress
+
+                # Limitation de débit : on attend si on va plus vite que prévu (0 = sans limite)
+                if max_keys_per_second <= 0:
+                    continue
+                ahead = progress.deleted / max_keys_per_second - (loop.time() - started)
+                if ahead > 0:
+                    await asyncio.sleep(ahead)
+
+            if cursor == 0:
+                break
+
+        await self._publish_invalidation("p", pattern)
+        progress.done = True
+        yield progress
+
+    async def _publish_invalidation(self, kind: str, target: str) -> None:
+        if not settings.cache_local_invalidation:
+            return
+        client = await self._get_client()
+        await client.publish(INVALIDATION_CHANNEL, f"{self._origin}|{kind}|{target}")
+
+    def _apply_invalidation(self, message: bytes | str) -> None:
+        if isinstance(message, bytes):
+            message = message.decode()
+        origin, kind, target = message.split("|", 2)
+        if origin == self._origin:
+            return
+        if kind == "p":
+            self._local.delete_pattern(target)
+        else:
+            self._local.delete(target)
+
+    async def _listen_invalidations(self) -> None:
+        while True:
+            pubsub = None
+            try:
+                client = await self._get_client()
+                pubsub = client.pubsub()
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        self._apply_invalidation(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # Redis indisponible : le cache mémoire peut avoir manqué des invalidations
+                self._local.clear()
+                await asyncio.sleep(1)
+            finally:
+                if pubsub is not None:
+                    try:
+                        await pubsub.aclose()
+                    except Exception:
+                        pass
+
+    async def acquire_lock(self, name: str, ttl: float) -> str | None:
+        """Poser un verrou court entre workers. Retourne un jeton, ou None s'il est déjà détenu."""
+        token = uuid.uuid4().hex
         try:
             client = await self._get_client()
-            keys = await client.keys(f"lyriks:{pattern}")
-            if keys:
-                await client.delete(*keys)
+            acquired = await client.set(f"lyriks:lock:{name}", token, nx=True, px=int(ttl * 1000))
+            return token if acquired else None
+        except Exception:
+            # Sans Redis, pas de coordination entre workers : l'appelant continue seul
+            return token
+
+    async def release_lock(self, name: str, token: str) -> None:
+        """Libérer un verrou et réveiller les workers qui l'attendent."""
+        try:
+            client = await self._get_client()
+            await client.eval(RELEASE_LOCK_SCRIPT, 1, f"lyriks:lock:{name}", token)
+            await client.publish(f"lyriks:lock:{name}", "released")
+        except Exception:
+            pass
+
+    async def wait_for_lock(self, name: str, timeout: float) -> None:
+        """Attendre (au plus `timeout` secondes) la libération d'un verrou détenu ailleurs."""
+        pubsub = None
+        try:
+            client = await self._get_client()
+            pubsub = client.pubsub()
+            await pubsub.subscribe(f"lyriks:lock:{name}")
+            # Le détenteur a pu terminer avant notre abonnement
+            if not await client.exists(f"lyriks:lock:{name}"):
+                return
+
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + timeout
+            while (remaining := deadline - loop.time()) > 0:
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=remaining)
+                if message is not None:
+                    return
         except Exception:
             pass
+        finally:
+            if pubsub is not None:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
 
 
 # Singleton instance
@@ -0,0 +1,150 @@
+import importlib.util
+import json
+import logging
+import zlib
+from dataclasses import dataclass
+from typing import Any, Callable
+
+logger = logging.getLogger(__name__)
+
+# En-tête des valeurs encodées : MAGIC (2 octets), version, sérialiseur, compression.
+# 0xFF ne peut pas commencer un texte JSON UTF-8 : les anciennes entrées JSON
+# (écrites avant ce format) restent reconnaissables et lisibles.
+MAGIC = b"\xffL"
+FORMAT_VERSION = 1
+HEADER_SIZE = len(MAGIC) + 3
+
+
+@dataclass(frozen=True)
+class Serializer:
+    id: int
+    dumps: Callable[[Any], bytes]
+    loads: Callable[[bytes], Any]
+    # Vrai si la sortie est déjà du JSON (servable telle quelle en HTTP)
+    is_json: bool
+
+
+@dataclass(frozen=True)
+class Compressor:
+    id: int
+    compress: Callable[[bytes], bytes]
+    decompress: Callable[[bytes], bytes]
+
+
+def _json_dumps(value: Any) -> bytes:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+SERIALIZERS: dict[str, Serializer] = {
+    "json": Serializer(id=0, dumps=_json_dumps, loads=json.loads, is_json=True),
+}
+COMPRESSORS: dict[str, Compressor] = {
+    "none": Compressor(id=0, compress=lambda data: data, decompress=lambda data: data),
+    "zlib": Compressor(
+        id=1,
+        compress=lambda data: zlib.compress(data, 6),
+        decompress=zlib.decompress,
+    ),
+}
+
+if importlib.util.find_spec("orjson"):
+    import orjson
+
+    SERIALIZERS["orjson"] = Serializer(id=1, dumps=orjson.dumps, loads=orjson.loads, is_json=True)
+
+if importlib.util.find_spec("msgpack"):
+    import msgpack
+
+    SERIALIZERS["msgpack"] = Serializer(
+        id=2,
+        dumps=msgpack.packb,
+        loads=lambda data: msgpack.unpackb(data, raw=False),
+        is_json=False,
+    )
+
+if importlib.util.find_spec("zstandard"):
+    import zstandard
+
+    _zstd_compressor = zstandard.ZstdCompressor(level=3)
+    _zstd_decompressor = zstandard.ZstdDecompressor()
+    COMPRESSORS["zstd"] = Compressor(
+        id=2,
+        compress=_zstd_compressor.compress,
+        decompress=_zstd_decompressor.decompress,
+    )
+
+if importlib.util.find_spec("lz4"):
+    import lz4.frame
+
+    COMPRESSORS["lz4"] = Compressor(id=3, compress=lz4.frame.compress, decompress=lz4.frame.decompress)
+
+# JSON le plus rapide disponible (cache mémoire, réponses HTTP)
+_fast_json = SERIALIZERS.get("orjson", SERIALIZERS["json"])
+dumps_json = _fast_json.dumps
+loads_json = _fast_json.loads
+
+_SERIALIZERS_BY_ID = {serializer.id: serializer for serializer in SERIALIZERS.values()}
+_COMPRESSORS_BY_ID = {compressor.id: compressor for compressor in COMPRESSORS.values()}
+
+
+class CacheCodec:
+    """
+    Encodage des valeurs de cache : sérialiseur + compression au-delà d'un seuil.
+
+    Le décodage lit l'en-tête et ne dépend pas de la configuration courante :
+    on peut changer de codec sans invalider le cache existant.
+    """
+
+    def __init__(self, serializer: str = "json", compression: str = "none", threshold: int = 1024):
+        self.serializer = _pick(SERIALIZERS, serializer, "json", "serializer")
+        self.compressor = _pick(COMPRESSORS, compression, "zlib", "compression")
+        self.threshold = threshold
+
+    def encode(self, value: Any) -> bytes:
+        return self.pack(self.serializer.dumps(value))
+
+    def encode_json(self, value: Any) -> tuple[bytes, bytes]:
+        """Retourne (valeur encodée, valeur en JSON) en ne sérialisant qu'une fois si possible."""
+        if self.serializer.is_json:
+            data = self.serializer.dumps(value)
+            return self.pack(data), data
+        return self.encode(value), dumps_json(value)
+
+    def pack(self, data: bytes) -> bytes:
+        """Ajouter l'en-tête (et compresser) des données déjà sérialisées par `self.serializer`."""
+        compressor = COMPRESSORS["none"]
+        if len(data) >= self.threshold:
+            compressor = self.compressor
+            data = compressor.compress(data)
+        header = MAGIC + bytes((FORMAT_VERSION, self.serializer.id, compressor.id))
+        return header + data
+
+    def decode(self, data: bytes) -> Any:
+        serializer, payload = self._unpack(data)
+        return serializer.loads(payload)
+
+    def decode_to_json(self, data: bytes) -> bytes:
+        """Valeur sous forme de JSON (sans re-sérialisation si elle est déjà stockée en JSON)."""
+        serializer, payload = self._unpack(data)
+        if serializer.is_json:
+            return payload
+        return dumps_json(serializer.loads(payload))
+
+    def _unpack(self, data: bytes) -> tuple[Serializer, bytes]:
+        if isinstance(data, str):
+            data = data.encode()
+        if not data.startswith(MAGIC):
+            # Ancienne entrée : texte JSON brut
+            return SERIALIZERS["json"], data
+        version, serializer_id, compressor_id = data[len(MAGIC):HEADER_SIZE]
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported cache format version {version}")
+        payload = _COMPRESSORS_BY_ID[compressor_id].decompress(data[HEADER_SIZE:])
+        return _SERIALIZERS_BY_ID[serializer_id], payload
+
+
+def _pick(available: dict, name: str, fallback: str, kind: str):
+    if name in available:
+        return available[name]
+    logger.warning("Cache %s %r is not available, falling back to %r", kind, name, fallback)
+    return available[fallback]
@@ -1,25 +1,91 @@
+import asyncio
+import math
+
 import httpx
+
 from app.config import settings
+from app.services.breaker import breakers
+from app.services.cache import cache_service
+from app.services.http import http_clients
+from app.services.scheduler import schedulers
+from app.utils.text import normalize_text
+
+
+def page_cache_key(query: str, page: int, per_page: int) -> str:
+    """Clé d'une page de résultats Genius, partagée par toutes les valeurs de `limit`."""
+    query = normalize_text(query, accents=not settings.search_fold_accents)
+    return f"genius:page:{per_page}:{page}:{query}"
+
 
 class GeniusClient:
     BASE_URL = "https://api.genius.com"
 
     def __init__(self):
         self._token = settings.genius_access_token
+        http_clients.register("genius", timeout=settings.genius_timeout, prewarm_url=self.BASE_URL)
+        breakers.register("genius", max_timeout=settings.genius_timeout)
+        schedulers.register("genius", rps=settings.genius_max_rps)
 
     async def search_songs(self, query: str, limit: int = 20) -> list[dict]:
-        """Search for songs on Genius."""
-        async with httpx.AsyncClient() as client:
+        """
+        Search for songs on Genius.
+
+        Genius plafonne la taille des pages : les pages nécessaires sont
+        demandées en parallèle, fusionnées dans l'ordre et dédoublonnées par
+        id. On s'arrête dès que `limit` chansons sont réunies ou que Genius
+        n'a plus de résultats ; des pages supplémentaires ne sont demandées
+        que si des hits non-chansons ont laissé la liste incomplète.
+        """
+        per_page = settings.genius_page_size
+        songs: dict[int, dict] = {}
+        page = 1
+        while len(songs) < limit and page <= settings.genius_max_pages:
+            count = min(math.ceil((limit - len(songs)) / per_page), settings.genius_max_pages - page + 1)
+            tasks = [
+                asyncio.ensure_future(self._search_page(query, number, per_page))
+                for number in range(page, page + count)
+            ]
+            try:
+                for task in tasks:
+                    results, more = await task
+                    for result in results:
+                        songs.setdefault(result["id"], result)
+                    if len(songs) >= limit or not more:
+                        return list(songs.values())[:limit]
+            finally:
+                for task in tasks:
+                    if not task.done():
+                        task.cancel()
+                    elif not task.cancelled():
+                        # Erreur d'une page devenue inutile : ne pas la laisser non récupérée
+                        task.exception()
+            page += count
+        return list(songs.values())[:limit]
+
+    async def _search_page(self, query: str, page: int, per_page: int) -> tuple[list[dict], bool]:
+        """Chansons d'une page et s'il peut en exister une suivante (page pleine)."""
+        cache_key = page_cache_key(query, page, per_page)
+        cached = await cache_service.get(cache_key)
+        if cached is not None:
+            return cached["songs"], cached["more"]
+
+        async def request() -> httpx.Response:
+            client = http_clients.get("genius")
             response = await client.get(
                 f"{self.BASE_URL}/search",
-                params={"q": query, "per_page": limit},
+                params={"q": query, "per_page": per_page, "page": page},
                 headers={"Authorization": f"Bearer {self._token}"},
             )
             response.raise_for_status()
-            data = response.json()
+            return response
+
+        data = (await schedulers.call("genius", lambda: breakers.call("genius", request))).json()
 
-            hits = data.get("response", {}).get("hits", [])
-            return [hit["result"] for hit in hits if hit.get("type") == "song"]
+        hits = data.get("response", {}).get("hits", [])
+        songs = [hit["result"] for hit in hits if hit.get("type") == "song"]
+        more = len(hits) >= per_page
+        await cache_service.set(cache_key, {"songs": songs, "more": more}, ttl=settings.search_cache_ttl)
+        return songs, more
 
 
 # Singleton instance
@@ -0,0 +1,138 @@
+import asyncio
+import importlib.util
+import logging
+import time
+from dataclasses import dataclass
+
+import httpx
+
+from app.config import settings
+from app.services.metrics import upstream_errors, upstream_in_flight, upstream_request_duration
+from app.services.timing import span
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class UpstreamConfig:
+    timeout: float
+    prewarm_url: str | None = None
+    transport: httpx.AsyncBaseTransport | None = None
+
+
+class InstrumentedTransport(httpx.AsyncBaseTransport):
+    """Mesure chaque appel upstream (latence jusqu'aux en-têtes, erreurs, appels en cours, Server-Timing)."""
+
+    def __init__(self, upstream: str, transport: httpx.AsyncBaseTransport):
+        self.upstream = upstream
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        upstream_in_flight.inc(self.upstream)
+        started = time.perf_counter()
+        try:
+            with span(self.upstream):
+                response = await self._transport.handle_async_request(request)
+        except httpx.TimeoutException:
+            upstream_errors.inc(self.upstream, "timeout")
+            raise
+        except httpx.TransportError:
+            upstream_errors.inc(self.upstream, "transport")
+            raise
+        finally:
+            upstream_in_flight.dec(self.upstream)
+        upstream_request_duration.observe(time.perf_counter() - started, self.upstream)
+        if response.status_code >= 500:
+            upstream_errors.inc(self.upstream, "5xx")
+        elif response.status_code == 429:
+            upstream_errors.inc(self.upstream, "429")
+        return response
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+class HttpClientRegistry:
+    """Clients httpx longue durée, un pool de connexions par upstream."""
+
+    def __init__(self):
+        self._configs: dict[str, UpstreamConfig] = {}
+        self._clients: dict[str, httpx.AsyncClient] = {}
+
+    def register(
+        self,
+        name: str,
+        timeout: float,
+        prewarm_url: str | None = None,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ) -> None:
+        """Déclarer un upstream. Le client est créé au démarrage ou au premier usage."""
+        self._configs[name] = UpstreamConfig(
+            timeout=timeout,
+            prewarm_url=prewarm_url,
+            transport=transport,
+        )
+
+    def get(self, name: str) -> httpx.AsyncClient:
+        """Récupérer le client partagé d'un upstream."""
+        client = self._clients.get(name)
+        if client is None or client.is_closed:
+            client = self._clients[name] = self._build(name, self._configs[name])
+        return client
+
+    async def start(self) -> None:
+        """Créer tous les clients et préchauffer leurs connexions."""
+        for name in self._configs:
+            self.get(name)
+        await asyncio.gather(
+            *(self._prewarm(name, config) for name, config in self._configs.items())
+        )
+
+    async def close(self) -> None:
+        """Fermer tous les clients (arrêt de l'application)."""
+        clients = list(self._clients.values())
+        self._clients.clear()
+        await asyncio.gather(*(client.aclose() for client in clients), return_exceptions=True)
+
+    def _build(self, name: str, config: UpstreamConfig) -> httpx.AsyncClient:
+        transport = config.transport or httpx.AsyncHTTPTransport(
+            limits=httpx.Limits(
+                max_connections=settings.http_max_connections,
+                max_keepalive_connections=settings.http_max_keepalive_connections,
+                keepalive_expiry=settings.http_keepalive_expiry,
+            ),
+            http2=_http2_enabled(),
+        )
+        return httpx.AsyncClient(
+            timeout=httpx.Timeout(config.timeout, connect=settings.http_connect_timeout),
+            transport=InstrumentedTransport(name, transport),
+        )
+
+    async def _prewarm(self, name: str, config: UpstreamConfig) -> None:
+        """Ouvrir quelques connexions (TCP + TLS) pour que les premières requêtes les réutilisent."""
+        if not config.prewarm_url or settings.http_prewarm_connections <= 0:
+            return
+        client = self.get(name)
+        results = await asyncio.gather(
+            *(
+                client.head(config.prewarm_url)
+                for _ in range(settings.http_prewarm_connections)
+            ),
+            return_exceptions=True,
+        )
+        errors = [r for r in results if isinstance(r, Exception)]
+        if errors:
+            logger.warning("Prewarm %s failed: %s", name, errors[0])
+
+
+def _http2_enabled() -> bool:
+    if not settings.http_http2:
+        return False
+    if importlib.util.find_spec("h2") is None:
+        logger.warning("HTTP_HTTP2 is enabled but the 'h2' package is not installed")
+        return False
+    return True
+
+
+# Singleton instance
+http_clients = HttpClientRegistry()
@@ -0,0 +1,345 @@
+import asyncio
+import hashlib
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Inutile de réécrire la date d'accès à chaque hit : la précision LRU suffit
+ACCESS_UPDATE_INTERVAL = 60
+# Fichiers temporaires abandonnés (téléchargement interrompu, crash)
+ORPHAN_TEMP_AGE = 3600
+# Chunks accumulés avant une écriture disque (faite hors de l'event loop)
+WRITE_BUFFER_BYTES = 256 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+    url TEXT PRIMARY KEY,
+    digest TEXT NOT NULL,
+    content_type TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    fetched_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS images_accessed_at ON images (accessed_at);
+CREATE INDEX IF NOT EXISTS images_digest ON images (digest);
+"""
+
+
+@dataclass
+class StoredImage:
+    url: str
+    digest: str
+    content_type: str
+    size: int
+    etag: str | None
+    last_modified: str | None
+    fetched_at: float
+    accessed_at: float
+    path: Path
+
+    @property
+    def fresh(self) -> bool:
+        return time.time() - self.fetched_at < settings.image_cache_ttl
+
+    @property
+    def client_etag(self) -> str:
+        """ETag exposé aux navigateurs : dérivé du contenu, stable entre instances."""
+        return f'"{self.digest[:32]}"'
+
+    def validators(self) -> dict[str, str]:
+        """En-têtes de requête conditionnelle vers l'upstream."""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class ImageWriter:
+    """
+    Fichier temporaire + empreinte SHA-256 calculée au fil de l'écriture.
+
+    `write` est bloquant (à appeler depuis un thread) ; depuis l'event loop,
+    `append` regroupe les chunks et les écrit par lots via `asyncio.to_thread`.
+    """
+
+    def __init__(self, directory: Path):
+        directory.mkdir(parents=True, exist_ok=True)
+        fd, name = tempfile.mkstemp(dir=directory, suffix=".part")
+        self._file = os.fdopen(fd, "wb")
+        self._hash = hashlib.sha256()
+        self.path = Path(name)
+        self.size = 0
+        self._buffer: list[bytes] = []
+        self._buffered = 0
+
+    def write(self, chunk: bytes) -> None:
+        self._file.write(chunk)
+        self._hash.update(chunk)
+        self.size += len(chunk)
+
+    async def append(self, chunk: bytes) -> None:
+        self._buffer.append(chunk)
+        self._buffered += len(chunk)
+        if self._buffered >= WRITE_BUFFER_BYTES:
+            await self.flush()
+
+    async def flush(self) -> None:
+        if not self._buffer:
+            return
+        data = b"".join(self._buffer)
+        self._buffer.clear()
+        self._buffered = 0
+        await asyncio.to_thread(self.write, data)
+
+    @property
+    def digest(self) -> str:
+        return self._hash.hexdigest()
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self._file.close()
+
+    def discard(self) -> None:
+        self.close()
+        self.path.unlink(missing_ok=True)
+
+
+class ImageStore:
+    """
+    Cache disque des artworks, adressé par contenu.
+
+    Les fichiers vivent sous `objects/<aa>/<sha256>` ; un index SQLite local
+    associe chaque URL source à son fichier, ses validateurs HTTP (ETag,
+    Last-Modified) et sa date de dernier accès pour l'éviction LRU.
+    """
+
+    def __init__(self, directory: str | Path, max_bytes: int):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._db: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+        self._sweeper: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        """Lancer le balayage périodique (éviction LRU)."""
+        if self._sweeper is None:
+            self._sweeper = asyncio.create_task(self._sweep_periodically())
+
+    async def close(self) -> None:
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            try:
+                await self._sweeper
+            except asyncio.CancelledError:
+                pass
+            self._sweeper = None
+        self._disconnect()
+
+    def writer(self) -> ImageWriter:
+        return ImageWriter(self.directory / "tmp")
+
+    async def lookup(self, url: str) -> StoredImage | None:
+        return await asyncio.to_thread(self._lookup, url)
+
+    async def commit(
+        self,
+        url: str,
+        writer: ImageWriter,
+        content_type: str,
+        etag: str | None = None,
+        last_modified: str | None = None,
+    ) -> StoredImage:
+        """Déplacer le fichier écrit vers son emplacement définitif et l'indexer."""
+        await writer.flush()
+        writer.close()
+        return await asyncio.to_thread(
+            self._commit, url, writer, content_type, etag, last_modified
+        )
+
+    async def revalidated(
+        self,
+        image: StoredImage,
+        etag: str | None = None,
+        last_modified: str | None = None,
+    ) -> StoredImage:
+        """L'upstream a répondu 304 : la copie locale redevient fraîche."""
+        return await asyncio.to_thread(self._revalidated, image, etag, last_modified)
+
+    async def sweep(self) -> int:
+        """Évincer les images les moins récemment utilisées. Retourne les octets libérés."""
+        return await asyncio.to_thread(self._sweep)
+
+    def object_path(self, digest: str) -> Path:
+        return self.directory / "objects" / digest[:2] / digest
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(
+                self.directory / "index.sqlite3",
+                check_same_thread=False,
+                isolation_level=None,
+            )
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript(SCHEMA)
+        return self._db
+
+    def _disconnect(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def _row_to_image(self, row: tuple) -> StoredImage:
+        url, digest, content_type, size, etag, last_modified, fetched_at, accessed_at = row
+        return StoredImage(
+            url=url,
+            digest=digest,
+            content_type=content_type,
+            size=size,
+            etag=etag,
+            last_modified=last_modified,
+            fetched_at=fetched_at,
+            accessed_at=accessed_at,
+            path=self.object_path(digest),
+        )
+
+    def _lookup(self, url: str) -> StoredImage | None:
+        with self._lock:
+            db = self._connect()
+            row = db.execute(
+                "SELECT url, digest, content_type, size, etag, last_modified, fetched_at, accessed_at "
+                "FROM images WHERE url = ?",
+                (url,),
+            ).fetchone()
+            if row is None:
+                return None
+            image = self._row_to_image(row)
+            if not image.path.exists():
+                # Fichier supprimé hors de l'application : l'entrée est obsolète
+                db.execute("DELETE FROM images WHERE url = ?", (url,))
+                return None
+            now = time.time()
+            if now - image.accessed_at > ACCESS_UPDATE_INTERVAL:
+                db.execute("UPDATE images SET accessed_at = ? WHERE url = ?", (now, url))
+                image.accessed_at = now
+            return image
+
+    def _commit(
+        self,
+        url: str,
+        writer: ImageWriter,
+        content_type: str,
+        etag: str | None,
+        last_modified: str | None,
+    ) -> StoredImage:
+        digest = writer.digest
+        path = self.object_path(digest)
+        if path.exists():
+            # Même contenu déjà stocké (autre URL ou re-téléchargement)
+            writer.discard()
+        else:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(writer.path, path)
+
+        now = time.time()
+        with self._lock:
+            self._connect().execute(
+                "INSERT OR REPLACE INTO images "
+                "(url, digest, content_type, size, etag, last_modified, fetched_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, digest, content_type, writer.size, etag, last_modified, now, now),
+            )
+        return StoredImage(
+            url=url,
+            digest=digest,
+            content_type=content_type,
+            size=writer.size,
+            etag=etag,
+            last_modified=last_modified,
+            fetched_at=now,
+            accessed_at=now,
+            path=path,
+        )
+
+    def _revalidated(
+        self,
+        image: StoredImage,
+        etag: str | None,
+        last_modified: str | None,
+    ) -> StoredImage:
+        image.fetched_at = time.time()
+        image.etag = etag or image.etag
+        image.last_modified = last_modified or image.last_modified
+        with self._lock:
+            self._connect().execute(
+                "UPDATE images SET fetched_at = ?, etag = ?, last_modified = ? WHERE url = ?",
+                (image.fetched_at, image.etag, image.last_modified, image.url),
+            )
+        return image
+
+    def _sweep(self) -> int:
+        now = time.time()
+        for temp in (self.directory / "tmp").glob("*.part"):
+            try:
+                if now - temp.stat().st_mtime > ORPHAN_TEMP_AGE:
+                    temp.unlink()
+            except OSError:
+                pass
+
+        with self._lock:
+            db = self._connect()
+            # Un même contenu peut être partagé par plusieurs URLs : on compte chaque fichier une fois
+            (total,) = db.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM (SELECT DISTINCT digest, size FROM images)"
+            ).fetchone()
+            if total <= self.max_bytes:
+                return 0
+
+            # Descendre sous 90 % du plafond pour ne pas balayer à chaque passage
+            target = int(self.max_bytes * 0.9)
+            freed = 0
+            rows = db.execute(
+                "SELECT url, digest, size FROM images ORDER BY accessed_at"
+            ).fetchall()
+            for url, digest, size in rows:
+                if total - freed <= target:
+                    break
+                db.execute("DELETE FROM images WHERE url = ?", (url,))
+                still_used = db.execute(
+                    "SELECT 1 FROM images WHERE digest = ? LIMIT 1", (digest,)
+                ).fetchone()
+                if not still_used:
+                    self.object_path(digest).unlink(missing_ok=True)
+                    freed += size
+            return freed
+
+    async def _sweep_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(settings.image_cache_sweep_interval)
+            try:
+                freed = await self.sweep()
+                if freed:
+                    logger.info("Image cache sweep freed %d bytes", freed)
+            except Exception:
+                logger.exception("Image cache sweep failed")
+
+
+# Singleton instance
+image_store = ImageStore(
+    directory=settings.image_cache_dir,
+    max_bytes=settings.image_cache_max_bytes,
+)
@@ -0,0 +1,158 @@
+import asyncio
+import io
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Literal
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from app.config import settings
+from app.services.image_store import ImageStore, StoredImage, image_store
+
+ImageFit = Literal["cover", "contain"]
+ImageFormat = Literal["webp", "avif", "jpeg", "png"]
+
+# Format Pillow et type MIME de chaque format de sortie
+OUTPUT_FORMATS: dict[str, tuple[str, str]] = {
+    "webp": ("WEBP", "image/webp"),
+    "avif": ("AVIF", "image/avif"),
+    "jpeg": ("JPEG", "image/jpeg"),
+    "png": ("PNG", "image/png"),
+}
+
+
+def source_format(content_type: str) -> ImageFormat:
+    """Format de sortie qui garde celui de la source (PNG, sans perte, pour GIF & co)."""
+    for name, (_, mime) in OUTPUT_FORMATS.items():
+        if mime == content_type:
+            return name
+    return "jpeg" if content_type == "image/jpg" else "png"
+
+
+class UnsupportedImageError(Exception):
+    """Image source illisible ou format de sortie indisponible."""
+
+
+@dataclass(frozen=True)
+class ImageVariant:
+    width: int | None = None
+    height: int | None = None
+    fit: ImageFit = "cover"
+    format: ImageFormat = "webp"
+    quality: int = 80
+
+    @property
+    def key(self) -> str:
+        return f"w={self.width or ''}&h={self.height or ''}&fit={self.fit}&f={self.format}&q={self.quality}"
+
+    @property
+    def content_type(self) -> str:
+        return OUTPUT_FORMATS[self.format][1]
+
+
+def render_variant(source_path: str, variant: ImageVariant) -> bytes:
+    """Redimensionner et ré-encoder une image (exécuté dans un process du pool)."""
+    pil_format = OUTPUT_FORMATS[variant.format][0]
+    if pil_format not in Image.registered_extensions().values():
+        raise UnsupportedImageError(f"Output format {variant.format} is not available")
+
+    try:
+        with Image.open(source_path) as image:
+            return _render(image, variant, pil_format)
+    except (UnidentifiedImageError, OSError) as e:
+        # Fichier non décodable par Pillow (SVG, image tronquée, ...)
+        raise UnsupportedImageError(str(e)) from e
+
+
+def _render(image: Image.Image, variant: ImageVariant, pil_format: str) -> bytes:
+    target = _target_size(image.size, variant)
+    # JPEG : décodage directement à une résolution réduite (beaucoup plus rapide)
+    image.draft(image.mode, target)
+    image = ImageOps.exif_transpose(image)
+
+    if variant.fit == "cover" and variant.width and variant.height:
+        image = ImageOps.fit(image, target, Image.Resampling.LANCZOS)
+    elif target != image.size:
+        image = image.resize(target, Image.Resampling.LANCZOS)
+
+    if pil_format == "JPEG" and image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+
+    buffer = io.BytesIO()
+    image.save(buffer, format=pil_format, quality=variant.quality)
+    return buffer.getvalue()
+
+
+def _target_size(size: tuple[int, int], variant: ImageVariant) -> tuple[int, int]:
+    width, height = size
+    if variant.width and variant.height:
+        if variant.fit == "cover":
+            return variant.width, variant.height
+        scale = min(variant.width / width, variant.height / height)
+    elif variant.width:
+        scale = variant.width / width
+    elif variant.height:
+        scale = variant.height / height
+    else:
+        return width, height
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+class ImageTransformer:
+    """
+    Génère les variantes d'artwork sur un pool de processus borné.
+
+    Le travail CPU (décodage, redimensionnement, encodage) ne bloque jamais
+    l'event loop ; les variantes sont mises en cache par (source, variante).
+    """
+
+    def __init__(self, store: ImageStore, workers: int):
+        self._store = store
+        self._workers = workers
+        self._pool: ProcessPoolExecutor | None = None
+        # Évite de saturer le pool : les requêtes en trop attendent ici
+        self._slots = asyncio.Semaphore(workers * 2)
+        self._inflight: dict[str, asyncio.Task] = {}
+
+    async def get_variant(self, source: StoredImage, variant: ImageVariant) -> StoredImage:
+        # Clé dérivée du contenu source : une source modifiée produit de nouvelles variantes
+        key = f"variant:{source.digest}:{variant.key}"
+        stored = await self._store.lookup(key)
+        if stored is not None:
+            return stored
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._render(key, source, variant))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    async def _render(self, key: str, source: StoredImage, variant: ImageVariant) -> StoredImage:
+        async with self._slots:
+            loop = asyncio.get_running_loop()
+            content = await loop.run_in_executor(
+                self._get_pool(), render_variant, str(source.path), variant
+            )
+
+        writer = self._store.writer()
+        try:
+            await writer.append(content)
+        except BaseException:
+            writer.discard()
+            raise
+        return await self._store.commit(key, writer, content_type=variant.content_type)
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self._workers)
+        return self._pool
+
+
+# Singleton instance
+image_transformer = ImageTransformer(image_store, workers=settings.image_transform_workers)
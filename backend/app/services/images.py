@@ -0,0 +1,170 @@
+import asyncio
+import base64
+import logging
+from collections.abc import AsyncIterator
+
+import httpx
+
+from app.config import settings
+from app.services.http import http_clients
+from app.services.image_store import ImageWriter, StoredImage, image_store
+
+logger = logging.getLogger(__name__)
+
+# Les artworks Genius sont servis depuis images.genius.com
+http_clients.register("image", timeout=settings.image_timeout, prewarm_url="https://images.genius.com")
+
+# Multiple de 3 : les blocs base64 se concatènent sans padding intermédiaire
+BASE64_CHUNK_SIZE = 3 * 16 * 1024
+
+# Valid image MIME types
+VALID_IMAGE_TYPES = {
+    "image/jpeg",
+    "image/jpg",
+    "image/png",
+    "image/gif",
+    "image/webp",
+    "image/svg+xml",
+}
+
+
+class ImageRejectedError(Exception):
+    """L'upstream a répondu, mais l'image n'est pas acceptable (type ou taille)."""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def base_content_type(response: httpx.Response) -> str:
+    """Type MIME sans paramètres (charset, etc.)."""
+    return response.headers.get("content-type", "").split(";")[0].strip().lower()
+
+
+async def open_image(url: str, headers: dict[str, str] | None = None) -> httpx.Response:
+    """
+    Ouvrir une image upstream en streaming.
+
+    Le statut, le Content-Type et le Content-Length sont vérifiés avant de lire
+    le corps. L'appelant doit fermer la réponse (`aclose`).
+    """
+    client = http_clients.get("image")
+    request = client.build_request("GET", url, headers=headers)
+    response = await client.send(request, stream=True, follow_redirects=True)
+    try:
+        response.raise_for_status()
+
+        content_type = base_content_type(response)
+        if content_type and content_type not in VALID_IMAGE_TYPES:
+            raise ImageRejectedError(415, f"URL does not point to a valid image (got {content_type})")
+
+        content_length = response.headers.get("content-length")
+        if content_length and content_length.isdigit() and int(content_length) > settings.image_max_bytes:
+            raise ImageRejectedError(413, "Image too large")
+    except BaseException:
+        await response.aclose()
+        raise
+    return response
+
+
+async def iter_image(response: httpx.Response) -> AsyncIterator[bytes]:
+    """Itérer sur le corps par chunks en imposant la taille maximale."""
+    received = 0
+    async for chunk in response.aiter_bytes(settings.image_chunk_size):
+        received += len(chunk)
+        if received > settings.image_max_bytes:
+            # Content-Length absent ou mensonger : on interrompt la lecture
+            raise ImageRejectedError(413, "Image too large")
+        yield chunk
+
+
+async def iter_and_store(url: str, response: httpx.Response) -> AsyncIterator[bytes]:
+    """Relayer le corps tout en l'écrivant dans le cache disque (indexé une fois complet)."""
+    writer = image_store.writer()
+    try:
+        async for chunk in iter_image(response):
+            # Écriture disque par lots, dans un thread : jamais sur l'event loop
+            await writer.append(chunk)
+            yield chunk
+    except BaseException:
+        writer.discard()
+        raise
+
+    try:
+        await image_store.commit(
+            url,
+            writer,
+            content_type=base_content_type(response) or "image/jpeg",
+            etag=response.headers.get("etag"),
+            last_modified=response.headers.get("last-modified"),
+        )
+    except Exception:
+        # Le client a reçu l'image ; seule la mise en cache est perdue
+        writer.discard()
+        logger.exception("Failed to store image %s", url)
+
+
+async def get_image(url: str) -> StoredImage:
+    """
+    Garantir qu'une image est dans le cache disque et la retourner.
+
+    Une copie périmée est revalidée (ETag / Last-Modified) ; si l'upstream est
+    indisponible, elle est servie telle quelle.
+    """
+    stored = await image_store.lookup(url)
+    if stored is not None and stored.fresh:
+        return stored
+
+    try:
+        response = await open_image(url, headers=stored.validators() if stored else None)
+    except httpx.HTTPError:
+        if stored is not None:
+            return stored
+        raise
+
+    try:
+        if response.status_code == 304 and stored is not None:
+            return await image_store.revalidated(
+                stored,
+                etag=response.headers.get("etag"),
+                last_modified=response.headers.get("last-modified"),
+            )
+        async for _ in iter_and_store(url, response):
+            pass
+    finally:
+        await response.aclose()
+
+    stored = await image_store.lookup(url)
+    if stored is None:
+        raise httpx.HTTPError(f"Failed to store image {url}")
+    return stored
+
+
+async def get_data_uri_json(image: StoredImage) -> StoredImage:
+    """
+    Corps JSON `{"data_uri": "data:...;base64,..."}` d'une image, pré-sérialisé sur disque.
+
+    Encodé une fois par contenu, par blocs : l'image n'est jamais entièrement en mémoire.
+    """
+    key = f"base64:{image.digest}:{image.content_type}"
+    stored = await image_store.lookup(key)
+    if stored is not None:
+        return stored
+
+    # Deux encodages concurrents produisent le même fichier (adressé par contenu) : sans risque
+    writer = image_store.writer()
+    try:
+        await asyncio.to_thread(_write_data_uri_json, image, writer)
+    except BaseException:
+        writer.discard()
+        raise
+    return await image_store.commit(key, writer, content_type="application/json")
+
+
+def _write_data_uri_json(image: StoredImage, writer: ImageWriter) -> None:
+    writer.write(f'{{"data_uri":"data:{image.content_type};base64,'.encode())
+    with open(image.path, "rb") as source:
+        while chunk := source.read(BASE64_CHUNK_SIZE):
+            writer.write(base64.b64encode(chunk))
+    writer.write(b'"}')
@@ -1,9 +1,59 @@
+import asyncio
+from difflib import SequenceMatcher
+
 import httpx
 
+from app.config import settings
+from app.services.breaker import breakers
+from app.services.http import http_clients
+from app.services.scheduler import schedulers
+from app.utils.text import normalize_text
+
+
+def similarity(a: str | None, b: str | None) -> float:
+    """Similarité 0..1 entre deux titres ou noms d'artiste (casse, accents et espaces ignorés)."""
+    a, b = normalize_text(a or ""), normalize_text(b or "")
+    if not a or not b:
+        return 0.0
+    if a == b:
+        return 1.0
+    return SequenceMatcher(None, a, b).ratio()
+
+
+def score_candidate(
+    candidate: dict,
+    track_name: str,
+    artist_name: str,
+    duration: int | None = None,
+) -> float:
+    """
+    Pertinence 0..1 d'un résultat `/search` pour la chanson demandée.
+
+    Titre et artiste dominent ; une durée proche et des paroles synchronisées
+    départagent les versions (live, remaster, ...) d'un même titre.
+    """
+    score = 0.45 * similarity(candidate.get("trackName"), track_name)
+    score += 0.35 * similarity(candidate.get("artistName"), artist_name)
+    if duration and candidate.get("duration"):
+        # Pleine note à durée égale, nulle au-delà de 10 secondes d'écart
+        score += 0.1 * max(0.0, 1 - abs(candidate["duration"] - duration) / 10)
+    elif not duration:
+        score += 0.05
+    if candidate.get("syncedLyrics"):
+        score += 0.1
+    elif candidate.get("plainLyrics"):
+        score += 0.05
+    return score
+
 
 class LrclibClient:
     BASE_URL = "https://lrclib.net/api"
 
+    def __init__(self):
+        http_clients.register("lrclib", timeout=settings.lrclib_timeout, prewarm_url=self.BASE_URL)
+        breakers.register("lrclib", max_timeout=settings.lrclib_timeout)
+        schedulers.register("lrclib", rps=settings.lrclib_max_rps)
+
     async def get_lyrics(
         self,
         track_name: str,
@@ -11,35 +61,103 @@ class LrclibClient:
         album_name: str | None = None,
         duration: int | None = None,
     ) -> dict | None:
-        """Récupérer les lyrics d'une chanson."""
-        async with httpx.AsyncClient() as client:
-            # Méthode 1: Recherche par métadonnées exactes (requires all 4 params)
-            if album_name and duration:
-                response = await client.get(
-                    f"{self.BASE_URL}/get",
-                    params={
-                        "track_name": track_name,
-                        "artist_name": artist_name,
-                        "album_name": album_name,
-                        "duration": duration,
-                    },
-                )
-
-                if response.status_code == 200:
-                    return response.json()
-
-            # Méthode 2: Recherche fallback
-            search_response = await client.get(
-                f"{self.BASE_URL}/search",
-                params={"q": f"{artist_name} {track_name}"},
-            )
-
-            if search_response.status_code == 200:
-                results = search_response.json()
-                if results:
-                    return results[0]
-
-            return None
+        """
+        Récupérer les lyrics d'une chanson.
+
+        Avec toutes les métadonnées, `/get` (correspondance exacte) est lancé
+        d'abord, puis `/search` si `/get` n'a pas répondu après
+        `lrclib_hedge_delay` secondes (0 : les deux en parallèle). La première
+        réponse acceptable l'emporte et l'autre requête est annulée.
+        """
+        # Sans album ni durée, /get est impossible : recherche seule
+        if not (album_name and duration):
+            best, _ = await self._search(track_name, artist_name, duration)
+            return best
+
+        # Méthode 1: Recherche par métadonnées exactes (requires all 4 params)
+        exact = asyncio.ensure_future(self._get(track_name, artist_name, album_name, duration))
+        fallback: asyncio.Task | None = None
+        try:
+            done, _ = await asyncio.wait({exact}, timeout=settings.lrclib_hedge_delay)
+            if exact in done and exact.exception() is None and exact.result() is not None:
+                return exact.result()
+
+            # Méthode 2: Recherche fallback, en course avec /get s'il n'a pas encore répondu
+            fallback = asyncio.ensure_future(self._search(track_name, artist_name, duration))
+            pending = {exact, fallback} - done
+            best = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        continue
+                    if task is exact and task.result() is not None:
+                        return task.result()
+                    if task is fallback:
+                        best, acceptable = task.result()
+                        if acceptable:
+                            return best
+
+            errors = [task.exception() for task in (exact, fallback) if task.exception() is not None]
+            if best is None and len(errors) == 2:
+                # Les deux méthodes ont échoué : erreur upstream
+                raise errors[0]
+            # Aucune réponse acceptable : le meilleur candidat faute de mieux
+            return best
+        finally:
+            for task in (exact, fallback):
+                if task is not None and not task.done():
+                    task.cancel()
+
+    async def _get(
+        self,
+        track_name: str,
+        artist_name: str,
+        album_name: str,
+        duration: int,
+    ) -> dict | None:
+        response = await self._request(
+            "/get",
+            {
+                "track_name": track_name,
+                "artist_name": artist_name,
+                "album_name": album_name,
+                "duration": duration,
+            },
+        )
+        if response.status_code == 200:
+            return response.json()
+        return None
+
+    async def _search(
+        self,
+        track_name: str,
+        artist_name: str,
+        duration: int | None,
+    ) -> tuple[dict | None, bool]:
+        """Meilleur candidat de `/search` et s'il atteint `lrclib_min_score`."""
+        response = await self._request("/search", {"q": f"{artist_name} {track_name}"})
+        if response.status_code != 200:
+            return None, False
+        results = response.json()
+        if not results:
+            return None, False
+        # À score égal, l'ordre de lrclib départage (max garde le premier)
+        scored = [(score_candidate(c, track_name, artist_name, duration), c) for c in results]
+        score, best = max(scored, key=lambda item: item[0])
+        return best, score >= settings.lrclib_min_score
+
+    async def _request(self, path: str, params: dict) -> httpx.Response:
+        """Appel lrclib (ordonnanceur puis disjoncteur) ; un 404 est une réponse normale, un 5xx ou un 429 une erreur."""
+
+        async def request() -> httpx.Response:
+            client = http_clients.get("lrclib")
+            response = await client.get(f"{self.BASE_URL}{path}", params=params)
+            if response.status_code >= 500 or response.status_code == 429:
+                response.raise_for_status()
+            return response
+
+        return await schedulers.call("lrclib", lambda: breakers.call("lrclib", request))
 
 
 # Singleton instance
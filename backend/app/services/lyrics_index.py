@@ -0,0 +1,81 @@
+from bisect import bisect_right
+from collections import OrderedDict
+
+from app.config import settings
+from app.services.codecs import loads_json
+
+
+class PassageIndex:
+    """
+    Réponse lyrics parsée + timestamps triés, pour extraire un passage par bisection.
+
+    La ligne `i` couvre l'intervalle `[timestamps[i], timestamps[i + 1])`.
+    """
+
+    def __init__(self, payload: dict):
+        self.payload = payload
+        lyrics = payload.get("lyrics") or {}
+        self.lines: list[dict] = lyrics.get("lines") or []
+        self.synced: bool = bool(lyrics.get("synced"))
+        if self.synced:
+            # Le parseur trie déjà ; les entrées plus anciennes du cache ne le garantissent pas
+            self.timed_lines = sorted(
+                (line for line in self.lines if line.get("timestamp") is not None),
+                key=lambda line: line["timestamp"],
+            )
+        else:
+            self.timed_lines = []
+        self.timestamps: list[float] = [line["timestamp"] for line in self.timed_lines]
+
+    def line_range(self, start: int, end: int | None) -> list[dict]:
+        """Lignes d'index `start` (inclus) à `end` (exclu)."""
+        return self.lines[start:end]
+
+    def window(self, start: float, end: float) -> list[dict]:
+        """Lignes affichées à un moment quelconque de `[start, end]`."""
+        first = max(bisect_right(self.timestamps, start) - 1, 0)
+        last = bisect_right(self.timestamps, end)
+        return self.timed_lines[first:last]
+
+    def at(self, timestamp: float) -> list[dict]:
+        """Ligne affichée à l'instant `timestamp` (aucune avant la première ligne)."""
+        position = bisect_right(self.timestamps, timestamp) - 1
+        return self.timed_lines[position:position + 1] if position >= 0 else []
+
+    def with_lines(self, lines: list[dict]) -> dict:
+        """Copie de la réponse limitée à `lines` (leurs index d'origine sont conservés)."""
+        return {**self.payload, "lyrics": {**self.payload["lyrics"], "lines": lines}}
+
+
+class PassageIndexCache:
+    """
+    Index des entrées lyrics récemment servies, en LRU borné.
+
+    Un index est valide tant que la valeur en cache est identique : le cache
+    mémoire renvoie le même objet `bytes` à chaque hit, la comparaison est
+    alors immédiate.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[bytes, PassageIndex]] = OrderedDict()
+
+    def get(self, key: str, data: bytes) -> PassageIndex:
+        entry = self._entries.get(key)
+        if entry is not None and (entry[0] is data or entry[0] == data):
+            self._entries.move_to_end(key)
+            return entry[1]
+
+        index = PassageIndex(loads_json(data))
+        self._entries[key] = (data, index)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return index
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+# Singleton instance
+passage_index_cache = PassageIndexCache(max_entries=settings.lyrics_index_max_entries)
@@ -0,0 +1,284 @@
+import asyncio
+import logging
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+
+from app.config import settings
+from app.services.codecs import loads_json
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tracks (
+    key TEXT PRIMARY KEY,
+    track_id TEXT NOT NULL,
+    track_name TEXT NOT NULL,
+    artist_name TEXT NOT NULL,
+    album_name TEXT
+);
+CREATE TABLE IF NOT EXISTS lyric_lines (
+    id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL,
+    line_index INTEGER NOT NULL,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS lyric_lines_key ON lyric_lines (key);
+-- Index FTS5 « external content » : le texte n'est stocké qu'une fois, dans lyric_lines
+CREATE VIRTUAL TABLE IF NOT EXISTS lyric_lines_fts USING fts5(
+    text,
+    content = 'lyric_lines',
+    content_rowid = 'id',
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS lyric_lines_ai AFTER INSERT ON lyric_lines BEGIN
+    INSERT INTO lyric_lines_fts (rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS lyric_lines_ad AFTER DELETE ON lyric_lines BEGIN
+    INSERT INTO lyric_lines_fts (lyric_lines_fts, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+"""
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+@dataclass
+class LyricsMatch:
+    key: str
+    track_id: str
+    track_name: str
+    artist_name: str
+    album_name: str | None
+    # (index de ligne, texte), dans l'ordre des paroles
+    lines: list[tuple[int, str]]
+
+
+def build_match_query(query: str) -> str | None:
+    """
+    Requête FTS5 : les mots dans l'ordre (phrase), le dernier en préfixe.
+
+    L'entrée utilisateur n'est jamais interprétée comme syntaxe FTS5 :
+    seuls les mots sont conservés, chacun entre guillemets.
+    """
+    tokens = TOKEN_PATTERN.findall(query)
+    if not tokens:
+        return None
+    return '"' + " ".join(tokens) + '"*'
+
+
+class LyricsSearchIndex:
+    """
+    Index plein texte (SQLite FTS5) des paroles déjà récupérées.
+
+    Alimenté par les payloads lyrics qui passent par l'API ; les écritures
+    sont regroupées par une tâche de fond, jamais sur le chemin de la requête.
+    """
+
+    def __init__(self, path: str | Path, flush_interval: float, batch_size: int, max_pending: int, max_known: int):
+        self.path = Path(path)
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.max_known = max_known
+        # Dernière version connue de chaque entrée en attente (payload ou JSON brut)
+        self._pending: dict[str, dict | bytes] = {}
+        # Entrées en attente à n'indexer que si elles sont absentes (rattrapage sur cache hit)
+        self._backfill: set[str] = set()
+        # Clés récemment indexées ou en attente, en LRU borné : évite de ré-indexer à
+        # chaque cache hit. Une clé sortie du LRU est re-soumise en rattrapage, ignoré
+        # à l'écriture si elle est déjà dans l'index.
+        self._known: OrderedDict[str, None] | None = None
+        self._db: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+        self._wakeup = asyncio.Event()
+        self._flusher: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        """Ouvrir l'index (chargement des clés connues) et lancer les écritures groupées."""
+        await asyncio.to_thread(self._open)
+        if self._flusher is None:
+            self._flusher = asyncio.create_task(self._flush_periodically())
+
+    async def close(self) -> None:
+        if self._flusher is not None:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+        await self.flush()
+        self._disconnect()
+
+    def submit(self, key: str, payload: dict | bytes, replace: bool = True) -> None:
+        """
+        Mettre une réponse lyrics en file d'indexation (payload ou JSON brut). Non bloquant.
+
+        Avec `replace=False`, l'entrée n'est écrite que si la clé n'est pas déjà indexée.
+        """
+        if key not in self._pending and len(self._pending) >= self.max_pending:
+            # Écritures en retard : on perd une mise à jour plutôt que de la mémoire
+            return
+        if replace:
+            self._pending[key] = payload
+            self._backfill.discard(key)
+        elif key not in self._pending:
+            self._pending[key] = payload
+            self._backfill.add(key)
+        self._remember(key)
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+
+    def is_known(self, key: str) -> bool:
+        """Vrai si la clé a été récemment indexée ou est en attente (faux tant que l'index n'est pas chargé)."""
+        if self._known is None or key not in self._known:
+            return False
+        self._known.move_to_end(key)
+        return True
+
+    def _remember(self, key: str) -> None:
+        if self._known is None:
+            return
+        self._known[key] = None
+        self._known.move_to_end(key)
+        while len(self._known) > self.max_known:
+            self._known.popitem(last=False)
+
+    async def flush(self) -> int:
+        """Écrire les entrées en attente en une transaction. Retourne le nombre d'entrées écrites."""
+        if not self._pending:
+            return 0
+        pending, self._pending = self._pending, {}
+        backfill, self._backfill = self._backfill, set()
+        return await asyncio.to_thread(self._write, pending, backfill)
+
+    async def search(self, query: str, limit: int) -> list[LyricsMatch]:
+        match_query = build_match_query(query)
+        if match_query is None:
+            return []
+        return await asyncio.to_thread(self._search, match_query, limit)
+
+    def _open(self) -> None:
+        with self._lock:
+            self._connect()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript(SCHEMA)
+            # Les clés écrites le plus récemment (INSERT OR REPLACE : nouveau rowid à chaque écriture)
+            recent = self._db.execute("SELECT key FROM tracks ORDER BY rowid DESC LIMIT ?", (self.max_known,))
+            self._known = OrderedDict((key, None) for (key,) in reversed(recent.fetchall()))
+            for key in self._pending:
+                self._remember(key)
+        return self._db
+
+    def _disconnect(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+            self._known = None
+
+    def _write(self, pending: dict[str, dict | bytes], backfill: set[str]) -> int:
+        indexed = set()
+        if backfill:
+            with self._lock:
+                db = self._connect()
+                keys = list(backfill)
+                for i in range(0, len(keys), 500):
+                    chunk = keys[i:i + 500]
+                    indexed.update(key for (key,) in db.execute(
+                        f"SELECT key FROM tracks WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                    ))
+
+        rows = []
+        for key, payload in pending.items():
+            if key in indexed:
+                # Rattrapage d'une clé déjà indexée : rien à réécrire
+                continue
+            if isinstance(payload, bytes):
+                payload = loads_json(payload)
+            lyrics = payload.get("lyrics")
+            if not lyrics or not lyrics.get("lines"):
+                continue
+            rows.append((key, payload, lyrics))
+
+        with self._lock:
+            db = self._connect()
+            db.execute("BEGIN")
+            try:
+                for key, payload, lyrics in rows:
+                    db.execute("DELETE FROM lyric_lines WHERE key = ?", (key,))
+                    db.execute(
+                        "INSERT OR REPLACE INTO tracks (key, track_id, track_name, artist_name, album_name) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (
+                            key,
+                            payload.get("track_id") or "",
+                            payload.get("track_name") or lyrics.get("track_name") or "",
+                            payload.get("artist_name") or lyrics.get("artist_name") or "",
+                            lyrics.get("album_name"),
+                        ),
+                    )
+                    db.executemany(
+                        "INSERT INTO lyric_lines (text, key, line_index) VALUES (?, ?, ?)",
+                        [(line["text"], key, line["index"]) for line in lyrics["lines"]],
+                    )
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+        return len(rows)
+
+    def _search(self, match_query: str, limit: int) -> list[LyricsMatch]:
+        with self._lock:
+            db = self._connect()
+            # Les lignes les plus pertinentes d'abord ; regroupées par chanson ensuite
+            rows = db.execute(
+                "SELECT l.key, l.line_index, l.text, t.track_id, t.track_name, t.artist_name, t.album_name "
+                "FROM lyric_lines_fts AS f "
+                "JOIN lyric_lines AS l ON l.id = f.rowid "
+                "JOIN tracks AS t ON t.key = l.key "
+                "WHERE lyric_lines_fts MATCH ? ORDER BY f.rank LIMIT ?",
+                (match_query, limit * 20),
+            ).fetchall()
+
+        matches: dict[str, LyricsMatch] = {}
+        for key, line_index, text, track_id, track_name, artist_name, album_name in rows:
+            match = matches.get(key)
+            if match is None:
+                if len(matches) >= limit:
+                    continue
+                match = matches[key] = LyricsMatch(key, track_id, track_name, artist_name, album_name, [])
+            match.lines.append((line_index, text))
+        for match in matches.values():
+            match.lines.sort()
+        return list(matches.values())
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Lyrics search index flush failed")
+
+
+# Singleton instance
+lyrics_search = LyricsSearchIndex(
+    path=settings.lyrics_search_db,
+    flush_interval=settings.lyrics_search_flush_interval,
+    batch_size=settings.lyrics_search_batch_size,
+    max_pending=settings.lyrics_search_max_pending,
+    max_known=settings.lyrics_search_max_known,
+)
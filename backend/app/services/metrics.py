@@ -0,0 +1,247 @@
+import asyncio
+import logging
+import os
+import time
+import uuid
+from bisect import bisect_left
+from pathlib import Path
+
+from app.config import settings
+from app.services.codecs import dumps_json, loads_json
+
+logger = logging.getLogger(__name__)
+
+# Latences (secondes) : de la réponse en cache (~1 ms) au timeout upstream
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Metric:
+    """
+    Métrique en mémoire du process, indexée par tuple de valeurs de labels.
+
+    Aucun verrou : les enregistrements se font depuis la boucle asyncio
+    (un seul thread), une mise à jour est une opération de dict.
+    """
+
+    type = ""
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values: dict[tuple[str, ...], float | list[float]] = {}
+
+    def snapshot(self) -> list:
+        return [[list(key), value] for key, value in self.values.items()]
+
+    def clear(self) -> None:
+        self.values.clear()
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) - amount
+
+
+class Histogram(Metric):
+    """Compteurs par bucket (non cumulés en mémoire), puis somme et nombre d'observations."""
+
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = (), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *labels: str) -> None:
+        counts = self.values.get(labels)
+        if counts is None:
+            # Un compteur par bucket + le bucket +Inf, puis somme et nombre
+            counts = self.values[labels] = [0] * (len(self.buckets) + 3)
+        counts[bisect_left(self.buckets, value)] += 1
+        counts[-2] += value
+        counts[-1] += 1
+
+
+class MetricsRegistry:
+    """
+    Registre des métriques du process et export au format texte Prometheus.
+
+    Avec plusieurs workers (`metrics_dir`), chacun écrit périodiquement un
+    instantané de ses métriques dans le répertoire ; `/metrics` additionne
+    les instantanés des autres workers à ses propres valeurs. Les compteurs
+    d'un worker arrêté restent comptés (pas de remise à zéro apparente) ; ses
+    jauges ne le sont plus une fois son instantané trop ancien.
+    """
+
+    def __init__(self, directory: str | Path | None, flush_interval: float):
+        self.directory = Path(directory) if directory else None
+        self.flush_interval = flush_interval
+        self.worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._metrics: dict[str, Metric] = {}
+        self._flusher: asyncio.Task | None = None
+
+    def counter(self, name: str, help: str, labels: tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, help, labels))
+
+    def gauge(self, name: str, help: str, labels: tuple[str, ...] = ()) -> Gauge:
+        return self._register(Gauge(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: tuple[str, ...] = (), buckets=LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labels, buckets))
+
+    async def start(self) -> None:
+        if self.directory is not None and self._flusher is None:
+            self._flusher = asyncio.create_task(self._flush_periodically())
+
+    async def close(self) -> None:
+        if self._flusher is not None:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Écrire l'instantané de ce worker pour les autres."""
+        if self.directory is None:
+            return
+        try:
+            await asyncio.to_thread(self._write_snapshot, dumps_json(self.snapshot()))
+        except Exception:
+            logger.exception("Failed to write metrics snapshot")
+
+    def snapshot(self) -> dict[str, list]:
+        return {name: metric.snapshot() for name, metric in self._metrics.items()}
+
+    async def render(self) -> str:
+        """Toutes les métriques (tous workers du répertoire partagé) au format texte Prometheus."""
+        snapshots = [(self.snapshot(), True)]
+        if self.directory is not None:
+            snapshots += await asyncio.to_thread(self._read_snapshots)
+        return self._render(snapshots)
+
+    def clear(self) -> None:
+        for metric in self._metrics.values():
+            metric.clear()
+
+    def _register(self, metric: Metric) -> Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def _render(self, snapshots: list[tuple[dict, bool]]) -> str:
+        lines = []
+        for name, metric in self._metrics.items():
+            merged: dict[tuple, float | list[float]] = {}
+            for snapshot, live in snapshots:
+                if metric.type == "gauge" and not live:
+                    continue
+                for labels, value in snapshot.get(name, ()):
+                    key = tuple(labels)
+                    if isinstance(value, list):
+                        current = merged.get(key)
+                        merged[key] = value if current is None else [a + b for a, b in zip(current, value)]
+                    else:
+                        merged[key] = merged.get(key, 0) + value
+            lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.type}")
+            for key, value in sorted(merged.items()):
+                pairs = [f'{label}="{_escape(v)}"' for label, v in zip(metric.labels, key)]
+                if isinstance(value, list):
+                    cumulative = 0
+                    for bound, count in zip((*metric.buckets, "+Inf"), value):
+                        cumulative += count
+                        le = bound if bound == "+Inf" else _number(bound)
+                        bucket_labels = _labels([*pairs, f'le="{le}"'])
+                        lines.append(f"{name}_bucket{bucket_labels} {_number(cumulative)}")
+                    lines.append(f"{name}_sum{_labels(pairs)} {_number(value[-2])}")
+                    lines.append(f"{name}_count{_labels(pairs)} {_number(value[-1])}")
+                else:
+                    lines.append(f"{name}{_labels(pairs)} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+    def _write_snapshot(self, data: bytes) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / f"{self.worker_id}.json"
+        temp = path.with_suffix(".tmp")
+        temp.write_bytes(data)
+        os.replace(temp, path)
+
+    def _read_snapshots(self) -> list[tuple[dict, bool]]:
+        if not self.directory.exists():
+            return []
+        # Jauges d'un worker sans nouvelles depuis plusieurs intervalles : ignorées
+        fresh_after = time.time() - 3 * self.flush_interval
+        snapshots = []
+        for path in self.directory.glob("*.json"):
+            if path.stem == self.worker_id:
+                continue
+            try:
+                snapshots.append((loads_json(path.read_bytes()), path.stat().st_mtime >= fresh_after))
+            except (OSError, ValueError):
+                # Fichier en cours de remplacement ou illisible : ignoré pour ce scrape
+                continue
+        return snapshots
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+
+def _labels(pairs: list[str]) -> str:
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def key_prefix(key: str) -> str:
+    """Préfixe d'une clé de cache (`lyrics:...` -> `lyrics`), label à cardinalité bornée."""
+    return key.split(":", 1)[0]
+
+
+# Singleton instance
+metrics = MetricsRegistry(
+    directory=settings.metrics_dir or None,
+    flush_interval=settings.metrics_flush_interval,
+)
+
+http_requests = metrics.counter(
+    "lyriks_http_requests_total", "HTTP requests by route and status", ("method", "route", "status")
+)
+http_request_duration = metrics.histogram(
+    "lyriks_http_request_duration_seconds", "HTTP request latency by route", ("method", "route")
+)
+http_in_flight = metrics.gauge("lyriks_http_requests_in_flight", "HTTP requests being served")
+upstream_request_duration = metrics.histogram(
+    "lyriks_upstream_request_duration_seconds", "Upstream call latency until response headers", ("upstream",)
+)
+upstream_errors = metrics.counter(
+    "lyriks_upstream_errors_total", "Failed upstream calls by kind", ("upstream", "kind")
+)
+upstream_in_flight = metrics.gauge("lyriks_upstream_requests_in_flight", "Upstream calls in progress", ("upstream",))
+cache_hits = metrics.counter("lyriks_cache_hits_total", "Cache hits by key prefix and tier", ("prefix", "tier"))
+cache_misses = metrics.counter("lyriks_cache_misses_total", "Cache misses by key prefix", ("prefix",))
+cache_errors = metrics.counter("lyriks_cache_errors_total", "Redis errors by key prefix and operation", ("prefix", "op"))
+image_bytes_proxied = metrics.counter(
+    "lyriks_image_bytes_proxied_total", "Image bytes sent by the image proxy", ("source",)
+)
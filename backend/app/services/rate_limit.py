@@ -0,0 +1,192 @@
+import asyncio
+import logging
+import math
+import time
+from dataclasses import dataclass
+
+from app.config import settings
+from app.services.cache import cache_service
+
+logger = logging.getLogger(__name__)
+
+# Clés envoyées à Redis par appel du script (borne la durée d'un EVAL)
+SYNC_BATCH_SIZE = 500
+
+# Seaux de jetons partagés : débite chaque clé de son coût après recharge
+# (horloge Redis, commune à tous les workers) et renvoie les jetons restants
+RATE_LIMIT_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local time = redis.call("time")
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+-- Le seau le plus bas (-capacity) doit pouvoir se recharger avant que la clé expire
+local ttl = math.ceil(2 * capacity / rate) + 1
+local remaining = {}
+for i, key in ipairs(KEYS) do
+    local state = redis.call("hmget", key, "tokens", "ts")
+    local tokens = tonumber(state[1]) or capacity
+    local elapsed = math.max(0, now - (tonumber(state[2]) or now))
+    tokens = math.min(capacity, tokens + elapsed * rate)
+    -- Dette bornée : un client bloqué redevient servi après au plus deux fenêtres
+    tokens = math.max(-capacity, tokens - tonumber(ARGV[i + 2]))
+    redis.call("hset", key, "tokens", tostring(tokens), "ts", tostring(now))
+    redis.call("expire", key, ttl)
+    remaining[i] = tostring(tokens)
+end
+return remaining
+"""
+
+
+@dataclass(slots=True)
+class TokenBucket:
+    tokens: float
+    updated: float
+
+
+@dataclass(slots=True)
+class RateLimitDecision:
+    allowed: bool
+    limit: int
+    remaining: int
+    # Secondes avant que le seau soit de nouveau plein
+    reset: int
+    # Secondes avant que la requête refusée puisse passer (0 si acceptée)
+    retry_after: int
+
+
+async def consume_shared_buckets(
+    costs: dict[str, float],
+    capacity: float,
+    rate: float,
+) -> dict[str, float] | None:
+    """
+    Débiter les seaux de jetons partagés entre workers (script Lua atomique).
+
+    Retourne les jetons restants par clé, ou None si Redis est indisponible.
+    """
+    if not costs:
+        return {}
+    keys = list(costs)
+    try:
+        client = await cache_service.get_client()
+        remaining = await client.eval(
+            RATE_LIMIT_SCRIPT,
+            len(keys),
+            *(f"lyriks:ratelimit:{key}" for key in keys),
+            capacity,
+            rate,
+            *(costs[key] for key in keys),
+        )
+    except Exception:
+        return None
+    return {key: float(value) for key, value in zip(keys, remaining)}
+
+
+class RateLimiter:
+    """
+    Limitation de débit par client (seau de jetons).
+
+    Chaque requête est décidée localement, sans aller-retour réseau. Les
+    jetons consommés sont envoyés périodiquement à Redis, où un script Lua
+    tient le seau commun à tous les workers ; chaque seau local est ensuite
+    ramené au niveau du seau partagé s'il est plus bas. La limite globale est
+    donc respectée à `sync_interval` près.
+    """
+
+    def __init__(self, per_minute: int, sync_interval: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60
+        self.sync_interval = sync_interval
+        self._buckets: dict[str, TokenBucket] = {}
+        # Jetons consommés depuis la dernière synchronisation, par client
+        self._pending: dict[str, float] = {}
+        self._syncer: asyncio.Task | None = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.capacity > 0
+
+    def consume(self, client: str, cost: float = 1) -> RateLimitDecision:
+        now = time.monotonic()
+        cost = min(cost, self.capacity)
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            bucket = self._buckets[client] = TokenBucket(self.capacity, now)
+        else:
+            bucket.tokens = min(self.capacity, bucket.tokens + (now - bucket.updated) * self.rate)
+            bucket.updated = now
+
+        if bucket.tokens >= cost:
+            bucket.tokens -= cost
+            self._pending[client] = self._pending.get(client, 0) + cost
+            retry_after = 0
+        else:
+            retry_after = math.ceil((cost - bucket.tokens) / self.rate)
+        return RateLimitDecision(
+            allowed=retry_after == 0,
+            limit=int(self.capacity),
+            remaining=max(0, int(bucket.tokens)),
+            reset=math.ceil((self.capacity - bucket.tokens) / self.rate),
+            retry_after=retry_after,
+        )
+
+    async def sync(self) -> None:
+        """Réconcilier les seaux locaux avec les seaux partagés dans Redis."""
+        pending, self._pending = self._pending, {}
+        self._prune(time.monotonic(), pending)
+        keys = list(pending)
+        for i in range(0, len(keys), SYNC_BATCH_SIZE):
+            batch = {key: pending[key] for key in keys[i:i + SYNC_BATCH_SIZE]}
+            remaining = await consume_shared_buckets(batch, self.capacity, self.rate)
+            if remaining is None:
+                # Redis indisponible : limites locales seulement ; la consommation
+                # non envoyée est conservée pour la prochaine synchronisation
+                for key in keys[i:]:
+                    self._pending[key] = self._pending.get(key, 0) + pending[key]
+                return
+            for key, tokens in remaining.items():
+                bucket = self._buckets.get(key)
+                if bucket is not None and tokens < bucket.tokens:
+                    bucket.tokens = tokens
+
+    async def start(self) -> None:
+        if self.enabled and self._syncer is None:
+            self._syncer = asyncio.create_task(self._sync_periodically())
+
+    async def close(self) -> None:
+        if self._syncer is not None:
+            self._syncer.cancel()
+            try:
+                await self._syncer
+            except asyncio.CancelledError:
+                pass
+            self._syncer = None
+
+    def clear(self) -> None:
+        self._buckets.clear()
+        self._pending.clear()
+
+    def _prune(self, now: float, pending: dict[str, float]) -> None:
+        # Un seau inactif depuis une fenêtre entière est plein : inutile de le garder
+        idle_after = self.capacity / self.rate
+        idle = [
+            key for key, bucket in self._buckets.items()
+            if now - bucket.updated > idle_after and key not in pending
+        ]
+        for key in idle:
+            del self._buckets[key]
+
+    async def _sync_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            try:
+                await self.sync()
+            except Exception:
+                logger.exception("Rate limit sync failed")
+
+
+# Singleton instance
+rate_limiter = RateLimiter(
+    per_minute=settings.rate_limit_per_minute,
+    sync_interval=settings.rate_limit_sync_interval,
+)
@@ -0,0 +1,236 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from collections.abc import Awaitable, Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from email.utils import parsedate_to_datetime
+from typing import TypeVar
+
+import httpx
+
+from app.config import settings
+from app.services.metrics import upstream_errors
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Priorités (la plus petite passe en premier)
+INTERACTIVE = 0
+BACKGROUND = 1
+
+# Priorité des appels upstream faits dans le contexte courant
+request_priority: ContextVar[int] = ContextVar("request_priority", default=INTERACTIVE)
+
+
+@contextmanager
+def background_priority() -> Iterator[None]:
+    """Les tâches créées dans ce bloc (rafraîchissements, préchargements) passent après les utilisateurs."""
+    token = request_priority.set(BACKGROUND)
+    try:
+        yield
+    finally:
+        request_priority.reset(token)
+
+
+class UpstreamBusyError(Exception):
+    """Appel abandonné avant d'atteindre l'upstream : file pleine ou délai d'attente dépassé."""
+
+    def __init__(self, upstream: str, retry_after: float):
+        super().__init__(f"{upstream} request queue full or timed out")
+        self.upstream = upstream
+        self.retry_after = retry_after
+
+
+def retry_after_seconds(response: httpx.Response) -> float | None:
+    """Valeur de `Retry-After` en secondes (délai ou date HTTP), None si absente ou illisible."""
+    value = response.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class UpstreamScheduler:
+    """
+    Ordonnanceur des appels sortants d'un upstream.
+
+    Un seau de jetons limite le débit à `rps` requêtes/s (rafale `burst`).
+    Au-delà, les appels attendent dans une file à priorités (interactifs
+    avant arrière-plan), bornée à `max_queue` : quand elle est pleine, un
+    appel interactif évince l'appel d'arrière-plan le plus récent. Un appel
+    qui n'a pas obtenu son créneau avant son échéance est abandonné
+    (`UpstreamBusyError`). Un 429 (ou un 503 avec `Retry-After`) suspend
+    l'upstream pendant le délai demandé ; un 429 est rejoué une fois si
+    l'échéance le permet.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        rps: float,
+        burst: float,
+        max_queue: int,
+        max_wait: float,
+        background_max_wait: float,
+    ):
+        self.name = name
+        self.rps = rps
+        self.burst = max(1.0, burst)
+        self.max_queue = max_queue
+        self.max_wait = {INTERACTIVE: max_wait, BACKGROUND: background_max_wait}
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._queue: list[tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._pump_task: asyncio.Task | None = None
+
+    async def call(self, func: Callable[[], Awaitable[T]], priority: int | None = None) -> T:
+        """Exécuter `func()` quand le budget de l'upstream le permet."""
+        priority = request_priority.get() if priority is None else priority
+        deadline = time.monotonic() + self.max_wait[priority]
+        retried = False
+        while True:
+            await self.acquire(priority, deadline)
+            try:
+                return await func()
+            except httpx.HTTPStatusError as e:
+                status = e.response.status_code
+                delay = retry_after_seconds(e.response)
+                if status == 429:
+                    delay = settings.upstream_default_backoff if delay is None else delay
+                if status not in (429, 503) or delay is None:
+                    raise
+                self.pause(delay)
+                if status != 429 or retried or time.monotonic() + delay > deadline:
+                    raise
+                retried = True
+
+    async def acquire(self, priority: int, deadline: float) -> None:
+        """Attendre un créneau ; `UpstreamBusyError` si la file est pleine ou l'échéance dépassée."""
+        if self.rps <= 0:
+            return
+        now = time.monotonic()
+        if not self._queue and now >= self._paused_until and self._refill(now) >= 1:
+            # Chemin rapide : budget disponible et personne n'attend
+            self._tokens -= 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        self._enqueue(priority, future)
+        if self._pump_task is None or self._pump_task.done():
+            self._pump_task = asyncio.create_task(self._pump())
+        try:
+            await asyncio.wait_for(future, timeout=max(0.0, deadline - now))
+        except asyncio.TimeoutError:
+            upstream_errors.inc(self.name, "queue_timeout")
+            raise UpstreamBusyError(self.name, self.retry_after()) from None
+
+    def pause(self, delay: float) -> None:
+        """Ne plus rien envoyer à l'upstream pendant `delay` secondes (429, Retry-After)."""
+        until = time.monotonic() + delay
+        if until > self._paused_until:
+            logger.warning("Upstream %s rate limited, pausing %.1fs", self.name, delay)
+            self._paused_until = until
+
+    def retry_after(self) -> float:
+        waiting = len(self._queue) / self.rps if self.rps > 0 else 0.0
+        return max(self._paused_until - time.monotonic(), 0.0) + waiting
+
+    def snapshot(self) -> dict:
+        return {
+            "rps": self.rps,
+            "queued": sum(1 for _, _, future in self._queue if not future.done()),
+            "paused_for": round(max(0.0, self._paused_until - time.monotonic()), 3),
+        }
+
+    def reset(self) -> None:
+        for _, _, future in self._queue:
+            future.cancel()
+        self._queue.clear()
+        self._tokens = self.burst
+        self._paused_until = 0.0
+
+    def _refill(self, now: float) -> float:
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rps)
+        self._updated = now
+        return self._tokens
+
+    def _enqueue(self, priority: int, future: asyncio.Future) -> None:
+        if len(self._queue) >= self.max_queue:
+            # Retirer d'abord les attentes expirées ou annulées
+            self._queue = [entry for entry in self._queue if not entry[2].done()]
+            heapq.heapify(self._queue)
+        if len(self._queue) >= self.max_queue:
+            worst = max(self._queue)
+            upstream_errors.inc(self.name, "queue_full")
+            if worst[0] <= priority:
+                raise UpstreamBusyError(self.name, self.retry_after())
+            # File pleine : l'appel le moins prioritaire (et le plus récent) cède sa place
+            self._queue.remove(worst)
+            heapq.heapify(self._queue)
+            worst[2].set_exception(UpstreamBusyError(self.name, self.retry_after()))
+        heapq.heappush(self._queue, (priority, next(self._sequence), future))
+
+    async def _pump(self) -> None:
+        while self._queue:
+            now = time.monotonic()
+            wait = self._paused_until - now
+            if wait <= 0:
+                tokens = self._refill(now)
+                wait = (1 - tokens) / self.rps if tokens < 1 else 0.0
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+            _, _, future = heapq.heappop(self._queue)
+            if future.done():
+                # Échéance dépassée ou appelant parti : le créneau revient au suivant
+                continue
+            self._tokens -= 1
+            future.set_result(None)
+
+
+class UpstreamSchedulerRegistry:
+    """Un ordonnanceur par upstream, partagé par tous ses appels."""
+
+    def __init__(self):
+        self._schedulers: dict[str, UpstreamScheduler] = {}
+
+    def register(self, name: str, rps: float) -> UpstreamScheduler:
+        """Déclarer un upstream et son budget (requêtes/s, 0 = illimité)."""
+        scheduler = self._schedulers[name] = UpstreamScheduler(
+            name,
+            rps=rps,
+            burst=rps,
+            max_queue=settings.upstream_max_queue,
+            max_wait=settings.upstream_max_wait,
+            background_max_wait=settings.upstream_background_max_wait,
+        )
+        return scheduler
+
+    def get(self, name: str) -> UpstreamScheduler:
+        return self._schedulers[name]
+
+    async def call(self, name: str, func: Callable[[], Awaitable[T]], priority: int | None = None) -> T:
+        return await self._schedulers[name].call(func, priority)
+
+    def states(self) -> dict[str, dict]:
+        return {name: scheduler.snapshot() for name, scheduler in self._schedulers.items()}
+
+    def reset(self) -> None:
+        for scheduler in self._schedulers.values():
+            scheduler.reset()
+
+
+# Singleton instance
+schedulers = UpstreamSchedulerRegistry()
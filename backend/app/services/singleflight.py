@@ -0,0 +1,86 @@
+import asyncio
+import logging
+from collections.abc import Awaitable, Callable
+
+from app.config import settings
+from app.services.cache import cache_service
+from app.services.scheduler import background_priority
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """
+    Coalescer les cache misses concurrents sur une même clé.
+
+    Dans un process, les appels simultanés partagent la même tâche de chargement.
+    Entre workers, un verrou Redis court désigne celui qui appelle l'upstream ;
+    les autres attendent sa notification puis relisent le cache.
+    """
+
+    def __init__(self, lock_ttl: float, wait_timeout: float):
+        self._lock_ttl = lock_ttl
+        self._wait_timeout = wait_timeout
+        self._inflight: dict[str, asyncio.Task] = {}
+        # Rafraîchissements en arrière-plan, séparés : `do` ne doit jamais recevoir leur None
+        self._refreshing: dict[str, asyncio.Task] = {}
+
+    async def do(self, key: str, loader: Callable[[], Awaitable[dict]]) -> dict:
+        """Exécuter `loader` une seule fois par clé et partager son résultat.
+
+        `loader` doit écrire son résultat dans le cache sous `key`.
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._load(key, loader))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # shield : l'annulation d'un appelant (client déconnecté) n'annule pas le chargement partagé
+        return await asyncio.shield(task)
+
+    def refresh(self, key: str, loader: Callable[[], Awaitable[dict]]) -> None:
+        """Rafraîchir une clé en arrière-plan, au plus un rafraîchissement à la fois par clé."""
+        if key in self._inflight or key in self._refreshing:
+            return
+        # Appels upstream du rafraîchissement en priorité basse : les utilisateurs passent d'abord
+        with background_priority():
+            task = asyncio.ensure_future(self._load(key, loader, wait=False))
+        self._refreshing[key] = task
+        task.add_done_callback(lambda t: self._refresh_done(key, t))
+
+    def _refresh_done(self, key: str, task: asyncio.Task) -> None:
+        self._refreshing.pop(key, None)
+        if not task.cancelled() and task.exception() is not None:
+            # La valeur périmée reste servie ; on réessaiera à la prochaine requête
+            logger.warning("Background refresh failed: %s", task.exception())
+
+    async def _load(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[dict]],
+        wait: bool = True,
+    ) -> dict | None:
+        token = await cache_service.acquire_lock(key, self._lock_ttl)
+        if token is None:
+            if not wait:
+                # Un autre worker rafraîchit déjà cette clé
+                return None
+            # Un autre worker charge déjà cette clé : attendre son résultat
+            await cache_service.wait_for_lock(key, self._wait_timeout)
+            cached = await cache_service.get(key)
+            if cached is not None:
+                return cached
+            # Le détenteur a échoué ou expiré : on charge nous-mêmes
+
+        try:
+            return await loader()
+        finally:
+            if token is not None:
+                await cache_service.release_lock(key, token)
+
+
+# Singleton instance
+single_flight = SingleFlight(
+    lock_ttl=settings.singleflight_lock_ttl,
+    wait_timeout=settings.singleflight_wait_timeout,
+)
@@ -1,7 +1,11 @@
 import time
+
 import httpx
 
 from app.config import settings
+from app.services.breaker import breakers
+from app.services.http import http_clients
+from app.services.scheduler import schedulers
 
 
 class SpotifyClient:
@@ -11,31 +15,39 @@ class SpotifyClient:
     def __init__(self):
         self._token: str | None = None
         self._token_expires: float = 0
+        # Pas de préchauffage : l'intégration Spotify n'est pas active par défaut
+        http_clients.register("spotify", timeout=settings.spotify_timeout)
+        breakers.register("spotify", max_timeout=settings.spotify_timeout)
+        schedulers.register("spotify", rps=settings.spotify_max_rps)
 
     async def _get_token(self) -> str:
         """Obtenir un access token via Client Credentials Flow."""
         if self._token and time.time() < self._token_expires:
             return self._token
 
-        async with httpx.AsyncClient() as client:
+        async def request() -> httpx.Response:
+            client = http_clients.get("spotify")
             response = await client.post(
                 self.AUTH_URL,
                 data={"grant_type": "client_credentials"},
                 auth=(settings.spotify_client_id, settings.spotify_client_secret),
             )
             response.raise_for_status()
-            data = response.json()
+            return response
 
-            self._token = data["access_token"]
-            self._token_expires = time.time() + data["expires_in"] - 60
+        data = (await schedulers.call("spotify", lambda: breakers.call("spotify", request))).json()
 
-            return self._token
+        self._token = data["access_token"]
+        self._token_expires = time.time() + data["expires_in"] - 60
+
+        return self._token
 
     async def search_tracks(self, query: str, limit: int = 20) -> list[dict]:
         """Rechercher des tracks."""
         token = await self._get_token()
 
-        async with httpx.AsyncClient() as client:
+        async def request() -> httpx.Response:
+            client = http_clients.get("spotify")
             response = await client.get(
                 f"{self.BASE_URL}/search",
                 params={
@@ -47,9 +59,11 @@ class SpotifyClient:
                 headers={"Authorization": f"Bearer {token}"},
             )
             response.raise_for_status()
-            data = response.json()
+            return response
+
+        data = (await schedulers.call("spotify", lambda: breakers.call("spotify", request))).json()
 
-            return data["tracks"]["items"]
+        return data["tracks"]["items"]
 
 
 # Singleton instance
@@ -0,0 +1,222 @@
+import asyncio
+import heapq
+import logging
+import math
+import os
+import tempfile
+from bisect import bisect_left, insort
+from dataclasses import dataclass
+from pathlib import Path
+
+from app.config import settings
+from app.models.track import Track
+from app.services.codecs import dumps_json, loads_json
+from app.utils.text import normalize_text
+
+logger = logging.getLogger(__name__)
+
+# Borne supérieure de tous les termes commençant par un préfixe donné
+PREFIX_END = "\U0010ffff"
+
+# Préfixes courts (plages de milliers de termes) : meilleurs résultats gardés
+# en mémoire jusqu'à la prochaine modification de l'index
+SHORT_PREFIX_LENGTH = 2
+SHORT_PREFIX_TOP = 20
+
+
+@dataclass
+class Suggestion:
+    id: str
+    name: str
+    artist: str
+    artwork_url: str | None
+    # Nombre d'apparitions dans des résultats de recherche
+    seen: int = 0
+    # Vues de la page Genius (0 si inconnues)
+    pageviews: int = 0
+
+    @property
+    def score(self) -> float:
+        return self.seen + math.log10(1 + self.pageviews)
+
+    def to_dict(self) -> dict:
+        return {"id": self.id, "name": self.name, "artist": self.artist, "artwork_url": self.artwork_url}
+
+
+class SuggestIndex:
+    """
+    Index de préfixes des chansons déjà vues, pour l'autocomplétion.
+
+    Tableau trié de `(terme normalisé, id)` interrogé par bisection ; chaque
+    chanson est indexée par son titre et par « artiste titre ». Le nombre de
+    chansons est borné (les moins populaires sont évincées) et l'index est
+    sauvegardé périodiquement sur disque pour repartir à chaud.
+    """
+
+    def __init__(self, max_tracks: int, snapshot_path: str | Path, snapshot_interval: float):
+        self.max_tracks = max_tracks
+        self.snapshot_path = Path(snapshot_path)
+        self.snapshot_interval = snapshot_interval
+        self._tracks: dict[str, Suggestion] = {}
+        self._terms: list[tuple[str, str]] = []
+        self._top: dict[str, list[Suggestion]] = {}
+        self._dirty = False
+        self._snapshotter: asyncio.Task | None = None
+
+    def __len__(self) -> int:
+        return len(self._tracks)
+
+    async def start(self) -> None:
+        """Recharger le dernier snapshot et lancer les sauvegardes périodiques."""
+        try:
+            await asyncio.to_thread(self._load_snapshot)
+        except Exception:
+            logger.exception("Failed to load suggest snapshot")
+        if self._snapshotter is None:
+            self._snapshotter = asyncio.create_task(self._snapshot_periodically())
+
+    async def close(self) -> None:
+        if self._snapshotter is not None:
+            self._snapshotter.cancel()
+            try:
+                await self._snapshotter
+            except asyncio.CancelledError:
+                pass
+            self._snapshotter = None
+        await self.snapshot()
+
+    def add_tracks(self, tracks: list[Track], results: list[dict] | None = None) -> None:
+        """Enregistrer les chansons d'un résultat de recherche (`results` : réponses Genius brutes)."""
+        for i, track in enumerate(tracks):
+            stats = (results[i].get("stats") or {}) if results else {}
+            self._add(
+                Suggestion(
+                    id=track.id,
+                    name=track.name,
+                    artist=track.primary_artist,
+                    artwork_url=track.artwork_url,
+                    pageviews=stats.get("pageviews") or 0,
+                )
+            )
+        if len(self._tracks) > self.max_tracks:
+            self._evict()
+        self._top.clear()
+        self._dirty = True
+
+    def suggest(self, query: str, limit: int) -> list[Suggestion]:
+        prefix = normalize_text(query)
+        if not prefix:
+            return []
+        if len(prefix) > SHORT_PREFIX_LENGTH or limit > SHORT_PREFIX_TOP:
+            return self._best(prefix, limit)
+        top = self._top.get(prefix)
+        if top is None:
+            top = self._top[prefix] = self._best(prefix, SHORT_PREFIX_TOP)
+        return top[:limit]
+
+    def _best(self, prefix: str, limit: int) -> list[Suggestion]:
+        # Toute la plage du préfixe est classée (même "a") : un tas borné à `limit`
+        # garde les plus populaires sans trier tous les candidats
+        start = bisect_left(self._terms, (prefix,))
+        end = bisect_left(self._terms, (prefix + PREFIX_END,), start)
+        track_ids = {track_id for _, track_id in self._terms[start:end]}
+        return heapq.nlargest(limit, (self._tracks[i] for i in track_ids), key=lambda s: s.score)
+
+    async def snapshot(self) -> None:
+        if not self._dirty:
+            return
+        self._dirty = False
+        rows = [
+            [s.id, s.name, s.artist, s.artwork_url, s.seen, s.pageviews]
+            for s in self._tracks.values()
+        ]
+        try:
+            await asyncio.to_thread(self._write_snapshot, rows)
+        except Exception:
+            self._dirty = True
+            logger.exception("Failed to write suggest snapshot")
+
+    def clear(self) -> None:
+        self._tracks.clear()
+        self._terms.clear()
+        self._top.clear()
+        self._dirty = False
+
+    def _add(self, suggestion: Suggestion) -> None:
+        existing = self._tracks.get(suggestion.id)
+        if existing is not None:
+            existing.seen += 1
+            existing.pageviews = max(existing.pageviews, suggestion.pageviews)
+            if (existing.name, existing.artist) == (suggestion.name, suggestion.artist):
+                existing.artwork_url = suggestion.artwork_url or existing.artwork_url
+                return
+            # Titre ou artiste corrigé sur Genius : on réindexe
+            self._remove_terms(existing)
+            existing.name, existing.artist = suggestion.name, suggestion.artist
+            existing.artwork_url = suggestion.artwork_url or existing.artwork_url
+            suggestion = existing
+        else:
+            suggestion.seen = max(suggestion.seen, 1)
+            self._tracks[suggestion.id] = suggestion
+        for term in self._terms_for(suggestion):
+            insort(self._terms, (term, suggestion.id))
+
+    def _remove_terms(self, suggestion: Suggestion) -> None:
+        for term in self._terms_for(suggestion):
+            position = bisect_left(self._terms, (term, suggestion.id))
+            if position < len(self._terms) and self._terms[position] == (term, suggestion.id):
+                del self._terms[position]
+
+    @staticmethod
+    def _terms_for(suggestion: Suggestion) -> set[str]:
+        name = normalize_text(suggestion.name)
+        return {name, normalize_text(f"{suggestion.artist} {suggestion.name}")}
+
+    def _evict(self) -> None:
+        # Descendre à 90 % du plafond : le tableau n'est reconstruit qu'occasionnellement
+        keep = sorted(self._tracks.values(), key=lambda s: s.score, reverse=True)
+        keep = keep[: int(self.max_tracks * 0.9)]
+        self._rebuild(keep)
+
+    def _rebuild(self, suggestions: list[Suggestion]) -> None:
+        self._top.clear()
+        self._tracks = {s.id: s for s in suggestions}
+        self._terms = sorted((term, s.id) for s in suggestions for term in self._terms_for(s))
+
+    def _load_snapshot(self) -> None:
+        if not self.snapshot_path.exists():
+            return
+        rows = loads_json(self.snapshot_path.read_bytes())
+        self._rebuild([
+            Suggestion(id=row[0], name=row[1], artist=row[2], artwork_url=row[3], seen=row[4], pageviews=row[5])
+            for row in rows[: self.max_tracks]
+        ])
+
+    def _write_snapshot(self, rows: list[list]) -> None:
+        self.snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+        # Fichier temporaire propre à cet appel : plusieurs workers peuvent sauvegarder en même temps
+        fd, temp = tempfile.mkstemp(
+            dir=self.snapshot_path.parent,
+            prefix=f"{self.snapshot_path.name}.{os.getpid()}.",
+            suffix=".tmp",
+        )
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(dumps_json(rows))
+            os.replace(temp, self.snapshot_path)
+        except BaseException:
+            Path(temp).unlink(missing_ok=True)
+            raise
+
+    async def _snapshot_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.snapshot_interval)
+            await self.snapshot()
+
+
+# Singleton instance
+suggest_index = SuggestIndex(
+    max_tracks=settings.suggest_max_tracks,
+    snapshot_path=settings.suggest_snapshot_path,
+    snapshot_interval=settings.suggest_snapshot_interval,
+)
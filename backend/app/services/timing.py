@@ -0,0 +1,145 @@
+import asyncio
+import cProfile
+import logging
+import random
+import re
+import secrets
+import time
+import uuid
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class RequestTimings:
+    """Durées cumulées par étape (redis, lrclib, parse, serialize...) d'une requête."""
+
+    __slots__ = ("started", "spans")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        # nom -> [durée cumulée (s), nombre d'appels]
+        self.spans: dict[str, list[float]] = {}
+
+    def add(self, name: str, duration: float) -> None:
+        span = self.spans.get(name)
+        if span is None:
+            self.spans[name] = [duration, 1]
+        else:
+            span[0] += duration
+            span[1] += 1
+
+    def header(self) -> str:
+        """Valeur de l'en-tête `Server-Timing` (millisecondes), `total` jusqu'au début de la réponse."""
+        parts = []
+        for name, (duration, count) in self.spans.items():
+            desc = f';desc="{count} calls"' if count > 1 else ""
+            parts.append(f"{name};dur={duration * 1000:.1f}{desc}")
+        parts.append(f"total;dur={(time.perf_counter() - self.started) * 1000:.1f}")
+        return ", ".join(parts)
+
+
+# Étapes de la requête en cours (None hors requête : les spans ne coûtent rien)
+current_timings: ContextVar[RequestTimings | None] = ContextVar("current_timings", default=None)
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """
+    Mesurer un bloc et l'ajouter à l'étape `name` de la requête en cours.
+
+    Les appels concurrents d'une même étape (requêtes lrclib parallèles)
+    s'additionnent : la durée peut dépasser le temps réel écoulé.
+    """
+    timings = current_timings.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - started)
+
+
+class RequestProfiler:
+    """
+    Profilage cProfile de requêtes individuelles, écrit dans `directory`.
+
+    Une requête est profilée si elle porte l'en-tête `X-Profile` avec le
+    jeton admin, ou tirée au sort (`sample_rate`). Un seul profil à la fois :
+    cProfile suit tout le thread, donc les coroutines des autres requêtes
+    servies en même temps apparaissent aussi dans le profil. Les fichiers
+    `.prof` se lisent avec `pstats` ou snakeviz ; seuls les `max_files`
+    plus récents sont gardés.
+    """
+
+    HEADER = b"x-profile"
+
+    def __init__(self, directory: str | Path, sample_rate: float, token: str, max_files: int):
+        self.directory = Path(directory)
+        self.sample_rate = sample_rate
+        self.token = token
+        self.max_files = max_files
+        self._active = False
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_rate > 0 or bool(self.token)
+
+    def wanted(self, headers: list[tuple[bytes, bytes]]) -> bool:
+        if self.token:
+            for name, value in headers:
+                if name == self.HEADER:
+                    return secrets.compare_digest(value, self.token.encode())
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def start(self) -> cProfile.Profile | None:
+        """Démarrer un profil, ou None si un autre est déjà en cours."""
+        if self._active:
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Autre outil de profilage actif (débogueur, couverture)
+            return None
+        self._active = True
+        return profile
+
+    def stop(self, profile: cProfile.Profile) -> None:
+        profile.disable()
+        self._active = False
+
+    async def save(self, profile: cProfile.Profile, method: str, path: str, duration: float) -> Path | None:
+        """Écrire le profil hors de la boucle ; le nom porte l'heure, la durée et la route."""
+        slug = re.sub(r"[^a-zA-Z0-9]+", "_", path).strip("_") or "root"
+        name = f"{time.strftime('%Y%m%dT%H%M%S')}-{duration * 1000:.0f}ms-{method}-{slug[:60]}-{uuid.uuid4().hex[:6]}.prof"
+        try:
+            return await asyncio.to_thread(self._write, profile, name)
+        except Exception:
+            logger.exception("Failed to write request profile")
+            return None
+
+    def _write(self, profile: cProfile.Profile, name: str) -> Path:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / name
+        profile.dump_stats(path)
+        files = sorted(self.directory.glob("*.prof"), key=lambda p: p.stat().st_mtime)
+        for old in files[: max(0, len(files) - self.max_files)]:
+            old.unlink(missing_ok=True)
+        return path
+
+
+# Singleton instance
+request_profiler = RequestProfiler(
+    directory=settings.profile_dir,
+    sample_rate=settings.profile_sample_rate,
+    token=settings.admin_token,
+    max_files=settings.profile_max_files,
+)
@@ -0,0 +1,19 @@
+import unicodedata
+
+
+def fold_accents(text: str) -> str:
+    """Retirer les accents ("Été" -> "Ete")."""
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def normalize_text(text: str, accents: bool = False) -> str:
+    """
+    Forme canonique d'un texte saisi : NFKC, casefold, espaces réduits.
+
+    Avec `accents=False`, les accents sont aussi retirés.
+    """
+    text = unicodedata.normalize("NFKC", text).casefold()
+    if not accents:
+        text = fold_accents(text)
+    return " ".join(text.split())
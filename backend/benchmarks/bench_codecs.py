@@ -0,0 +1,100 @@
+"""
+Comparer les codecs du cache sur des réponses lyrics réalistes.
+
+Mesure, pour chaque combinaison sérialiseur / compression : la taille stockée
+dans Redis et le temps d'encodage / décodage par valeur.
+
+    cd backend && python -m benchmarks.bench_codecs
+"""
+
+import json
+import random
+import time
+
+from app.models.lyrics import Lyrics
+from app.models.responses import LyricsResponse
+from app.services.codecs import COMPRESSORS, SERIALIZERS, CacheCodec
+
+WORDS = (
+    "love night baby heart fire dance tonight never forever dream light "
+    "time world run away feel know want need cry sky rain street city "
+    "home road alone together hold falling higher golden"
+).split()
+
+
+def synthetic_lrc(rng: random.Random, lines: int) -> tuple[str, str]:
+    """LRC synchronisé + version texte brut, comme renvoyés par lrclib."""
+    timestamp = rng.uniform(5, 15)
+    synced, plain = [], []
+    for _ in range(lines):
+        text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 9))).capitalize()
+        minutes, seconds = divmod(timestamp, 60)
+        synced.append(f"[{int(minutes):02d}:{seconds:05.2f}] {text}")
+        plain.append(text)
+        timestamp += rng.uniform(1.5, 6)
+    return "\n".join(synced), "\n".join(plain)
+
+
+def lyrics_payload(rng: random.Random, lines: int) -> dict:
+    synced, plain = synthetic_lrc(rng, lines)
+    lyrics = Lyrics.from_lrclib(
+        {
+            "trackName": "Benchmark Song",
+            "artistName": "Benchmark Artist",
+            "albumName": "Benchmark Album",
+            "duration": 215,
+            "instrumental": False,
+            "syncedLyrics": synced,
+            "plainLyrics": plain,
+        }
+    )
+    return LyricsResponse(
+        track_id="4uLU6hMCjMI75M1A2tKUQC",
+        track_name="Benchmark Song",
+        artist_name="Benchmark Artist",
+        lyrics=lyrics,
+    ).model_dump(mode="json")
+
+
+def measure(codec: CacheCodec, payloads: list[dict], rounds: int) -> dict:
+    encoded = [codec.encode(payload) for payload in payloads]
+
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for payload in payloads:
+            codec.encode(payload)
+    encode_us = (time.perf_counter() - started) / (rounds * len(payloads)) * 1e6
+
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for data in encoded:
+            codec.decode(data)
+    decode_us = (time.perf_counter() - started) / (rounds * len(payloads)) * 1e6
+
+    return {
+        "bytes": sum(map(len, encoded)) / len(encoded),
+        "encode_us": encode_us,
+        "decode_us": decode_us,
+    }
+
+
+def main(rounds: int = 200) -> None:
+    rng = random.Random(42)
+    # Chansons de 20 à 90 lignes : l'essentiel du trafic /api/lyrics
+    payloads = [lyrics_payload(rng, rng.randint(20, 90)) for _ in range(50)]
+    baseline = sum(len(json.dumps(payload)) for payload in payloads) / len(payloads)
+    print(f"json.dumps baseline: {baseline:.0f} bytes/value\n")
+
+    print(f"{'serializer':<10} {'compression':<12} {'bytes':>8} {'ratio':>7} {'encode µs':>10} {'decode µs':>10}")
+    for serializer in SERIALIZERS:
+        for compression in COMPRESSORS:
+            codec = CacheCodec(serializer, compression, threshold=1024)
+            result = measure(codec, payloads, rounds)
+            print(
+                f"{serializer:<10} {compression:<12} {result['bytes']:>8.0f} "
+                f"{result['bytes'] / baseline:>7.2f} {result['encode_us']:>10.1f} {result['decode_us']:>10.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Micro-benchmark du parseur LRC sur un corpus de gros fichiers synthétiques.
+
+Compare l'ancien parseur (regex ré-résolue à chaque ligne, [mm:ss.xx] seulement)
+au tokenizer actuel, sur du LRC simple puis sur du LRC « enhanced »
+(millisecondes, timestamps multiples, offset, timing mot à mot).
+
+    cd backend && python -m benchmarks.bench_lrc
+"""
+
+import random
+import re
+import time
+
+from app.models.lyrics import ParsedLyricLine, parse_synced_lyrics
+from benchmarks.bench_codecs import WORDS
+
+
+def legacy_parse_synced_lyrics(synced_lyrics: str) -> list[ParsedLyricLine]:
+    """Parseur d'origine, conservé pour comparaison."""
+    lines = []
+    pattern = r"\[(\d{2}):(\d{2})\.(\d{2})\]\s*(.*)"
+
+    for line in synced_lyrics.strip().split("\n"):
+        match = re.match(pattern, line)
+        if match:
+            minutes, seconds, centiseconds, text = match.groups()
+            timestamp = int(minutes) * 60 + int(seconds) + int(centiseconds) / 100
+            if text.strip():
+                lines.append(ParsedLyricLine(
+                    timestamp=timestamp,
+                    text=text.strip(),
+                    index=len(lines),
+                ))
+
+    return lines
+
+
+def _tag(timestamp: float, digits: int) -> str:
+    minutes, seconds = divmod(timestamp, 60)
+    return f"{int(minutes):02d}:{seconds:0{3 + digits}.{digits}f}"
+
+
+def simple_lrc(rng: random.Random, lines: int) -> str:
+    timestamp = 0.0
+    out = ["[ar:Benchmark Artist]", "[ti:Benchmark Song]"]
+    for _ in range(lines):
+        timestamp += rng.uniform(1.5, 6)
+        text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 9)))
+        out.append(f"[{_tag(timestamp, 2)}] {text}")
+    return "\n".join(out)
+
+
+def enhanced_lrc(rng: random.Random, lines: int) -> str:
+    timestamp = 0.0
+    out = ["[ar:Benchmark Artist]", "[offset:+250]"]
+    for i in range(lines):
+        timestamp += rng.uniform(1.5, 6)
+        tags = f"[{_tag(timestamp, 3)}]"
+        if i % 8 == 0:
+            # Refrain : même ligne à plusieurs instants
+            tags += f"[{_tag(timestamp + 120, 3)}]"
+        word_time = timestamp
+        words = []
+        for _ in range(rng.randint(3, 9)):
+            words.append(f"<{_tag(word_time, 2)}>{rng.choice(WORDS)}")
+            word_time += rng.uniform(0.2, 0.6)
+        out.append(tags + " ".join(words))
+    return "\n".join(out)
+
+
+def measure(parse, corpus: list[str], rounds: int) -> tuple[float, int]:
+    started = time.perf_counter()
+    parsed = 0
+    for _ in range(rounds):
+        for lrc in corpus:
+            parsed += len(parse(lrc))
+    elapsed = time.perf_counter() - started
+    return elapsed / (rounds * len(corpus)) * 1e6, parsed // rounds
+
+
+def main(rounds: int = 20) -> None:
+    rng = random.Random(7)
+    # Fichiers volumineux : 300 à 1200 lignes (mixes, versions longues, karaoké)
+    simple = [simple_lrc(rng, rng.randint(300, 1200)) for _ in range(40)]
+    enhanced = [enhanced_lrc(rng, rng.randint(300, 1200)) for _ in range(40)]
+    total_lines = sum(lrc.count("\n") + 1 for lrc in simple)
+    print(f"corpus: {len(simple)} files, {total_lines} lines each variant\n")
+
+    print(f"{'parser':<10} {'corpus':<10} {'µs/file':>10} {'lines kept':>11}")
+    for name, parse in (("legacy", legacy_parse_synced_lyrics), ("tokenizer", parse_synced_lyrics)):
+        for corpus_name, corpus in (("simple", simple), ("enhanced", enhanced)):
+            per_file, kept = measure(parse, corpus, rounds)
+            print(f"{name:<10} {corpus_name:<10} {per_file:>10.0f} {kept:>11}")
+
+
+if __name__ == "__main__":
+    main()
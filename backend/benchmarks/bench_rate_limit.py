@@ -0,0 +1,66 @@
+"""
+Mesurer le surcoût du middleware de limitation de débit par requête.
+
+Appelle directement une application ASGI minimale (réponse vide), avec et
+sans `RateLimitMiddleware`, pour isoler le coût de la décision locale et de
+l'ajout des en-têtes `RateLimit-*` ; la synchronisation Redis, périodique et
+hors du chemin de la requête, n'est pas comptée.
+
+    cd backend && python -m benchmarks.bench_rate_limit
+"""
+
+import asyncio
+import time
+
+from app.api.middleware import RateLimitMiddleware
+from app.services.rate_limit import RateLimiter
+
+REQUESTS = 100_000
+CLIENTS = 5_000
+
+
+async def empty_app(scope, receive, send) -> None:
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-length", b"0")]})
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def receive() -> dict:
+    return {"type": "http.request", "body": b""}
+
+
+async def send(message: dict) -> None:
+    pass
+
+
+def scope_for(i: int) -> dict:
+    return {
+        "type": "http",
+        "method": "GET",
+        "path": "/api/search",
+        "headers": [],
+        "client": (f"10.0.{i // 256 % 256}.{i % 256}", 50000),
+    }
+
+
+async def run(app, scopes: list[dict]) -> float:
+    started = time.perf_counter()
+    for scope in scopes:
+        await app(scope, receive, send)
+    return (time.perf_counter() - started) / len(scopes)
+
+
+async def main() -> None:
+    scopes = [scope_for(i % CLIENTS) for i in range(REQUESTS)]
+    # Budget assez large pour que toutes les requêtes soient acceptées (chemin le plus long)
+    limited = RateLimitMiddleware(empty_app, limiter=RateLimiter(per_minute=10**9, sync_interval=1))
+
+    bare = await run(empty_app, scopes)
+    with_limit = await run(limited, scopes)
+    print(f"{REQUESTS} requests, {CLIENTS} clients")
+    print(f"{'bare app':<18} {bare * 1e6:>8.2f} µs/request")
+    print(f"{'with rate limit':<18} {with_limit * 1e6:>8.2f} µs/request")
+    print(f"{'overhead':<18} {(with_limit - bare) * 1e6:>8.2f} µs/request")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
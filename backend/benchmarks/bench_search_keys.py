@@ -0,0 +1,108 @@
+"""
+Rejouer un journal de recherches et comparer le taux de hit du cache /api/search.
+
+Avant : clé `search:genius:{q.lower()}:{limit}`. Après : clé canonique
+(NFKC, casefold, espaces, accents) sans `limit`. Chaque entrée expire après
+`TTL_REQUESTS` recherches (≈ la durée de fraîcheur du cache en trafic réel).
+
+    cd backend && python -m benchmarks.bench_search_keys [journal.tsv]
+
+Le journal optionnel contient une recherche par ligne : `requête<TAB>limit`.
+Sans journal, un échantillon synthétique réaliste est généré (popularité
+Zipf, variantes de casse, d'espaces et d'accents, limites 10/20/50).
+"""
+
+import random
+import sys
+
+from app.api.search import search_cache_key
+
+# Durée de vie d'une entrée, en nombre de recherches rejouées
+TTL_REQUESTS = 2000
+
+ARTISTS = [
+    "Daft Punk", "Beyoncé", "Stromae", "Sigur Rós", "Björk", "The Weeknd",
+    "Aya Nakamura", "Mötley Crüe", "Rosalía", "Kendrick Lamar", "Angèle",
+    "Coldplay", "Billie Eilish", "Zaz", "Céline Dion", "Måneskin",
+]
+TITLES = [
+    "One More Time", "Halo", "Papaoutai", "Hoppípolla", "Jóga", "Blinding Lights",
+    "Djadja", "Dr. Feelgood", "Malamente", "HUMBLE.", "Balance ton quoi",
+    "Yellow", "Bad Guy", "Je veux", "Pour que tu m'aimes encore", "Beggin'",
+]
+
+
+def legacy_key(q: str, limit: int) -> str:
+    return f"search:genius:{q.lower()}:{limit}"
+
+
+def strip_accents_sometimes(rng: random.Random, text: str) -> str:
+    # Une partie des utilisateurs tape sans accents
+    if rng.random() < 0.4:
+        return text.translate(str.maketrans("éèêëáàâäíìîïóòôöúùûüçñøå", "eeeeaaaaiiiioooouuuucnoa"))
+    return text
+
+
+def vary(rng: random.Random, query: str) -> str:
+    query = strip_accents_sometimes(rng, query)
+    roll = rng.random()
+    if roll < 0.3:
+        query = query.lower()
+    elif roll < 0.4:
+        query = query.upper()
+    if rng.random() < 0.15:
+        query = query.replace(" ", "  ", 1)
+    if rng.random() < 0.15:
+        query += " "
+    return query
+
+
+def synthetic_log(size: int = 20000, seed: int = 3) -> list[tuple[str, int]]:
+    rng = random.Random(seed)
+    # Toutes les combinaisons artiste + titre forment la longue traîne
+    queries = [f"{artist} {title}" for artist in ARTISTS for title in TITLES]
+    queries += ARTISTS + TITLES
+    rng.shuffle(queries)
+    # Popularité Zipf : quelques requêtes concentrent l'essentiel du trafic
+    weights = [1 / (rank + 1) for rank in range(len(queries))]
+    log = []
+    for query in rng.choices(queries, weights=weights, k=size):
+        limit = rng.choices([10, 20, 50], weights=[0.3, 0.6, 0.1])[0]
+        log.append((vary(rng, query), limit))
+    return log
+
+
+def read_log(path: str) -> list[tuple[str, int]]:
+    log = []
+    with open(path, encoding="utf-8") as source:
+        for line in source:
+            query, _, limit = line.rstrip("\n").partition("\t")
+            if query:
+                log.append((query, int(limit or 20)))
+    return log
+
+
+def replay(log: list[tuple[str, int]], key) -> tuple[float, int]:
+    expires: dict[str, int] = {}
+    hits = misses = 0
+    for position, (query, limit) in enumerate(log):
+        cache_key = key(query, limit)
+        if expires.get(cache_key, -1) > position:
+            hits += 1
+        else:
+            misses += 1
+            expires[cache_key] = position + TTL_REQUESTS
+    return hits / len(log), misses
+
+
+def main() -> None:
+    log = read_log(sys.argv[1]) if len(sys.argv) > 1 else synthetic_log()
+    print(f"{len(log)} searches replayed\n")
+    print(f"{'keys':<10} {'hit ratio':>10} {'upstream calls':>15}")
+    for name, key in (("before", legacy_key), ("after", lambda q, limit: search_cache_key(q))):
+        ratio, misses = replay(log, key)
+        print(f"{name:<10} {ratio:>10.1%} {misses:>15}")
+
+
+if __name__ == "__main__":
+    main()
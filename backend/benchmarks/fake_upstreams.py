@@ -0,0 +1,234 @@
+"""
+Faux upstreams (Genius, lrclib, images) pour les tests de charge.
+
+Un seul serveur ASGI local répond pour les trois hôtes (aiguillage sur
+l'en-tête `Host`, conservé par `LocalUpstreamTransport`). Latence, taux
+d'erreur et taille des réponses sont réglables ; les réponses sont
+déterministes (dérivées de la requête), la latence et les erreurs tirées
+d'un générateur initialisé par `seed`.
+
+    cd backend && python -m benchmarks.fake_upstreams --port 8900 --latency 0.05
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import socket
+import time
+from dataclasses import asdict, dataclass
+from multiprocessing import get_context
+from urllib.parse import parse_qs
+
+import httpx
+
+WORDS = (
+    "love night baby heart fire dance tonight never forever dream light "
+    "time world run away feel know want need cry sky rain street city "
+    "home road alone together hold falling higher golden"
+).split()
+
+# Hôtes réels des clients de l'application
+GENIUS_HOST = "api.genius.com"
+LRCLIB_HOST = "lrclib.net"
+IMAGE_HOST = "images.genius.com"
+
+# En-tête d'un PNG : suffit au proxy (seuls le Content-Type et la taille sont vérifiés)
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+@dataclass
+class UpstreamProfile:
+    """Comportement des faux upstreams."""
+
+    latency: float = 0.05
+    # Écart maximal autour de `latency` (tirage uniforme)
+    jitter: float = 0.02
+    error_rate: float = 0.0
+    genius_results: int = 50
+    lyrics_lines: int = 60
+    image_bytes: int = 200_000
+    seed: int = 42
+
+
+def stable_id(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=6).digest(), "big")
+
+
+def synthetic_lrc(seed: int, lines: int) -> tuple[str, str]:
+    """LRC synchronisé + texte brut, déterministes pour un même titre."""
+    rng = random.Random(seed)
+    timestamp = rng.uniform(5, 15)
+    synced, plain = [], []
+    for _ in range(lines):
+        text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 9))).capitalize()
+        minutes, seconds = divmod(timestamp, 60)
+        synced.append(f"[{int(minutes):02d}:{seconds:05.2f}] {text}")
+        plain.append(text)
+        timestamp += rng.uniform(2, 6)
+    return "\n".join(synced), "\n".join(plain)
+
+
+class FakeUpstreams:
+    """Application ASGI minimale (pas de framework : son coût ne doit pas fausser la mesure)."""
+
+    def __init__(self, profile: UpstreamProfile):
+        self.profile = profile
+        self.rng = random.Random(profile.seed)
+        self.image = PNG_SIGNATURE + bytes(max(0, profile.image_bytes - len(PNG_SIGNATURE)))
+        self.requests = 0
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] == "lifespan":
+            while (await receive())["type"] != "lifespan.shutdown":
+                await send({"type": "lifespan.startup.complete"})
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+        self.requests += 1
+        headers = dict(scope["headers"])
+        host = headers.get(b"host", b"").decode().split(":")[0]
+        query = {k: v[0] for k, v in parse_qs(scope["query_string"].decode()).items()}
+
+        profile = self.profile
+        delay = max(0.0, profile.latency + self.rng.uniform(-profile.jitter, profile.jitter))
+        failed = self.rng.random() < profile.error_rate
+        await asyncio.sleep(delay)
+
+        if scope["method"] == "HEAD":
+            # Préchauffage des connexions
+            status, content_type, body, extra = 200, "text/plain", b"", []
+        elif failed:
+            status, content_type, body, extra = 500, "application/json", b'{"error":"fake failure"}', []
+        elif host == GENIUS_HOST:
+            status, content_type, body, extra = self.genius(scope["path"], query)
+        elif host == LRCLIB_HOST:
+            status, content_type, body, extra = self.lrclib(scope["path"], query)
+        elif host == IMAGE_HOST:
+            status, content_type, body, extra = self.image_response(scope["path"], headers)
+        else:
+            status, content_type, body, extra = 404, "text/plain", b"unknown host", []
+
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", content_type.encode()),
+                (b"content-length", str(len(body)).encode()),
+                *extra,
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    def genius(self, path: str, query: dict) -> tuple:
+        if path != "/search":
+            return 404, "application/json", b"{}", []
+        q = query.get("q", "")
+        page = int(query.get("page", 1))
+        per_page = int(query.get("per_page", 20))
+        first = (page - 1) * per_page
+        count = max(0, min(per_page, self.profile.genius_results - first))
+        hits = []
+        for i in range(first, first + count):
+            song_id = stable_id(f"{q}:{i}")
+            hits.append({
+                "type": "song",
+                "result": {
+                    "id": song_id,
+                    "title": f"{q.title()} {i}",
+                    "artist_names": f"Artist {song_id % 997}",
+                    "primary_artist": {"id": song_id % 997, "name": f"Artist {song_id % 997}"},
+                    "song_art_image_url": f"https://{IMAGE_HOST}/{song_id}.png",
+                    "release_date_components": {"year": 2000 + song_id % 25, "month": 1 + song_id % 12, "day": 1},
+                    "stats": {"pageviews": song_id % 100_000},
+                },
+            })
+        return 200, "application/json", json.dumps({"response": {"hits": hits}}).encode(), []
+
+    def lrclib(self, path: str, query: dict) -> tuple:
+        if path == "/api/get":
+            track, artist = query.get("track_name", ""), query.get("artist_name", "")
+            record = self.lyrics_record(track, artist, query.get("album_name"), query.get("duration"))
+            return 200, "application/json", json.dumps(record).encode(), []
+        if path == "/api/search":
+            record = self.lyrics_record(query.get("q", ""), "", None, None)
+            return 200, "application/json", json.dumps([record]).encode(), []
+        return 404, "application/json", b'{"message":"not found"}', []
+
+    def lyrics_record(self, track: str, artist: str, album: str | None, duration: str | None) -> dict:
+        synced, plain = synthetic_lrc(stable_id(f"{artist}:{track}"), self.profile.lyrics_lines)
+        return {
+            "trackName": track,
+            "artistName": artist,
+            "albumName": album,
+            "duration": float(duration) if duration else 200.0,
+            "instrumental": False,
+            "syncedLyrics": synced,
+            "plainLyrics": plain,
+        }
+
+    def image_response(self, path: str, headers: dict) -> tuple:
+        etag = f'"{stable_id(path)}-{len(self.image)}"'
+        if headers.get(b"if-none-match", b"").decode() == etag:
+            return 304, "image/png", b"", [(b"etag", etag.encode())]
+        return 200, "image/png", self.image, [(b"etag", etag.encode())]
+
+
+class LocalUpstreamTransport(httpx.AsyncBaseTransport):
+    """Envoie les requêtes d'un client vers le serveur local, en gardant l'hôte d'origine dans `Host`."""
+
+    def __init__(self, port: int, limits: httpx.Limits):
+        self.port = port
+        self._transport = httpx.AsyncHTTPTransport(limits=limits)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        request.url = request.url.copy_with(scheme="http", host="127.0.0.1", port=self.port)
+        return await self._transport.handle_async_request(request)
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def serve(port: int, profile: UpstreamProfile) -> None:
+    import uvicorn
+
+    uvicorn.run(FakeUpstreams(profile), host="127.0.0.1", port=port, log_level="warning", access_log=False)
+
+
+def start_server(profile: UpstreamProfile, port: int | None = None, timeout: float = 10.0):
+    """Lancer les faux upstreams dans un process séparé ; retourne (process, port)."""
+    port = port or free_port()
+    process = get_context("spawn").Process(target=serve, args=(port, profile), daemon=True)
+    process.start()
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return process, port
+        except OSError:
+            if not process.is_alive():
+                break
+            time.sleep(0.05)
+    process.terminate()
+    raise RuntimeError(f"Fake upstream server did not start on port {port}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=8900)
+    for field, value in asdict(UpstreamProfile()).items():
+        parser.add_argument(f"--{field.replace('_', '-')}", type=type(value), default=value)
+    args = parser.parse_args()
+    profile = UpstreamProfile(**{field: getattr(args, field) for field in asdict(UpstreamProfile())})
+    serve(args.port, profile)
+
+
+if __name__ == "__main__":
+    main()
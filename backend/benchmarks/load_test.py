@@ -0,0 +1,342 @@
+"""
+Test de charge reproductible de l'application ASGI réelle.
+
+Les upstreams (Genius, lrclib, images) sont remplacés par un serveur local
+(`benchmarks.fake_upstreams`) à latence, taux d'erreur et taille de réponse
+réglables ; Redis par fakeredis (ou un Redis local avec `--redis-url`).
+Chaque scénario tourne dans un process neuf (caches vides, RSS propre) :
+un générateur de charge en boucle fermée (`--concurrency` requêtes en
+parallèle) appelle l'application via `httpx.ASGITransport`, après une phase
+de chauffe qui remplit les caches des clés chaudes.
+
+Le résultat (JSON sur la sortie standard ou `--output`) donne par scénario
+le débit, les latences p50/p95/p99 et le pic de RSS. Avec `--baseline`, il
+est comparé à un résultat précédent ; le code de sortie vaut 1 si un
+scénario régresse au-delà de `--tolerance`.
+
+    cd backend && python -m benchmarks.load_test --output baseline.json
+    cd backend && python -m benchmarks.load_test --baseline baseline.json
+    cd backend && python -m benchmarks.load_test --scenario lyrics_hot --duration 5 --latency 0.2
+
+Le générateur partage le process (et le CPU) de l'application : les
+chiffres servent à comparer deux versions sur la même machine, pas à
+dimensionner la production.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import resource
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict
+from multiprocessing import get_context
+
+from benchmarks.fake_upstreams import IMAGE_HOST, UpstreamProfile, start_server
+
+HOT_KEYS = 20
+HOT_IMAGES = 50
+
+
+# Types de requêtes : (générateur aléatoire, numéro unique) -> (chemin, paramètres)
+def lyrics_hot(rng: random.Random, n: int) -> tuple[str, dict]:
+    k = rng.randrange(HOT_KEYS)
+    return "/api/lyrics", {"track": f"Hot Song {k}", "artist": f"Artist {k}", "album": f"Album {k}", "duration": 200}
+
+
+def lyrics_cold(rng: random.Random, n: int) -> tuple[str, dict]:
+    return "/api/lyrics", {"track": f"Cold Song {n}", "artist": f"Artist {n % 97}", "album": "Singles", "duration": 180}
+
+
+def search_hot(rng: random.Random, n: int) -> tuple[str, dict]:
+    return "/api/search", {"q": f"hot query {rng.randrange(HOT_KEYS)}", "limit": 10}
+
+
+def search_cold(rng: random.Random, n: int) -> tuple[str, dict]:
+    return "/api/search", {"q": f"cold query {n}", "limit": 10}
+
+
+def suggest(rng: random.Random, n: int) -> tuple[str, dict]:
+    return "/api/search/suggest", {"q": "hot"[: rng.randint(1, 3)]}
+
+
+def image_hot(rng: random.Random, n: int) -> tuple[str, dict]:
+    return "/api/image", {"url": f"https://{IMAGE_HOST}/hot-{rng.randrange(HOT_IMAGES)}.png"}
+
+
+def image_cold(rng: random.Random, n: int) -> tuple[str, dict]:
+    return "/api/image", {"url": f"https://{IMAGE_HOST}/cold-{n}.png"}
+
+
+# Mélanges de requêtes (poids relatifs)
+SCENARIOS = {
+    "lyrics_hot": {lyrics_hot: 1},
+    "lyrics_cold": {lyrics_cold: 1},
+    "search": {search_hot: 0.8, search_cold: 0.2},
+    "image_proxy": {image_hot: 0.9, image_cold: 0.1},
+    "mixed": {
+        lyrics_hot: 0.45,
+        lyrics_cold: 0.10,
+        search_hot: 0.15,
+        search_cold: 0.05,
+        suggest: 0.10,
+        image_hot: 0.12,
+        image_cold: 0.03,
+    },
+}
+
+# Métriques comparées à la référence : (chemin dans le résultat, plus haut = mieux)
+COMPARED = (
+    (("rps",), True),
+    (("latency_ms", "p50"), False),
+    (("latency_ms", "p95"), False),
+    (("latency_ms", "p99"), False),
+    (("peak_rss_mb",), False),
+)
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Octets sur macOS, kilo-octets sous Linux
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def configure_environment(data_dir: str, redis_url: str | None, overrides: dict[str, str]) -> None:
+    """Réglages de l'application, avant son import : fichiers locaux isolés, aucune limite de débit."""
+    os.environ.update({
+        "GENIUS_ACCESS_TOKEN": "bench",
+        "RATE_LIMIT_PER_MINUTE": "0",
+        "GENIUS_MAX_RPS": "0",
+        "LRCLIB_MAX_RPS": "0",
+        "SPOTIFY_MAX_RPS": "0",
+        "LYRICS_SEARCH_DB": os.path.join(data_dir, "lyrics_search.sqlite3"),
+        "SUGGEST_SNAPSHOT_PATH": os.path.join(data_dir, "suggest.json"),
+        "IMAGE_CACHE_DIR": os.path.join(data_dir, "images"),
+        "PROFILE_DIR": os.path.join(data_dir, "profiles"),
+        "PROFILE_SAMPLE_RATE": "0",
+        "METRICS_DIR": "",
+    })
+    if redis_url:
+        os.environ["REDIS_URL"] = redis_url
+    os.environ.update(overrides)
+
+
+async def drive(app, mix: dict, concurrency: int, duration: float, warmup: float, seed: int) -> dict:
+    import httpx
+
+    kinds = list(mix)
+    weights = list(mix.values())
+    # Numéros uniques (clés froides) : jamais réutilisés, même après la chauffe
+    sequence = iter(range(10**12))
+
+    async def worker(client: httpx.AsyncClient, rng: random.Random, until: float, latencies: list, statuses: Counter):
+        while time.perf_counter() < until:
+            path, params = rng.choices(kinds, weights)[0](rng, next(sequence))
+            started = time.perf_counter()
+            try:
+                response = await client.get(path, params=params)
+                status = response.status_code
+            except Exception:
+                status = 0
+            if latencies is not None:
+                latencies.append(time.perf_counter() - started)
+                statuses[status] += 1
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        rngs = [random.Random(seed + i) for i in range(concurrency)]
+        if warmup > 0:
+            until = time.perf_counter() + warmup
+            await asyncio.gather(*(worker(client, rng, until, None, None) for rng in rngs))
+
+        latencies: list[float] = []
+        statuses: Counter = Counter()
+        started = time.perf_counter()
+        until = started + duration
+        await asyncio.gather(*(worker(client, rng, until, latencies, statuses) for rng in rngs))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    ok = sum(count for status, count in statuses.items() if 200 <= status < 400)
+    return {
+        "requests": len(latencies),
+        "duration": round(elapsed, 3),
+        "rps": round(len(latencies) / elapsed, 1),
+        "latency_ms": {
+            "mean": round(sum(latencies) / len(latencies) * 1000, 3) if latencies else 0.0,
+            "p50": round(percentile(latencies, 0.50) * 1000, 3),
+            "p95": round(percentile(latencies, 0.95) * 1000, 3),
+            "p99": round(percentile(latencies, 0.99) * 1000, 3),
+            "max": round(latencies[-1] * 1000, 3) if latencies else 0.0,
+        },
+        "status": {str(status): count for status, count in sorted(statuses.items())},
+        "error_rate": round(1 - ok / len(latencies), 4) if latencies else 0.0,
+    }
+
+
+def run_scenario(name: str, port: int, options: dict) -> dict:
+    """Exécuter un scénario dans le process courant (process neuf, voir `main`)."""
+    with tempfile.TemporaryDirectory(prefix="lyriks-bench-") as data_dir:
+        configure_environment(data_dir, options["redis_url"], options["env"])
+
+        import httpx
+
+        from app.config import settings
+        from app.main import app
+        from app.services.cache import cache_service
+        from app.services.http import http_clients
+        from benchmarks.fake_upstreams import LocalUpstreamTransport
+
+        limits = httpx.Limits(
+            max_connections=settings.http_max_connections,
+            max_keepalive_connections=settings.http_max_keepalive_connections,
+            keepalive_expiry=settings.http_keepalive_expiry,
+        )
+        for upstream, config in list(http_clients._configs.items()):
+            http_clients.register(
+                upstream,
+                timeout=config.timeout,
+                prewarm_url=config.prewarm_url,
+                transport=LocalUpstreamTransport(port, limits),
+            )
+        if not options["redis_url"]:
+            import fakeredis
+
+            cache_service._redis = fakeredis.aioredis.FakeRedis()
+
+        async def run() -> dict:
+            async with app.router.lifespan_context(app):
+                return await drive(
+                    app,
+                    SCENARIOS[name],
+                    concurrency=options["concurrency"],
+                    duration=options["duration"],
+                    warmup=options["warmup"],
+                    seed=options["seed"],
+                )
+
+        result = asyncio.run(run())
+    result["peak_rss_mb"] = round(peak_rss_mb(), 1)
+    return result
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> dict:
+    """Écart relatif de chaque métrique par rapport à la référence ; régression au-delà de `tolerance`."""
+    comparison = {}
+    for name, result in current["scenarios"].items():
+        reference = baseline.get("scenarios", {}).get(name)
+        if reference is None:
+            continue
+        metrics = {}
+        for path, higher_is_better in COMPARED:
+            new, old = result, reference
+            for part in path:
+                new, old = new.get(part), old.get(part) if old else None
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            metrics[".".join(path)] = {
+                "baseline": old,
+                "current": new,
+                "change": round(change, 4),
+                "regression": (-change if higher_is_better else change) > tolerance,
+            }
+        comparison[name] = metrics
+    return comparison
+
+
+def summary(report: dict) -> str:
+    lines = [f"{'scenario':<14} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>8} {'rss MB':>8}"]
+    for name, result in report["scenarios"].items():
+        latency = result["latency_ms"]
+        lines.append(
+            f"{name:<14} {result['rps']:>9.1f} {latency['p50']:>9.2f} {latency['p95']:>9.2f} "
+            f"{latency['p99']:>9.2f} {result['error_rate']:>8.2%} {result['peak_rss_mb']:>8.1f}"
+        )
+    for name, metrics in report.get("comparison", {}).items():
+        for metric, values in metrics.items():
+            flag = "REGRESSION" if values["regression"] else ""
+            lines.append(f"{name:<14} {metric:<16} {values['change']:>+8.1%} {flag}")
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load test the API against local fake upstreams.")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="Scenario to run (repeatable, default: all)")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10.0, help="Measured seconds per scenario")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Unmeasured seconds before each scenario")
+    parser.add_argument("--redis-url", default=None, help="Use this Redis instead of fakeredis")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="Extra app setting (repeatable)")
+    parser.add_argument("--output", help="Write the JSON report to this file (default: stdout)")
+    parser.add_argument("--baseline", help="Compare with a previous JSON report")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed relative regression (default: 0.10)")
+    defaults = UpstreamProfile()
+    for field, value in asdict(defaults).items():
+        parser.add_argument(f"--{field.replace('_', '-')}", type=type(value), default=value, help="Fake upstream setting")
+    args = parser.parse_args()
+
+    profile = UpstreamProfile(**{field: getattr(args, field) for field in asdict(defaults)})
+    options = {
+        "concurrency": args.concurrency,
+        "duration": args.duration,
+        "warmup": args.warmup,
+        "redis_url": args.redis_url,
+        "env": dict(item.split("=", 1) for item in args.env),
+        "seed": profile.seed,
+    }
+    scenarios = args.scenario or list(SCENARIOS)
+
+    server, port = start_server(profile)
+    results = {}
+    try:
+        for name in scenarios:
+            print(f"running {name}...", file=sys.stderr)
+            # Un process par scénario : caches, index et pic de RSS repartent de zéro
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+                results[name] = pool.submit(run_scenario, name, port, options).result()
+    finally:
+        server.terminate()
+        server.join()
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "options": options,
+            "upstreams": asdict(profile),
+        },
+        "scenarios": results,
+    }
+    regressions = False
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["comparison"] = compare(report, json.load(f), args.tolerance)
+        regressions = any(v["regression"] for metrics in report["comparison"].values() for v in metrics.values())
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    print(summary(report), file=sys.stderr)
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,14 @@ from fastapi.testclient import TestClient
 from httpx import AsyncClient, ASGITransport
 
 from app.main import app
+from app.services.breaker import breakers
+from app.services.cache import cache_service
+from app.services.image_store import image_store
+from app.services.lyrics_search import lyrics_search
+from app.services.metrics import metrics
+from app.services.rate_limit import rate_limiter
+from app.services.scheduler import schedulers
+from app.services.suggest import suggest_index
 
 
 @pytest.fixture
@@ -19,6 +27,71 @@ async def mock_redis():
     return fakeredis.aioredis.FakeRedis()
 
 
+@pytest.fixture(autouse=True)
+def fake_cache_redis(mock_redis):
+    """Point the shared cache service at a fresh fake Redis for every test."""
+    cache_service._redis = mock_redis
+    cache_service._local.clear()
+    yield mock_redis
+    cache_service._redis = None
+    cache_service._local.clear()
+
+
+@pytest.fixture(autouse=True)
+def reset_breakers():
+    """Start every test with closed upstream circuits and empty outbound queues."""
+    breakers.reset()
+    schedulers.reset()
+    yield
+    breakers.reset()
+    schedulers.reset()
+
+
+@pytest.fixture(autouse=True)
+def reset_rate_limits():
+    """Give every test a full rate-limit budget."""
+    rate_limiter.clear()
+    yield
+    rate_limiter.clear()
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    """Start every test with empty metrics."""
+    metrics.clear()
+    yield
+    metrics.clear()
+
+
+@pytest.fixture(autouse=True)
+def image_cache_dir(tmp_path):
+    """Keep the disk image cache inside a per-test temporary directory."""
+    image_store.directory = tmp_path / "images"
+    yield image_store.directory
+    image_store._disconnect()
+
+
+@pytest.fixture(autouse=True)
+def lyrics_search_db(tmp_path):
+    """Keep the lyrics full-text index inside a per-test temporary directory."""
+    lyrics_search.path = tmp_path / "lyrics_search.sqlite3"
+    lyrics_search._pending.clear()
+    lyrics_search._backfill.clear()
+    yield lyrics_search.path
+    lyrics_search._disconnect()
+    lyrics_search._pending.clear()
+    lyrics_search._backfill.clear()
+
+
+@pytest.fixture(autouse=True)
+def suggest_snapshot(tmp_path):
+    """Start every test with an empty suggest index and a temporary snapshot."""
+    suggest_index.snapshot_path = tmp_path / "suggest.json"
+    suggest_index.clear()
+    yield suggest_index.snapshot_path
+    suggest_index.clear()
+
+
 @pytest.fixture
 def client():
     """Sync test client."""
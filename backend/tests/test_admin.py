@@ -0,0 +1,75 @@
+import json
+from unittest.mock import patch
+
+import pytest
+
+
+class TestAdminCacheEndpoint:
+    """Tests for DELETE /api/admin/cache."""
+
+    @pytest.mark.asyncio
+    async def test_disabled_without_token(self, async_client):
+        """Test that admin endpoints are hidden when no token is configured."""
+        with patch("app.api.admin.settings.admin_token", ""):
+            response = await async_client.delete("/api/admin/cache", params={"pattern": "lyrics:*"})
+        assert response.status_code == 404
+
+    @pytest.mark.asyncio
+    async def test_rejects_wrong_token(self, async_client):
+        """Test that a wrong bearer token is refused."""
+        with patch("app.api.admin.settings.admin_token", "secret"):
+            response = await async_client.delete(
+                "/api/admin/cache",
+                params={"pattern": "lyrics:*"},
+                headers={"Authorization": "Bearer nope"},
+            )
+        assert response.status_code == 401
+
+    @pytest.mark.asyncio
+    async def test_purge_streams_progress(self, async_client, mock_redis):
+        """Test that the purge deletes matching keys and streams progress."""
+        for i in range(30):
+            await mock_redis.set(f"lyriks:lyrics:{i}", "{}")
+        await mock_redis.set("lyriks:search:genius:x:20", "{}")
+
+        with patch("app.api.admin.settings.admin_token", "secret"):
+            response = await async_client.delete(
+                "/api/admin/cache",
+                params={"pattern": "lyrics:*", "batch_size": 10},
+                headers={"Authorization": "Bearer secret"},
+            )
+
+        assert response.status_code == 200
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert lines[-1] == {"scanned": 30, "deleted": 30, "done": True}
+        assert await mock_redis.exists("lyriks:search:genius:x:20")
+
+    @pytest.mark.asyncio
+    async def test_purge_unthrottled_with_zero_rate(self, async_client, mock_redis):
+        """Test that rate=0 is accepted and purges without throttling."""
+        for i in range(30):
+            await mock_redis.set(f"lyriks:lyrics:{i}", "{}")
+
+        with patch("app.api.admin.settings.admin_token", "secret"), \
+             patch("app.services.cache.asyncio.sleep") as sleep:
+            response = await async_client.delete(
+                "/api/admin/cache",
+                params={"pattern": "lyrics:*", "batch_size": 10, "rate": 0},
+                headers={"Authorization": "Bearer secret"},
+            )
+
+        assert response.status_code == 200
+        assert json.loads(response.text.splitlines()[-1]) == {"scanned": 30, "deleted": 30, "done": True}
+        sleep.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_negative_rate_rejected(self, async_client):
+        """Test that a negative rate is a validation error."""
+        with patch("app.api.admin.settings.admin_token", "secret"):
+            response = await async_client.delete(
+                "/api/admin/cache",
+                params={"pattern": "lyrics:*", "rate": -1},
+                headers={"Authorization": "Bearer secret"},
+            )
+
+        assert response.status_code == 422
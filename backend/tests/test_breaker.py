@@ -0,0 +1,199 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from app.services.breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, breakers
+
+
+def make_breaker(**overrides) -> CircuitBreaker:
+    options = dict(
+        max_timeout=2.0,
+        window=30.0,
+        min_requests=4,
+        error_threshold=0.5,
+        open_duration=0.05,
+        timeout_percentile=0.99,
+        timeout_multiplier=3.0,
+        min_timeout=0.05,
+    )
+    options.update(overrides)
+    return CircuitBreaker("test", **options)
+
+
+async def ok():
+    return "ok"
+
+
+async def fail():
+    raise httpx.ConnectError("refused")
+
+
+def status_error(status: int):
+    async def call():
+        request = httpx.Request("GET", "https://upstream.test")
+        raise httpx.HTTPStatusError("error", request=request, response=httpx.Response(status, request=request))
+
+    return call
+
+
+async def trip(breaker: CircuitBreaker) -> None:
+    for _ in range(breaker.min_requests):
+        with pytest.raises(httpx.ConnectError):
+            await breaker.call(fail)
+
+
+class TestCircuitBreaker:
+    """Tests for the per-upstream circuit breaker."""
+
+    @pytest.mark.asyncio
+    async def test_opens_on_error_rate(self):
+        """Test that the circuit opens once the error rate crosses the threshold."""
+        breaker = make_breaker()
+        await breaker.call(ok)
+        await breaker.call(ok)
+        with pytest.raises(httpx.ConnectError):
+            await breaker.call(fail)
+        assert breaker.state == CLOSED
+
+        with pytest.raises(httpx.ConnectError):
+            await breaker.call(fail)
+
+        assert breaker.state == OPEN
+
+    @pytest.mark.asyncio
+    async def test_open_circuit_fails_fast(self):
+        """Test that calls are rejected without reaching the upstream while open."""
+        breaker = make_breaker(open_duration=10)
+        await trip(breaker)
+        called = []
+
+        async def upstream():
+            called.append(True)
+
+        with pytest.raises(CircuitOpenError) as exc_info:
+            await breaker.call(upstream)
+
+        assert not called
+        assert 9 < exc_info.value.retry_after <= 10
+
+    @pytest.mark.asyncio
+    async def test_client_errors_do_not_count(self):
+        """Test that 4xx responses are not upstream failures, unlike 5xx and 429."""
+        breaker = make_breaker()
+        for _ in range(5):
+            with pytest.raises(httpx.HTTPStatusError):
+                await breaker.call(status_error(404))
+        assert breaker.state == CLOSED
+
+        for status in (500, 503, 429, 502):
+            with pytest.raises(httpx.HTTPStatusError):
+                await breaker.call(status_error(status))
+        assert breaker.state == OPEN
+
+    @pytest.mark.asyncio
+    async def test_half_open_probe_closes(self):
+        """Test that one successful probe after the open period closes the circuit."""
+        breaker = make_breaker()
+        await trip(breaker)
+        await asyncio.sleep(0.06)
+
+        assert await breaker.call(ok) == "ok"
+        assert breaker.state == CLOSED
+        assert breaker.snapshot()["requests"] == 1
+
+    @pytest.mark.asyncio
+    async def test_half_open_probe_failure_reopens(self):
+        """Test that a failed probe opens the circuit again."""
+        breaker = make_breaker()
+        await trip(breaker)
+        await asyncio.sleep(0.06)
+
+        with pytest.raises(httpx.ConnectError):
+            await breaker.call(fail)
+
+        assert breaker.state == OPEN
+        with pytest.raises(CircuitOpenError):
+            await breaker.call(ok)
+
+    @pytest.mark.asyncio
+    async def test_single_probe_at_a_time(self):
+        """Test that concurrent calls are rejected while the probe is in flight."""
+        breaker = make_breaker()
+        await trip(breaker)
+        await asyncio.sleep(0.06)
+
+        async def slow():
+            await asyncio.sleep(0.02)
+            return "probe"
+
+        probe = asyncio.ensure_future(breaker.call(slow))
+        await asyncio.sleep(0)
+        assert breaker.state == HALF_OPEN
+        with pytest.raises(CircuitOpenError):
+            await breaker.call(ok)
+
+        assert await probe == "probe"
+        assert breaker.state == CLOSED
+
+    @pytest.mark.asyncio
+    async def test_cancelled_probe_frees_slot(self):
+        """Test that cancelling the probe lets the next call probe instead."""
+        breaker = make_breaker()
+        await trip(breaker)
+        await asyncio.sleep(0.06)
+
+        probe = asyncio.ensure_future(breaker.call(lambda: asyncio.sleep(1)))
+        await asyncio.sleep(0)
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+
+        assert await breaker.call(ok) == "ok"
+        assert breaker.state == CLOSED
+
+    @pytest.mark.asyncio
+    async def test_timeout_follows_latency(self):
+        """Test that the call timeout shrinks to the observed latency percentile."""
+        breaker = make_breaker(min_requests=5)
+        assert breaker.timeout() == 2.0
+
+        for _ in range(5):
+            await breaker.call(ok)
+        assert breaker.timeout() == 0.05
+
+        started = time.monotonic()
+        with pytest.raises(TimeoutError):
+            await breaker.call(lambda: asyncio.sleep(1))
+        assert time.monotonic() - started < 0.5
+
+    def test_snapshot(self):
+        """Test the monitoring snapshot of an idle circuit."""
+        snapshot = make_breaker().snapshot()
+
+        assert snapshot["state"] == CLOSED
+        assert snapshot["requests"] == 0
+        assert snapshot["timeout"] == 2.0
+
+
+class TestCircuitBreakerEndpoints:
+    """Tests for breaker integration in the API."""
+
+    def test_open_circuit_returns_503(self, client):
+        """Test that an open lrclib circuit fails fast with Retry-After."""
+        breakers.get("lrclib")._open(time.monotonic())
+
+        response = client.get("/api/lyrics", params={"track": "Song", "artist": "Artist"})
+
+        assert response.status_code == 503
+        assert int(response.headers["Retry-After"]) >= 1
+
+    def test_health_exposes_breakers(self, client):
+        """Test that circuit states are reported by /api/health."""
+        breakers.get("genius")._open(time.monotonic())
+
+        upstreams = client.get("/api/health").json()["upstreams"]
+
+        assert upstreams["genius"]["state"] == OPEN
+        assert upstreams["lrclib"]["state"] == CLOSED
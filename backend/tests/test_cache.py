@@ -0,0 +1,306 @@
+import asyncio
+import json
+from unittest.mock import patch
+
+import pytest
+
+from app.services.cache import CacheService, LocalCache
+from app.services.codecs import MAGIC, CacheCodec
+
+
+class TestLocalCache:
+    """Tests for the in-process L1 cache."""
+
+    def test_get_set(self):
+        """Test basic hit and miss accounting."""
+        local = LocalCache(max_bytes=1024)
+        local.set("a", b"value", ttl=60)
+
+        assert local.get("a") == b"value"
+        assert local.get("b") is None
+        assert local.hits == 1
+        assert local.misses == 1
+
+    def test_expired_entry(self):
+        """Test that entries expire with their TTL."""
+        local = LocalCache(max_bytes=1024)
+        with patch("app.services.cache.time.monotonic", return_value=100.0):
+            local.set("a", b"value", ttl=10)
+        with patch("app.services.cache.time.monotonic", return_value=111.0):
+            assert local.get("a") is None
+
+    def test_lru_eviction_by_bytes(self):
+        """Test that the least recently used entries are evicted past the byte cap."""
+        local = LocalCache(max_bytes=25)
+        local.set("a", b"x" * 9, ttl=60)
+        local.set("b", b"x" * 9, ttl=60)
+        local.get("a")
+        local.set("c", b"x" * 9, ttl=60)
+
+        assert local.get("b") is None
+        assert local.get("a") is not None
+        assert local.get("c") is not None
+        assert local.evictions == 1
+        assert local.stats()["bytes"] <= 25
+
+    def test_oversized_entry_is_skipped(self):
+        """Test that a value larger than the cap is not stored."""
+        local = LocalCache(max_bytes=10)
+        local.set("a", b"x" * 100, ttl=60)
+
+        assert local.get("a") is None
+        assert local.stats()["bytes"] == 0
+
+    def test_delete_pattern(self):
+        """Test glob invalidation of local entries."""
+        local = LocalCache(max_bytes=1024)
+        local.set("lyrics:a", b"1", ttl=60)
+        local.set("lyrics:b", b"2", ttl=60)
+        local.set("search:genius:a:20", b"3", ttl=60)
+
+        local.delete_pattern("lyrics:*")
+
+        assert local.get("lyrics:a") is None
+        assert local.get("lyrics:b") is None
+        assert local.get("search:genius:a:20") == b"3"
+
+
+class TestCacheServiceLocalTier:
+    """Tests for the L1 tier in front of Redis."""
+
+    @pytest.mark.asyncio
+    async def test_hit_served_without_redis(self, mock_redis):
+        """Test that a hot key is served from memory after the first read."""
+        service = CacheService()
+        service._redis = mock_redis
+        await mock_redis.set("lyriks:lyrics:hot", json.dumps({"v": 1}), ex=60)
+
+        assert await service.get("lyrics:hot") == {"v": 1}
+
+        # Redis ne doit plus être consulté
+        await mock_redis.delete("lyriks:lyrics:hot")
+        assert await service.get("lyrics:hot") == {"v": 1}
+        assert service.stats()["hits"] == 1
+
+    @pytest.mark.asyncio
+    async def test_local_ttl_follows_redis_ttl(self, mock_redis):
+        """Test that the L1 entry expires with the remaining Redis TTL."""
+        service = CacheService()
+        service._redis = mock_redis
+        await mock_redis.set("lyriks:lyrics:short", json.dumps({"v": 1}), px=50)
+
+        assert await service.get("lyrics:short") == {"v": 1}
+        await asyncio.sleep(0.1)
+        assert await service.get("lyrics:short") is None
+
+    @pytest.mark.asyncio
+    async def test_returned_values_are_independent(self, mock_redis):
+        """Test that mutating a returned value does not alter the cached entry."""
+        service = CacheService()
+        service._redis = mock_redis
+        await service.set("lyrics:k", {"cached": False})
+
+        value = await service.get("lyrics:k")
+        value["cached"] = True
+
+        assert await service.get("lyrics:k") == {"cached": False}
+
+    @pytest.mark.asyncio
+    async def test_cross_worker_invalidation(self, mock_redis):
+        """Test that a write on one worker evicts the L1 entry on another."""
+        worker_a = CacheService()
+        worker_b = CacheService()
+        worker_a._redis = mock_redis
+        worker_b._redis = mock_redis
+        await worker_b.start()
+        try:
+            await worker_a.set("lyrics:k", {"v": 1})
+            assert await worker_b.get("lyrics:k") == {"v": 1}
+
+            await asyncio.sleep(0.05)
+            await worker_a.set("lyrics:k", {"v": 2})
+            await asyncio.sleep(0.05)
+
+            assert await worker_b.get("lyrics:k") == {"v": 2}
+        finally:
+            worker_b._redis = None
+            await worker_b.close()
+
+    @pytest.mark.asyncio
+    async def test_entry_staleness(self, mock_redis):
+        """Test that entries become stale once their fresh TTL has elapsed."""
+        service = CacheService()
+        service._redis = mock_redis
+        await service.set("search:fresh", {"v": 1}, ttl=3600, stale_ttl=60)
+        await service.set("search:stale", {"v": 2}, ttl=0, stale_ttl=60)
+
+        fresh = await service.get_entry("search:fresh", stale_ttl=60)
+        stale = await service.get_entry("search:stale", stale_ttl=60)
+
+        assert fresh.value == {"v": 1} and fresh.stale is False
+        assert stale.value == {"v": 2} and stale.stale is True
+        assert await mock_redis.ttl("lyriks:search:fresh") == 3660
+
+    def test_key_expired_during_read_is_a_miss(self):
+        """Test that PTTL -2 (expired between GET and PTTL) is a miss and is not kept in memory."""
+        service = CacheService()
+
+        assert service._entry_from_redis("lyrics:gone", b'{"v": 1}', -2, stale_ttl=0) is None
+        assert service._local.get("lyrics:gone") is None
+
+        entry = service._entry_from_redis("lyrics:forever", b'{"v": 1}', -1, stale_ttl=60)
+        assert entry.stale is False
+        assert service._local.get("lyrics:forever") == b'{"v": 1}'
+
+    @pytest.mark.asyncio
+    async def test_get_many_and_set_many(self, mock_redis):
+        """Test batched reads and writes with TTLs."""
+        service = CacheService()
+        service._redis = mock_redis
+        await service.set_many({"lyrics:a": {"v": 1}, "lyrics:b": {"v": 2}}, ttl=100, stale_ttl=20)
+        service._local.clear()
+        await service.set("lyrics:c", {"v": 3}, ttl=0, stale_ttl=20)
+
+        entries = await service.get_many(["lyrics:a", "lyrics:missing", "lyrics:b", "lyrics:c"], stale_ttl=20)
+
+        assert [e.value if e else None for e in entries] == [{"v": 1}, None, {"v": 2}, {"v": 3}]
+        assert [e.stale for e in entries if e] == [False, False, True]
+        assert await mock_redis.ttl("lyriks:lyrics:a") == 120
+
+    @pytest.mark.asyncio
+    async def test_purge_pattern_incremental(self, mock_redis):
+        """Test SCAN/UNLINK purge with progress reporting."""
+        service = CacheService()
+        service._redis = mock_redis
+        for i in range(120):
+            await mock_redis.set(f"lyriks:lyrics:{i}", "{}")
+        await mock_redis.set("lyriks:search:genius:keep:20", "{}")
+
+        steps = [
+            (step.scanned, step.deleted, step.done)
+            async for step in service.purge_pattern("lyrics:*", scan_count=25, unlink_batch=50, max_keys_per_second=1e9)
+        ]
+
+        assert steps[-1] == (120, 120, True)
+        assert len(steps) >= 3
+        assert [deleted for _, deleted, _ in steps] == sorted(deleted for _, deleted, _ in steps)
+        assert await mock_redis.exists("lyriks:search:genius:keep:20")
+        assert not await mock_redis.keys("lyriks:lyrics:*")
+
+    @pytest.mark.asyncio
+    async def test_purge_pattern_rate_limited(self, mock_redis):
+        """Test that the purge slows down to the configured rate."""
+        service = CacheService()
+        service._redis = mock_redis
+        for i in range(20):
+            await mock_redis.set(f"lyriks:lyrics:{i}", "{}")
+
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        async for _ in service.purge_pattern("lyrics:*", unlink_batch=10, max_keys_per_second=200):
+            pass
+
+        assert loop.time() - started >= 0.09
+
+    @pytest.mark.asyncio
+    async def test_purge_pattern_zero_rate_unthrottled(self, mock_redis):
+        """Test that a rate of 0, explicit or configured, disables throttling."""
+        service = CacheService()
+        service._redis = mock_redis
+
+        for configured, explicit in ((5000, 0), (0, None)):
+            for i in range(20):
+                await mock_redis.set(f"lyriks:lyrics:{i}", "{}")
+
+            with patch("app.services.cache.settings.cache_purge_max_keys_per_second", configured), \
+                    patch("app.services.cache.asyncio.sleep") as sleep:
+                steps = [
+                    step async for step in service.purge_pattern("lyrics:*", unlink_batch=5, max_keys_per_second=explicit)
+                ]
+
+            assert steps[-1].deleted == 20
+            sleep.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_works_without_redis(self):
+        """Test that the memory tier still serves values when Redis is down."""
+        service = CacheService()
+
+        class BrokenRedis:
+            def __getattr__(self, name):
+                raise ConnectionError("redis down")
+
+        service._redis = BrokenRedis()
+        await service.set("lyrics:k", {"v": 1})
+
+        assert await service.get("lyrics:k") == {"v": 1}
+
+
+class TestCacheCodec:
+    """Tests for the versioned cache value encoding."""
+
+    PAYLOAD = {"track_name": "Déjà vu", "lines": [{"index": i, "text": "la " * 20} for i in range(50)]}
+
+    @pytest.mark.parametrize("serializer", ["json", "orjson", "msgpack"])
+    @pytest.mark.parametrize("compression", ["none", "zlib", "zstd", "lz4"])
+    def test_round_trip(self, serializer, compression):
+        """Test that every serializer / compression pair decodes its own output."""
+        codec = CacheCodec(serializer, compression, threshold=1024)
+        encoded = codec.encode(self.PAYLOAD)
+
+        assert encoded.startswith(MAGIC)
+        assert codec.decode(encoded) == self.PAYLOAD
+        assert json.loads(codec.decode_to_json(encoded)) == self.PAYLOAD
+
+    def test_small_values_are_not_compressed(self):
+        """Test that values under the threshold are stored uncompressed."""
+        codec = CacheCodec("orjson", "zstd", threshold=1024)
+        encoded = codec.encode({"v": 1})
+
+        assert encoded[4] == 0
+        assert encoded.endswith(b'{"v":1}')
+
+    def test_large_values_are_compressed(self):
+        """Test that values over the threshold shrink."""
+        codec = CacheCodec("orjson", "zstd", threshold=1024)
+
+        assert len(codec.encode(self.PAYLOAD)) < len(json.dumps(self.PAYLOAD)) / 2
+
+    def test_decodes_other_codecs(self):
+        """Test that decoding follows the header, not the configured codec."""
+        written = CacheCodec("msgpack", "lz4", threshold=0).encode(self.PAYLOAD)
+
+        assert CacheCodec("orjson", "zstd").decode(written) == self.PAYLOAD
+
+    def test_legacy_json_is_readable(self):
+        """Test that plain JSON written before the header existed still decodes."""
+        codec = CacheCodec("orjson", "zstd")
+
+        assert codec.decode(json.dumps(self.PAYLOAD).encode()) == self.PAYLOAD
+
+    def test_unknown_codec_falls_back(self):
+        """Test that an unavailable codec name falls back to a built-in one."""
+        codec = CacheCodec("nope", "nope")
+
+        assert codec.serializer.id == 0
+        assert codec.decode(codec.encode(self.PAYLOAD)) == self.PAYLOAD
+
+    @pytest.mark.asyncio
+    async def test_service_reads_legacy_entries(self, mock_redis):
+        """Test that CacheService serves entries written as plain JSON."""
+        service = CacheService()
+        service._redis = mock_redis
+        await mock_redis.set("lyriks:lyrics:old", json.dumps({"v": "é"}), ex=60)
+
+        assert await service.get("lyrics:old") == {"v": "é"}
+
+    @pytest.mark.asyncio
+    async def test_service_writes_encoded_values(self, mock_redis):
+        """Test that CacheService stores values with the codec header."""
+        service = CacheService()
+        service._redis = mock_redis
+        await service.set("lyrics:new", self.PAYLOAD, ttl=60)
+
+        assert (await mock_redis.get("lyriks:lyrics:new")).startswith(MAGIC)
+        service._local.clear()
+        assert await service.get("lyrics:new") == self.PAYLOAD
@@ -0,0 +1,131 @@
+import asyncio
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+from app.services.genius import genius_client, page_cache_key
+from app.services.http import HttpClientRegistry
+
+
+def song_hit(song_id):
+    return {"type": "song", "result": {"id": song_id, "title": f"Song {song_id}"}}
+
+
+class FakeGenius:
+    """Paged Genius /search with per-page latency; records requested pages and concurrency."""
+
+    def __init__(self, pages: dict[int, list[dict]], delay: float = 0.02):
+        self.pages = pages
+        self.delay = delay
+        self.requested: list[int] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        page = int(request.url.params["page"])
+        self.requested.append(page)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.in_flight -= 1
+        return httpx.Response(200, json={"response": {"hits": self.pages.get(page, [])}})
+
+
+@pytest.fixture
+def genius_server():
+    """Point the Genius client at a fake paged server."""
+    patchers = []
+
+    def serve(pages, **kwargs):
+        fake = FakeGenius(pages, **kwargs)
+        registry = HttpClientRegistry()
+        registry.register("genius", timeout=5.0, transport=httpx.MockTransport(fake))
+        patchers.append(patch("app.services.genius.http_clients", registry))
+        patchers[-1].start()
+        return fake
+
+    with patch("app.services.genius.settings.genius_page_size", 20):
+        yield serve
+    for patcher in patchers:
+        patcher.stop()
+
+
+def full_pages(count, size=20):
+    return {page: [song_hit((page - 1) * size + i) for i in range(size)] for page in range(1, count + 1)}
+
+
+class TestSearchSongsPaging:
+    """Tests for concurrent multi-page Genius search."""
+
+    @pytest.mark.asyncio
+    async def test_pages_fetched_concurrently_in_order(self, genius_server):
+        """Test that all needed pages are requested at once and merged in page order."""
+        server = genius_server(full_pages(5))
+
+        results = await genius_client.search_songs("daft punk", 50)
+
+        assert [r["id"] for r in results] == list(range(50))
+        assert sorted(server.requested) == [1, 2, 3]
+        assert server.max_in_flight == 3
+
+    @pytest.mark.asyncio
+    async def test_single_page_for_small_limit(self, genius_server):
+        """Test that a limit within one page makes a single request."""
+        server = genius_server(full_pages(5))
+
+        results = await genius_client.search_songs("daft punk", 15)
+
+        assert len(results) == 15
+        assert server.requested == [1]
+
+    @pytest.mark.asyncio
+    async def test_deduplicates_and_fills_from_next_page(self, genius_server):
+        """Test that duplicates and non-song hits are skipped and replaced from a further page."""
+        pages = full_pages(3)
+        pages[1][5] = {"type": "article", "result": {"id": 999}}
+        pages[2][0] = song_hit(0)
+
+        server = genius_server(pages)
+        results = await genius_client.search_songs("daft punk", 40)
+
+        ids = [r["id"] for r in results]
+        assert len(ids) == len(set(ids)) == 40
+        assert 999 not in ids
+        assert ids[:5] == [0, 1, 2, 3, 4]
+        assert sorted(server.requested) == [1, 2, 3]
+
+    @pytest.mark.asyncio
+    async def test_stops_at_last_page(self, genius_server):
+        """Test that a short page ends the search without further requests."""
+        pages = {1: [song_hit(i) for i in range(7)]}
+        server = genius_server(pages)
+
+        results = await genius_client.search_songs("rare song", 50)
+
+        assert len(results) == 7
+        assert 4 not in server.requested
+
+    @pytest.mark.asyncio
+    async def test_pages_reused_across_limits(self, genius_server, fake_cache_redis):
+        """Test that a larger limit only fetches the pages not cached yet."""
+        server = genius_server(full_pages(5))
+
+        await genius_client.search_songs("Daft Punk", 20)
+        results = await genius_client.search_songs("daft  punk", 40)
+
+        assert len(results) == 40
+        assert server.requested == [1, 2]
+        assert await fake_cache_redis.exists(f"lyriks:{page_cache_key('daft punk', 2, 20)}")
+
+    @pytest.mark.asyncio
+    async def test_page_error_propagates(self, genius_server):
+        """Test that an upstream error on a needed page is raised."""
+        registry = HttpClientRegistry()
+        registry.register("genius", timeout=5.0, transport=httpx.MockTransport(lambda r: httpx.Response(500)))
+
+        with patch("app.services.genius.http_clients", registry):
+            with pytest.raises(httpx.HTTPStatusError):
+                await genius_client.search_songs("daft punk", 50)
@@ -0,0 +1,88 @@
+import httpx
+import pytest
+
+from app.services.http import HttpClientRegistry
+
+
+class TestHttpClientRegistry:
+    """Tests for the shared upstream HTTP clients."""
+
+    def test_get_reuses_client(self):
+        """Test that the same pooled client is returned for an upstream."""
+        registry = HttpClientRegistry()
+        registry.register("genius", timeout=5.0)
+
+        assert registry.get("genius") is registry.get("genius")
+
+    def test_upstreams_have_separate_clients(self):
+        """Test that each upstream gets its own pool and timeout."""
+        registry = HttpClientRegistry()
+        registry.register("genius", timeout=5.0)
+        registry.register("lrclib", timeout=12.0)
+
+        genius = registry.get("genius")
+        lrclib = registry.get("lrclib")
+
+        assert genius is not lrclib
+        assert genius.timeout.read == 5.0
+        assert lrclib.timeout.read == 12.0
+
+    def test_get_unknown_upstream(self):
+        """Test that unregistered upstreams are rejected."""
+        registry = HttpClientRegistry()
+
+        with pytest.raises(KeyError):
+            registry.get("unknown")
+
+    @pytest.mark.asyncio
+    async def test_start_prewarms_connections(self):
+        """Test that start() opens connections to the prewarm URL."""
+        seen = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            seen.append((request.method, str(request.url)))
+            return httpx.Response(200)
+
+        registry = HttpClientRegistry()
+        registry.register(
+            "lrclib",
+            timeout=5.0,
+            prewarm_url="https://lrclib.test/api",
+            transport=httpx.MockTransport(handler),
+        )
+
+        await registry.start()
+        await registry.close()
+
+        assert seen
+        assert all(entry == ("HEAD", "https://lrclib.test/api") for entry in seen)
+
+    @pytest.mark.asyncio
+    async def test_prewarm_failure_is_ignored(self):
+        """Test that an unreachable upstream does not block startup."""
+        def handler(request: httpx.Request) -> httpx.Response:
+            raise httpx.ConnectError("unreachable", request=request)
+
+        registry = HttpClientRegistry()
+        registry.register(
+            "genius",
+            timeout=5.0,
+            prewarm_url="https://genius.test",
+            transport=httpx.MockTransport(handler),
+        )
+
+        await registry.start()
+        await registry.close()
+
+    @pytest.mark.asyncio
+    async def test_close_then_get_recreates_client(self):
+        """Test that a closed client is rebuilt on next use."""
+        registry = HttpClientRegistry()
+        registry.register("image", timeout=5.0)
+
+        first = registry.get("image")
+        await registry.close()
+
+        assert first.is_closed
+        assert registry.get("image") is not first
+        await registry.close()
@@ -0,0 +1,414 @@
+import base64
+import hashlib
+import io
+import threading
+from unittest.mock import patch
+
+import httpx
+import pytest
+from PIL import Image
+
+from app.services.image_store import ImageStore
+from app.services.images import ImageRejectedError, iter_image, open_image
+
+PNG_BYTES = b"\x89PNG\r\n\x1a\n" + b"\x00" * 1024
+
+
+def image_client(handler) -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+class TestImageProxyEndpoint:
+    """Tests for /api/image endpoints."""
+
+    @pytest.mark.asyncio
+    async def test_proxy_image_streams_body(self, async_client):
+        """Test that the image is relayed with its type and cache headers."""
+        def handler(request: httpx.Request) -> httpx.Response:
+            return httpx.Response(200, content=PNG_BYTES, headers={"content-type": "image/png"})
+
+        with patch("app.services.images.http_clients.get", return_value=image_client(handler)):
+            response = await async_client.get("/api/image", params={"url": "https://img.test/a.png"})
+
+        assert response.status_code == 200
+        assert response.content == PNG_BYTES
+        assert response.headers["content-type"] == "image/png"
+        assert response.headers["cache-control"] == "public, max-age=86400"
+        assert response.headers["content-length"] == str(len(PNG_BYTES))
+
+    @pytest.mark.asyncio
+    async def test_proxy_image_rejects_non_image(self, async_client):
+        """Test the early content-type check."""
+        def handler(request: httpx.Request) -> httpx.Response:
+            return httpx.Response(200, content=b"<html></html>", headers={"content-type": "text/html"})
+
+        with patch("app.services.images.http_clients.get", return_value=image_client(handler)):
+            response = await async_client.get("/api/image", params={"url": "https://img.test/page"})
+
+        assert response.status_code == 415
+
+    @pytest.mark.asyncio
+    async def test_proxy_image_rejects_large_content_length(self, async_client):
+        """Test that an oversized Content-Length is refused before reading the body."""
+        def handler(request: httpx.Request) -> httpx.Response:
+            return httpx.Response(200, content=PNG_BYTES, headers={"content-type": "image/png"})
+
+        with patch("app.services.images.http_clients.get", return_value=image_client(handler)), \
+             patch("app.services.images.settings.image_max_bytes", 100):
+            response = await async_client.get("/api/image", params={"url": "https://img.test/big.png"})
+
+        assert response.status_code == 413
+
+    @pytest.mark.asyncio
+    async def test_proxy_image_upstream_error(self, async_client):
+        """Test that upstream failures map to 502."""
+        def handler(request: httpx.Request) -> httpx.Response:
+            return httpx.Response(404)
+
+        with patch("app.services.images.http_clients.get", return_value=image_client(handler)):
+            response = await async_client.get("/api/image", params={"url": "https://img.test/missing.png"})
+
+        assert response.status_code == 502
+        assert "Failed to fetch image" in response.json()["detail"]
+
+    @pytest.mark.asyncio
+    async def test_proxy_image_base64(self, async_client):
+        """Test the base64 data URI endpoint."""
+        def handler(request: httpx.Request) -> httpx.Response:
+            return httpx.Response(200, content=b"abc", headers={"content-type": "image/jpeg"})
+
+        with patch("app.services.images.http_clients.get", return_value=image_client(handler)):
+            response = await async_client.get("/api/image/base64", params={"url": "https://img.test/a.jpg"})
+
+        assert response.status_code == 200
+        assert response.json()["data_uri"] == "data:image/jpeg;base64,YWJj"
+
+    @pytest.mark.asyncio
+    async def test_proxy_image_served_from_disk_cache(self, async_client):
+        """Test that a second request does not hit upstream."""
+        calls = 0
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            nonlocal calls
+            calls += 1
+            return httpx.Response(200, content=PNG_BYTES, headers={"content-type": "image/png"})
+
+        with patch("app.services.images.http_clients.get", return_value=image_client(handler)):
+            first = await async_client.get("/api/image", params={"url": "https://img.test/a.png"})
+            second = await async_client.get("/api/image", params={"url": "https://img.test/a.png"})
+
+        assert calls == 1
+        assert first.content == second.content == PNG_BYTES
+        assert second.headers["content-type"] == "image/png"
+        assert second.headers["etag"]
+
+    @pytest.mark.asyncio
+    async def test_proxy_image_if_none_match(self, async_client):
+        """Test that a matching client ETag returns 304 without a body."""
+        def handler(request: httpx.Request) -> httpx.Response:
+            return httpx.Response(200, content=PNG_BYTES, headers={"content-type": "image/png"})
+
+        with patch("app.services.images.http_clients.get", return_value=image_client(handler)):
+            await async_client.get("/api/image", params={"url": "https://img.test/a.png"})
+            cached = await async_client.get("/api/image", params={"url": "https://img.test/a.png"})
+            response = await async_client.get(
+                "/api/image",
+                params={"url": "https://img.test/a.png"},
+                headers={"If-None-Match": cached.headers["etag"]},
+            )
+
+        assert response.status_code == 304
+        assert response.content == b""
+
+    @pytest.mark.asyncio
+    async def test_streamed_miss_has_no_etag(self, async_client):
+        """Test that the first (streamed) response has no ETag and the next one can be revalidated."""
+        def handler(request: httpx.Request) -> httpx.Response:
+            return httpx.Response(200, content=PNG_BYTES, headers={"content-type": "image/png"})
+
+        with patch("app.services.images.http_clients.get", return_value=image_client(handler)):
+            streamed = await async_client.get("/api/image", params={"url": "https://img.test/a.png"})
+            stored = await async_client.get("/api/image", params={"url": "https://img.test/a.png"})
+            revalidated = await async_client.get(
+                "/api/image",
+                params={"url": "https://img.test/a.png"},
+                headers={"If-None-Match": stored.headers["etag"]},
+            )
+
+        assert "etag" not in streamed.headers
+        assert streamed.headers["cache-control"] == "public, max-age=86400"
+        assert revalidated.status_code == 304
+
+    @pytest.mark.asyncio
+    async def test_proxy_image_revalidates_stale_entry(self, async_client):
+        """Test that a stale entry is revalidated with the upstream validators."""
+        seen_headers = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            seen_headers.append(request.headers)
+            if request.headers.get("if-none-match") == '"v1"':
+                return httpx.Response(304)
+            return httpx.Response(
+                200,
+                content=PNG_BYTES,
+                headers={"content-type": "image/png", "etag": '"v1"'},
+            )
+
+        with patch("app.services.images.http_clients.get", return_value=image_client(handler)):
+            await async_client.get("/api/image", params={"url": "https://img.test/a.png"})
+            with patch("app.services.image_store.settings.image_cache_ttl", 0):
+                response = await async_client.get("/api/image", params={"url": "https://img.test/a.png"})
+
+        assert response.status_code == 200
+        assert response.content == PNG_BYTES
+        assert seen_headers[1]["if-none-match"] == '"v1"'
+
+    @pytest.mark.asyncio
+    async def test_proxy_image_stale_served_when_upstream_down(self, async_client):
+        """Test that the disk copy is served when upstream fails."""
+        def ok(request: httpx.Request) -> httpx.Response:
+            return httpx.Response(200, content=PNG_BYTES, headers={"content-type": "image/png"})
+
+        def down(request: httpx.Request) -> httpx.Response:
+            raise httpx.ConnectError("down", request=request)
+
+        with patch("app.services.images.http_clients.get", return_value=image_client(ok)):
+            await async_client.get("/api/image", params={"url": "https://img.test/a.png"})
+        with patch("app.services.images.http_clients.get", return_value=image_client(down)), \
+             patch("app.services.image_store.settings.image_cache_ttl", 0):
+            response = await async_client.get("/api/image", params={"url": "https://img.test/a.png"})
+
+        assert response.status_code == 200
+        assert response.content == PNG_BYTES
+
+
+class TestImageStore:
+    """Tests for the content-addressed disk cache."""
+
+    async def _store(self, store: ImageStore, url: str, content: bytes):
+        writer = store.writer()
+        writer.write(content)
+        return await store.commit(url, writer, content_type="image/png")
+
+    @pytest.mark.asyncio
+    async def test_identical_content_is_stored_once(self, tmp_path):
+        """Test content addressing across URLs."""
+        store = ImageStore(tmp_path / "store", max_bytes=10_000)
+        first = await self._store(store, "https://img.test/a.png", b"same")
+        second = await self._store(store, "https://img.test/b.png", b"same")
+
+        assert first.path == second.path
+        assert len(list((tmp_path / "store" / "objects").rglob("*"))) == 2  # dossier + fichier
+        await store.close()
+
+    @pytest.mark.asyncio
+    async def test_appended_chunks_written_in_batches_off_loop(self, tmp_path):
+        """Test that streamed chunks are buffered and written from a worker thread."""
+        store = ImageStore(tmp_path / "store", max_bytes=10_000_000)
+        writer = store.writer()
+        threads = []
+        write = writer.write
+
+        def record(data: bytes) -> None:
+            threads.append(threading.current_thread())
+            write(data)
+
+        chunk = b"x" * 100_000
+        with patch.object(writer, "write", side_effect=record):
+            for _ in range(5):
+                await writer.append(chunk)
+            stored = await store.commit("https://img.test/big.png", writer, content_type="image/png")
+
+        assert len(threads) == 2
+        assert threading.main_thread() not in threads
+        assert stored.size == 500_000
+        assert stored.digest == hashlib.sha256(chunk * 5).hexdigest()
+        assert stored.path.read_bytes() == chunk * 5
+        await store.close()
+
+    @pytest.mark.asyncio
+    async def test_sweep_evicts_least_recently_used(self, tmp_path):
+        """Test that the sweeper evicts old entries until under the cap."""
+        store = ImageStore(tmp_path / "store", max_bytes=250)
+        old = await self._store(store, "https://img.test/old.png", b"o" * 100)
+        await self._store(store, "https://img.test/mid.png", b"m" * 100)
+        await self._store(store, "https://img.test/new.png", b"n" * 100)
+        store._connect().execute("UPDATE images SET accessed_at = 0 WHERE url = ?", (old.url,))
+
+        freed = await store.sweep()
+
+        assert freed == 100
+        assert not old.path.exists()
+        assert await store.lookup("https://img.test/old.png") is None
+        assert await store.lookup("https://img.test/new.png") is not None
+        await store.close()
+
+
+class TestImageStreaming:
+    """Tests for the capped upstream reader."""
+
+    @pytest.mark.asyncio
+    async def test_stream_without_content_length_is_capped(self):
+        """Test that a body larger than the cap is cut off while streaming."""
+        async def chunks():
+            for _ in range(10):
+                yield b"x" * 64
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            return httpx.Response(200, content=chunks(), headers={"content-type": "image/png"})
+
+        with patch("app.services.images.http_clients.get", return_value=image_client(handler)), \
+             patch("app.services.images.settings.image_max_bytes", 200):
+            response = await open_image("https://img.test/endless.png")
+            received = b""
+            with pytest.raises(ImageRejectedError):
+                async for chunk in iter_image(response):
+                    received += chunk
+            await response.aclose()
+
+        assert len(received) <= 200
+
+
+class TestImageVariants:
+    """Tests for resized / transcoded artwork variants."""
+
+    @staticmethod
+    def png(width: int, height: int) -> bytes:
+        buffer = io.BytesIO()
+        Image.new("RGB", (width, height), "red").save(buffer, format="PNG")
+        return buffer.getvalue()
+
+    @pytest.mark.asyncio
+    async def test_resize_and_transcode(self, async_client):
+        """Test that a webp variant is produced at the requested size."""
+        source = self.png(200, 100)
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            return httpx.Response(200, content=source, headers={"content-type": "image/png"})
+
+        with patch("app.services.images.http_clients.get", return_value=image_client(handler)):
+            response = await async_client.get(
+                "/api/image",
+                params={"url": "https://img.test/a.png", "width": 50, "height": 50, "format": "webp"},
+            )
+
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "image/webp"
+        image = Image.open(io.BytesIO(response.content))
+        assert image.format == "WEBP"
+        assert image.size == (50, 50)
+
+    @pytest.mark.asyncio
+    async def test_resize_keeps_source_format(self, async_client):
+        """Test that a resize without format returns the source content type."""
+        buffer = io.BytesIO()
+        Image.new("RGB", (200, 100), "red").save(buffer, format="JPEG")
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            return httpx.Response(200, content=buffer.getvalue(), headers={"content-type": "image/jpeg"})
+
+        with patch("app.services.images.http_clients.get", return_value=image_client(handler)):
+            response = await async_client.get("/api/image", params={"url": "https://img.test/a.jpg", "width": 50})
+
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "image/jpeg"
+        image = Image.open(io.BytesIO(response.content))
+        assert image.format == "JPEG"
+        assert image.size == (50, 25)
+
+    @pytest.mark.asyncio
+    async def test_contain_keeps_aspect_ratio(self, async_client):
+        """Test that fit=contain scales inside the box."""
+        source = self.png(200, 100)
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            return httpx.Response(200, content=source, headers={"content-type": "image/png"})
+
+        with patch("app.services.images.http_clients.get", return_value=image_client(handler)):
+            response = await async_client.get(
+                "/api/image",
+                params={"url": "https://img.test/a.png", "width": 100, "height": 100, "fit": "contain", "format": "jpeg"},
+            )
+
+        image = Image.open(io.BytesIO(response.content))
+        assert image.format == "JPEG"
+        assert image.size == (100, 50)
+
+    @pytest.mark.asyncio
+    async def test_variant_is_cached(self, async_client):
+        """Test that a variant is rendered once and then served from disk."""
+        source = self.png(64, 64)
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            return httpx.Response(200, content=source, headers={"content-type": "image/png"})
+
+        params = {"url": "https://img.test/a.png", "width": 32, "format": "png"}
+        with patch("app.services.images.http_clients.get", return_value=image_client(handler)):
+            first = await async_client.get("/api/image", params=params)
+            with patch("app.services.image_transform.render_variant", side_effect=AssertionError):
+                second = await async_client.get("/api/image", params=params)
+
+        assert second.status_code == 200
+        assert first.content == second.content
+
+    @pytest.mark.asyncio
+    async def test_undecodable_source(self, async_client):
+        """Test that a source Pillow cannot read yields 415."""
+        def handler(request: httpx.Request) -> httpx.Response:
+            return httpx.Response(200, content=b"<svg/>", headers={"content-type": "image/svg+xml"})
+
+        with patch("app.services.images.http_clients.get", return_value=image_client(handler)):
+            response = await async_client.get(
+                "/api/image",
+                params={"url": "https://img.test/a.svg", "width": 32},
+            )
+
+        assert response.status_code == 415
+
+    @pytest.mark.asyncio
+    async def test_invalid_variant_params(self, async_client):
+        """Test validation of variant parameters."""
+        response = await async_client.get(
+            "/api/image",
+            params={"url": "https://img.test/a.png", "format": "bmp"},
+        )
+        assert response.status_code == 422
+
+
+class TestImageBase64:
+    """Tests for the cached data URI endpoint."""
+
+    @pytest.mark.asyncio
+    async def test_large_image_encoded_in_chunks(self, async_client):
+        """Test that chunked encoding matches a one-shot base64 of the image."""
+        content = bytes(range(256)) * 1000 + b"tail"
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            return httpx.Response(200, content=content, headers={"content-type": "image/png"})
+
+        with patch("app.services.images.http_clients.get", return_value=image_client(handler)):
+            response = await async_client.get("/api/image/base64", params={"url": "https://img.test/a.png"})
+
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/json"
+        expected = "data:image/png;base64," + base64.b64encode(content).decode()
+        assert response.json()["data_uri"] == expected
+
+    @pytest.mark.asyncio
+    async def test_data_uri_is_cached(self, async_client):
+        """Test that repeat requests neither re-fetch nor re-encode."""
+        calls = 0
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            nonlocal calls
+            calls += 1
+            return httpx.Response(200, content=b"abc", headers={"content-type": "image/jpeg"})
+
+        params = {"url": "https://img.test/a.jpg"}
+        with patch("app.services.images.http_clients.get", return_value=image_client(handler)):
+            first = await async_client.get("/api/image/base64", params=params)
+            with patch("app.services.images._write_data_uri_json", side_effect=AssertionError):
+                second = await async_client.get("/api/image/base64", params=params)
+
+        assert calls == 1
+        assert first.json() == second.json() == {"data_uri": "data:image/jpeg;base64,YWJj"}
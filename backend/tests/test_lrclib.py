@@ -0,0 +1,162 @@
+import asyncio
+import time
+from unittest.mock import patch
+
+import httpx
+import pytest
+from fastapi import FastAPI, HTTPException
+
+from app.services.http import HttpClientRegistry
+from app.services.lrclib import LrclibClient, lrclib_client, score_candidate
+
+EXACT = {
+    "trackName": "Test Song",
+    "artistName": "Test Artist",
+    "albumName": "Test Album",
+    "duration": 180,
+    "syncedLyrics": "[00:10.00] Exact",
+}
+CANDIDATES = [
+    {"trackName": "Test Song (Live)", "artistName": "Cover Band", "duration": 240, "plainLyrics": "Live"},
+    {"trackName": "Test Song", "artistName": "Test Artist", "duration": 181, "syncedLyrics": "[00:10.00] Search"},
+]
+
+
+def fake_lrclib(get_delay=0.0, search_delay=0.0, get_found=True, search_results=CANDIDATES):
+    """Local lrclib with injected latency; records every call."""
+    app = FastAPI()
+    app.state.calls = []
+
+    @app.get("/api/get")
+    async def get(track_name: str, artist_name: str, album_name: str, duration: int):
+        app.state.calls.append("get")
+        await asyncio.sleep(get_delay)
+        if not get_found:
+            raise HTTPException(status_code=404, detail="Not found")
+        return EXACT
+
+    @app.get("/api/search")
+    async def search(q: str):
+        app.state.calls.append("search")
+        await asyncio.sleep(search_delay)
+        return search_results
+
+    return app
+
+
+@pytest.fixture
+def lrclib_server():
+    """Point the lrclib client at a local fake server."""
+    patchers = []
+
+    def serve(**kwargs):
+        app = fake_lrclib(**kwargs)
+        registry = HttpClientRegistry()
+        registry.register("lrclib", timeout=5.0, transport=httpx.ASGITransport(app=app))
+        patchers.append(patch("app.services.lrclib.http_clients", registry))
+        patchers[-1].start()
+        return app
+
+    yield serve
+    for patcher in patchers:
+        patcher.stop()
+
+
+async def serial_lookup(client: LrclibClient, *args) -> dict | None:
+    """Previous strategy: /get, then /search once /get has missed."""
+    exact = await client._get(*args)
+    if exact is not None:
+        return exact
+    best, _ = await client._search(args[0], args[1], args[3])
+    return best
+
+
+class TestScoring:
+    """Tests for /search candidate ranking."""
+
+    def test_exact_metadata_wins(self):
+        """Test that matching title, artist, duration and synced lyrics rank first."""
+        scores = [score_candidate(c, "Test Song", "Test Artist", 180) for c in CANDIDATES]
+
+        assert scores[1] > scores[0]
+        assert scores[1] > 0.9
+
+    def test_accents_and_case_ignored(self):
+        """Test normalized similarity."""
+        candidate = {"trackName": "DÉJÀ VU", "artistName": "olivia rodrigo", "syncedLyrics": "x"}
+
+        assert score_candidate(candidate, "Deja Vu", "Olivia Rodrigo") > 0.95
+
+
+class TestHedgedLookup:
+    """Tests for the hedged /get + /search strategy against a fake lrclib."""
+
+    ARGS = ("Test Song", "Test Artist", "Test Album", 180)
+
+    @pytest.mark.asyncio
+    async def test_fast_get_skips_search(self, lrclib_server):
+        """Test that a quick /get answer never triggers /search."""
+        server = lrclib_server(get_delay=0.0)
+
+        assert await lrclib_client.get_lyrics(*self.ARGS) == EXACT
+        assert server.state.calls == ["get"]
+
+    @pytest.mark.asyncio
+    async def test_best_candidate_instead_of_first(self, lrclib_server):
+        """Test that the best scored /search result is returned, not results[0]."""
+        lrclib_server(get_found=False)
+
+        result = await lrclib_client.get_lyrics("Test Song", "Test Artist")
+
+        assert result["syncedLyrics"] == "[00:10.00] Search"
+
+    @pytest.mark.asyncio
+    async def test_slow_get_hedged_by_search(self, lrclib_server):
+        """Test that an acceptable /search answer wins over a slow /get, which is cancelled."""
+        lrclib_server(get_delay=1.0, search_delay=0.05)
+
+        with patch("app.services.lrclib.settings.lrclib_hedge_delay", 0.05):
+            started = time.perf_counter()
+            result = await lrclib_client.get_lyrics(*self.ARGS)
+            elapsed = time.perf_counter() - started
+
+        assert result["syncedLyrics"] == "[00:10.00] Search"
+        assert elapsed < 0.5
+
+    @pytest.mark.asyncio
+    async def test_unacceptable_search_waits_for_get(self, lrclib_server):
+        """Test that a poor /search match does not beat an exact /get still in flight."""
+        lrclib_server(get_delay=0.2, search_results=CANDIDATES[:1])
+
+        with patch("app.services.lrclib.settings.lrclib_hedge_delay", 0.0):
+            assert await lrclib_client.get_lyrics(*self.ARGS) == EXACT
+
+    @pytest.mark.asyncio
+    async def test_both_fail(self):
+        """Test that an upstream error is raised only when both lookups fail."""
+        registry = HttpClientRegistry()
+
+        def refuse(request):
+            raise httpx.ConnectError("refused", request=request)
+
+        registry.register("lrclib", timeout=5.0, transport=httpx.MockTransport(refuse))
+        with patch("app.services.lrclib.http_clients", registry):
+            with pytest.raises(httpx.ConnectError):
+                await lrclib_client.get_lyrics(*self.ARGS)
+
+    @pytest.mark.asyncio
+    async def test_latency_vs_serial(self, lrclib_server):
+        """Test that a /get miss costs max(get, search) instead of get + search."""
+        lrclib_server(get_delay=0.2, search_delay=0.2, get_found=False)
+        started = time.perf_counter()
+        serial = await serial_lookup(lrclib_client, *self.ARGS)
+        serial_elapsed = time.perf_counter() - started
+
+        with patch("app.services.lrclib.settings.lrclib_hedge_delay", 0.0):
+            started = time.perf_counter()
+            hedged = await lrclib_client.get_lyrics(*self.ARGS)
+            hedged_elapsed = time.perf_counter() - started
+
+        assert hedged == serial
+        assert serial_elapsed >= 0.4
+        assert hedged_elapsed < serial_elapsed * 0.75
@@ -1,7 +1,12 @@
+import asyncio
+import json
+
 import pytest
 from unittest.mock import AsyncMock, patch
 
+from app.api.lyrics import mark_cached
 from app.models.lyrics import Lyrics, LyricLine, parse_synced_lyrics, parse_plain_lyrics
+from app.services.cache import RawCacheEntry, cache_service
 
 
 class TestLyricsEndpoint:
@@ -12,7 +17,7 @@ class TestLyricsEndpoint:
         """Test successful lyrics retrieval."""
         with patch("app.api.lyrics.lrclib_client") as mock_lrclib, \
              patch("app.api.lyrics.cache_service") as mock_cache:
-            mock_cache.get = AsyncMock(return_value=None)
+            mock_cache.get_raw_entry = AsyncMock(return_value=None)
             mock_cache.set = AsyncMock()
             mock_lrclib.get_lyrics = AsyncMock(return_value=mock_lrclib_response)
 
@@ -34,7 +39,7 @@ class TestLyricsEndpoint:
         """Test lyrics retrieval with plain lyrics only."""
         with patch("app.api.lyrics.lrclib_client") as mock_lrclib, \
              patch("app.api.lyrics.cache_service") as mock_cache:
-            mock_cache.get = AsyncMock(return_value=None)
+            mock_cache.get_raw_entry = AsyncMock(return_value=None)
             mock_cache.set = AsyncMock()
             mock_lrclib.get_lyrics = AsyncMock(return_value=mock_lrclib_plain_response)
 
@@ -65,7 +70,7 @@ class TestLyricsEndpoint:
         }
 
         with patch("app.api.lyrics.cache_service") as mock_cache:
-            mock_cache.get = AsyncMock(return_value=cached_response)
+            mock_cache.get_raw_entry = AsyncMock(return_value=RawCacheEntry(json.dumps(cached_response).encode()))
 
             response = await async_client.get(
                 "/api/lyrics",
@@ -81,7 +86,7 @@ class TestLyricsEndpoint:
         """Test lyrics not found case."""
         with patch("app.api.lyrics.lrclib_client") as mock_lrclib, \
              patch("app.api.lyrics.cache_service") as mock_cache:
-            mock_cache.get = AsyncMock(return_value=None)
+            mock_cache.get_raw_entry = AsyncMock(return_value=None)
             mock_cache.set = AsyncMock()
             mock_lrclib.get_lyrics = AsyncMock(return_value=None)
 
@@ -109,7 +114,7 @@ class TestLyricsEndpoint:
         """Test lyrics with track_id for cache key."""
         with patch("app.api.lyrics.lrclib_client") as mock_lrclib, \
              patch("app.api.lyrics.cache_service") as mock_cache:
-            mock_cache.get = AsyncMock(return_value=None)
+            mock_cache.get_raw_entry = AsyncMock(return_value=None)
             mock_cache.set = AsyncMock()
             mock_lrclib.get_lyrics = AsyncMock(return_value=mock_lrclib_response)
 
@@ -127,7 +132,7 @@ class TestLyricsEndpoint:
         """Test handling of lrclib API errors."""
         with patch("app.api.lyrics.lrclib_client") as mock_lrclib, \
              patch("app.api.lyrics.cache_service") as mock_cache:
-            mock_cache.get = AsyncMock(return_value=None)
+            mock_cache.get_raw_entry = AsyncMock(return_value=None)
             mock_lrclib.get_lyrics = AsyncMock(side_effect=Exception("API error"))
 
             response = await async_client.get(
@@ -138,6 +143,292 @@ class TestLyricsEndpoint:
             assert response.status_code == 502
             assert "Lyrics API error" in response.json()["detail"]
 
+    @pytest.mark.asyncio
+    async def test_get_lyrics_stale_served_and_refreshed(self, async_client, mock_lrclib_response):
+        """Test that a stale entry is returned immediately and refreshed in background."""
+        stale_response = {
+            "track_id": "",
+            "track_name": "Test Song",
+            "artist_name": "Test Artist",
+            "lyrics": None,
+            "cached": False,
+            "error": "Lyrics not found",
+        }
+        await cache_service.set("lyrics:test artist:test song", stale_response, ttl=0, stale_ttl=60)
+
+        with patch("app.api.lyrics.lrclib_client") as mock_lrclib:
+            mock_lrclib.get_lyrics = AsyncMock(return_value=mock_lrclib_response)
+
+            response = await async_client.get(
+                "/api/lyrics",
+                params={"track": "Test Song", "artist": "Test Artist"}
+            )
+
+            assert response.status_code == 200
+            assert response.json()["cached"] is True
+            assert response.json()["lyrics"] is None
+
+            # Laisser le rafraîchissement en arrière-plan se terminer
+            await asyncio.sleep(0.05)
+            mock_lrclib.get_lyrics.assert_called_once()
+
+        refreshed = await cache_service.get("lyrics:test artist:test song")
+        assert refreshed["lyrics"] is not None
+
+    @pytest.mark.asyncio
+    async def test_get_lyrics_stale_served_when_upstream_fails(self, async_client):
+        """Test that a stale entry is still served while lrclib is failing."""
+        stale_response = {
+            "track_id": "",
+            "track_name": "Test Song",
+            "artist_name": "Test Artist",
+            "lyrics": None,
+            "cached": False,
+            "error": "Lyrics not found",
+        }
+        await cache_service.set("lyrics:test artist:test song", stale_response, ttl=0, stale_ttl=60)
+
+        with patch("app.api.lyrics.lrclib_client") as mock_lrclib:
+            mock_lrclib.get_lyrics = AsyncMock(side_effect=Exception("API error"))
+
+            for _ in range(2):
+                response = await async_client.get(
+                    "/api/lyrics",
+                    params={"track": "Test Song", "artist": "Test Artist"}
+                )
+                assert response.status_code == 200
+                assert response.json()["cached"] is True
+                await asyncio.sleep(0.01)
+
+    @pytest.mark.asyncio
+    async def test_get_lyrics_hit_served_from_cache_bytes(self, async_client, mock_lrclib_response):
+        """Test that a miss then a hit return the same body, flagged by X-Cache."""
+        with patch("app.api.lyrics.lrclib_client") as mock_lrclib:
+            mock_lrclib.get_lyrics = AsyncMock(return_value=mock_lrclib_response)
+            params = {"track": "Test Song", "artist": "Test Artist"}
+
+            miss = await async_client.get("/api/lyrics", params=params)
+            hit = await async_client.get("/api/lyrics", params=params)
+
+        assert miss.headers["x-cache"] == "MISS"
+        assert hit.headers["x-cache"] == "HIT"
+        assert miss.json()["cached"] is False
+        assert hit.json() == {**miss.json(), "cached": True}
+        mock_lrclib.get_lyrics.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_get_lyrics_passage_modes(self, async_client, mock_lrclib_response):
+        """Test line range, time window and timestamp selection, on miss and on hit."""
+        with patch("app.api.lyrics.lrclib_client") as mock_lrclib:
+            mock_lrclib.get_lyrics = AsyncMock(return_value=mock_lrclib_response)
+            params = {"track": "Test Song", "artist": "Test Artist"}
+
+            miss = await async_client.get("/api/lyrics", params={**params, "at": 16})
+            lines_hit = await async_client.get("/api/lyrics", params={**params, "start_line": 1, "end_line": 3})
+            window_hit = await async_client.get("/api/lyrics", params={**params, "start": 12, "end": 16})
+
+        assert miss.headers["x-cache"] == "MISS"
+        assert [line["text"] for line in miss.json()["lyrics"]["lines"]] == ["Second line"]
+        assert lines_hit.json()["cached"] is True
+        assert [line["index"] for line in lines_hit.json()["lyrics"]["lines"]] == [1, 2]
+        assert [line["text"] for line in window_hit.json()["lyrics"]["lines"]] == ["First line", "Second line"]
+
+        # Le payload complet en cache n'est pas modifié par les sélections
+        full = await async_client.get("/api/lyrics", params=params)
+        assert len(full.json()["lyrics"]["lines"]) == 3
+
+    @pytest.mark.asyncio
+    async def test_get_lyrics_passage_validation(self, async_client, mock_lrclib_plain_response):
+        """Test conflicting modes and time selection on unsynced lyrics."""
+        params = {"track": "Plain Song", "artist": "Plain Artist"}
+        response = await async_client.get("/api/lyrics", params={**params, "at": 5, "start_line": 0})
+        assert response.status_code == 400
+
+        response = await async_client.get("/api/lyrics", params={**params, "start": 20, "end": 10})
+        assert response.status_code == 400
+
+        with patch("app.api.lyrics.lrclib_client") as mock_lrclib:
+            mock_lrclib.get_lyrics = AsyncMock(return_value=mock_lrclib_plain_response)
+            response = await async_client.get("/api/lyrics", params={**params, "at": 5})
+
+        assert response.status_code == 400
+        assert "synced" in response.json()["detail"]
+
+
+class TestMarkCached:
+    """Tests for the in-place `cached` flag patch."""
+
+    def test_compact_json(self):
+        """Test patching compact JSON as written by the cache codec."""
+        data = b'{"track_id":"a","lyrics":null,"cached":false,"error":null}'
+
+        assert json.loads(mark_cached(data)) == {"track_id": "a", "lyrics": None, "cached": True, "error": None}
+
+    def test_legacy_json(self):
+        """Test patching entries written with json.dumps default separators."""
+        data = json.dumps({"track_id": "a", "cached": False}).encode()
+
+        assert json.loads(mark_cached(data))["cached"] is True
+
+    def test_lyric_text_is_untouched(self):
+        """Test that a lyric line quoting the marker is not modified."""
+        payload = {"lyrics": {"lines": [{"text": '"cached":false'}]}, "cached": False}
+
+        patched = json.loads(mark_cached(json.dumps(payload, separators=(",", ":")).encode()))
+
+        assert patched["lyrics"]["lines"][0]["text"] == '"cached":false'
+        assert patched["cached"] is True
+
+    def test_missing_flag(self):
+        """Test the parse fallback when the flag is absent."""
+        assert json.loads(mark_cached(b'{"track_id":"a"}')) == {"track_id": "a", "cached": True}
+
+
+class TestLyricsBatchEndpoint:
+    """Tests for POST /api/lyrics/batch."""
+
+    @pytest.mark.asyncio
+    async def test_batch_mixes_hits_and_misses(self, async_client, mock_lrclib_response):
+        """Test that cached items are reused and misses fetched then cached."""
+        cached_response = {
+            "track_id": "hit",
+            "track_name": "Cached Song",
+            "artist_name": "Cached Artist",
+            "lyrics": None,
+            "cached": False,
+            "error": "Lyrics not found",
+        }
+        await cache_service.set("lyrics:hit", cached_response, ttl=3600, stale_ttl=7 * 86400)
+
+        with patch("app.api.lyrics.lrclib_client") as mock_lrclib:
+            mock_lrclib.get_lyrics = AsyncMock(return_value=mock_lrclib_response)
+
+            response = await async_client.post(
+                "/api/lyrics/batch",
+                json={"items": [
+                    {"track": "Cached Song", "artist": "Cached Artist", "track_id": "hit"},
+                    {"track": "Test Song", "artist": "Test Artist", "track_id": "miss"},
+                ]},
+            )
+
+            assert response.status_code == 200
+            results = response.json()["results"]
+            assert results[0]["cached"] is True
+            assert results[1]["cached"] is False
+            assert results[1]["lyrics"]["synced"] is True
+            mock_lrclib.get_lyrics.assert_called_once()
+
+        stored = await cache_service.get("lyrics:miss")
+        assert stored["track_id"] == "miss"
+
+    @pytest.mark.asyncio
+    async def test_batch_duplicates_fetched_once(self, async_client, mock_lrclib_response):
+        """Test that duplicate items share a single lrclib call."""
+        with patch("app.api.lyrics.lrclib_client") as mock_lrclib:
+            mock_lrclib.get_lyrics = AsyncMock(return_value=mock_lrclib_response)
+
+            response = await async_client.post(
+                "/api/lyrics/batch",
+                json={"items": [{"track": "Test Song", "artist": "Test Artist"}] * 3},
+            )
+
+            assert len(response.json()["results"]) == 3
+            mock_lrclib.get_lyrics.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_batch_misses_written_once(self, async_client, mock_lrclib_response):
+        """Test that all fetched misses are cached with a single pipelined write."""
+        items = [{"track": f"Song {i}", "artist": "Artist"} for i in range(5)]
+
+        with patch("app.api.lyrics.lrclib_client") as mock_lrclib, \
+             patch.object(cache_service, "set", wraps=cache_service.set) as single_set, \
+             patch.object(cache_service, "set_many", wraps=cache_service.set_many) as set_many:
+            mock_lrclib.get_lyrics = AsyncMock(return_value=mock_lrclib_response)
+
+            response = await async_client.post("/api/lyrics/batch", json={"items": items})
+
+        assert response.status_code == 200
+        single_set.assert_not_called()
+        set_many.assert_called_once()
+        assert sorted(set_many.call_args.args[0]) == [f"lyrics:artist:song {i}" for i in range(5)]
+        assert await cache_service.get("lyrics:artist:song 4") is not None
+
+    @pytest.mark.asyncio
+    async def test_batch_shares_inflight_load_with_get(self, async_client, mock_lrclib_response):
+        """Test that a batch miss joins a concurrent GET for the same song."""
+        async def slow_lyrics(**kwargs):
+            await asyncio.sleep(0.05)
+            return mock_lrclib_response
+
+        with patch("app.api.lyrics.lrclib_client") as mock_lrclib:
+            mock_lrclib.get_lyrics = AsyncMock(side_effect=slow_lyrics)
+
+            single, batch = await asyncio.gather(
+                async_client.get("/api/lyrics", params={"track": "Test Song", "artist": "Test Artist"}),
+                async_client.post("/api/lyrics/batch", json={"items": [{"track": "Test Song", "artist": "Test Artist"}]}),
+            )
+
+            mock_lrclib.get_lyrics.assert_called_once()
+
+        assert single.json()["lyrics"] is not None
+        assert batch.json()["results"][0]["lyrics"] is not None
+        assert await cache_service.get("lyrics:test artist:test song") is not None
+
+    @pytest.mark.asyncio
+    async def test_batch_per_item_errors(self, async_client, mock_lrclib_response):
+        """Test that a failing item does not fail the whole batch and is not cached."""
+        async def get_lyrics(track_name, **kwargs):
+            if track_name == "Broken":
+                raise Exception("API error")
+            return mock_lrclib_response
+
+        with patch("app.api.lyrics.lrclib_client") as mock_lrclib:
+            mock_lrclib.get_lyrics = get_lyrics
+
+            response = await async_client.post(
+                "/api/lyrics/batch",
+                json={"items": [
+                    {"track": "Broken", "artist": "Artist"},
+                    {"track": "Test Song", "artist": "Test Artist"},
+                ]},
+            )
+
+        assert response.status_code == 200
+        results = response.json()["results"]
+        assert "Lyrics API error" in results[0]["error"]
+        assert results[1]["lyrics"] is not None
+        assert await cache_service.get("lyrics:artist:broken") is None
+
+    @pytest.mark.asyncio
+    async def test_batch_stream(self, async_client, mock_lrclib_response):
+        """Test NDJSON streaming of batch results."""
+        with patch("app.api.lyrics.lrclib_client") as mock_lrclib:
+            mock_lrclib.get_lyrics = AsyncMock(return_value=mock_lrclib_response)
+
+            response = await async_client.post(
+                "/api/lyrics/batch",
+                params={"stream": "true"},
+                json={"items": [
+                    {"track": "One", "artist": "Artist"},
+                    {"track": "Two", "artist": "Artist"},
+                ]},
+            )
+
+        assert response.headers["content-type"] == "application/x-ndjson"
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert sorted(line["index"] for line in lines) == [0, 1]
+        assert all(line["result"]["lyrics"] is not None for line in lines)
+
+    @pytest.mark.asyncio
+    async def test_batch_validation(self, async_client):
+        """Test batch size limits."""
+        response = await async_client.post("/api/lyrics/batch", json={"items": []})
+        assert response.status_code == 422
+
+        items = [{"track": f"T{i}", "artist": "A"} for i in range(51)]
+        response = await async_client.post("/api/lyrics/batch", json={"items": items})
+        assert response.status_code == 422
+
 
 class TestLyricsModel:
     """Tests for Lyrics model and parsers."""
@@ -226,3 +517,73 @@ class TestLyricsParsers:
         assert lines[0].text == "First"
         assert lines[1].text == "Second"
         assert lines[2].text == "Third"
+
+    def test_parse_synced_lyrics_millisecond_precision(self):
+        """Test [mm:ss.xxx] and [mm:ss] timestamps."""
+        lines = parse_synced_lyrics("[00:10.123] Milli\n[00:11.5] Tenth\n[00:12] Whole")
+
+        assert [line.timestamp for line in lines] == [10.123, 11.5, 12.0]
+
+    def test_parse_synced_lyrics_repeated_timestamps(self):
+        """Test that a line with several timestamps is expanded and sorted."""
+        lrc = "[00:10.00][01:20.00]Chorus\n[00:30.00]Verse"
+        lines = parse_synced_lyrics(lrc)
+
+        assert [(line.timestamp, line.text) for line in lines] == [
+            (10.0, "Chorus"),
+            (30.0, "Verse"),
+            (80.0, "Chorus"),
+        ]
+        assert [line.index for line in lines] == [0, 1, 2]
+
+    def test_parse_synced_lyrics_offset(self):
+        """Test that [offset:] shifts every timestamp (positive = earlier)."""
+        lines = parse_synced_lyrics("[ar:Artist]\n[offset:+500]\n[00:10.00] Early\n[00:00.20] Clamped")
+
+        assert [line.timestamp for line in lines] == [0.0, 9.5]
+
+    def test_parse_synced_lyrics_offset_crlf(self):
+        """Test that [offset:] and word timings also apply with CRLF line endings."""
+        lrc = "[offset:+500]\n[00:10.00] Hello\n[00:12.00]<00:12.00>Big <00:12.50>world"
+
+        for text in (lrc, lrc.replace("\n", "\r\n")):
+            lines = parse_synced_lyrics(text)
+
+            assert [(line.timestamp, line.text) for line in lines] == [(9.5, "Hello"), (11.5, "Big world")]
+            assert [word.timestamp for word in lines[1].words] == [11.5, 12.0]
+
+    def test_parse_synced_lyrics_late_offset(self):
+        """Test that an [offset:] tag after the lyrics still shifts every line."""
+        lines = parse_synced_lyrics("[00:10.00]<00:10.00>Hello\n[00:12.00] World\n[offset:-1000]")
+
+        assert [line.timestamp for line in lines] == [11.0, 13.0]
+        assert lines[0].words[0].timestamp == 11.0
+
+    def test_parse_synced_lyrics_word_timing(self):
+        """Test enhanced LRC word timestamps."""
+        lrc = "[00:10.00]<00:10.00>Hello <00:10.50>big <00:11.00>world"
+        (line,) = parse_synced_lyrics(lrc)
+
+        assert line.text == "Hello big world"
+        assert [(word.timestamp, word.text) for word in line.words] == [
+            (10.0, "Hello"),
+            (10.5, "big"),
+            (11.0, "world"),
+        ]
+
+    def test_parse_synced_lyrics_bracketed_text_kept(self):
+        """Test that non-tag brackets and angle brackets stay in the text."""
+        lines = parse_synced_lyrics("[00:05.00] [Chorus] I <3 you")
+
+        assert lines[0].text == "[Chorus] I <3 you"
+        assert lines[0].words is None
+
+    def test_lyrics_from_lrclib_word_timing(self):
+        """Test that word timing is exposed on LyricLine only when present."""
+        lyrics = Lyrics.from_lrclib({
+            "syncedLyrics": "[00:00.00]<00:00.00>Go <00:00.40>now\n[00:02.00]Plain",
+        })
+
+        assert lyrics.lines[0].timestamp == 0.0
+        assert [word.text for word in lyrics.lines[0].words] == ["Go", "now"]
+        assert lyrics.lines[1].words is None
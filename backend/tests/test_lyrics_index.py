@@ -0,0 +1,101 @@
+from app.services.codecs import dumps_json
+from app.services.lyrics_index import PassageIndex, PassageIndexCache
+
+
+def make_payload(timestamps, synced=True):
+    return {
+        "track_id": "",
+        "track_name": "Song",
+        "artist_name": "Artist",
+        "lyrics": {
+            "track_name": "Song",
+            "artist_name": "Artist",
+            "lines": [
+                {"index": i, "text": f"Line {i}", "timestamp": t if synced else None}
+                for i, t in enumerate(timestamps)
+            ],
+            "synced": synced,
+        },
+        "cached": False,
+        "error": None,
+    }
+
+
+def texts(lines):
+    return [line["text"] for line in lines]
+
+
+class TestPassageIndex:
+    """Tests for bisect-based passage selection."""
+
+    def test_line_range(self):
+        """Test slicing by line index."""
+        index = PassageIndex(make_payload([10, 20, 30, 40]))
+
+        assert texts(index.line_range(1, 3)) == ["Line 1", "Line 2"]
+        assert texts(index.line_range(2, None)) == ["Line 2", "Line 3"]
+
+    def test_window(self):
+        """Test that a window returns every line shown during it."""
+        index = PassageIndex(make_payload([10, 20, 30, 40]))
+
+        # 25 tombe pendant la ligne 1 (20-30), 35 pendant la ligne 2 (30-40)
+        assert texts(index.window(25, 35)) == ["Line 1", "Line 2"]
+        assert texts(index.window(20, 30)) == ["Line 1", "Line 2"]
+        assert texts(index.window(0, 5)) == []
+        assert texts(index.window(0, 10)) == ["Line 0"]
+        assert texts(index.window(100, 200)) == ["Line 3"]
+
+    def test_at(self):
+        """Test single timestamp lookup."""
+        index = PassageIndex(make_payload([10, 20, 30]))
+
+        assert index.at(5) == []
+        assert texts(index.at(10)) == ["Line 0"]
+        assert texts(index.at(29.9)) == ["Line 1"]
+        assert texts(index.at(500)) == ["Line 2"]
+
+    def test_unsorted_entries(self):
+        """Test that older cache entries written out of order are still searchable."""
+        index = PassageIndex(make_payload([30, 10, 20]))
+
+        assert texts(index.at(15)) == ["Line 1"]
+
+    def test_with_lines_keeps_payload(self):
+        """Test that selection does not modify the indexed payload."""
+        payload = make_payload([10, 20])
+        index = PassageIndex(payload)
+
+        passage = index.with_lines(index.at(15))
+
+        assert texts(passage["lyrics"]["lines"]) == ["Line 0"]
+        assert len(payload["lyrics"]["lines"]) == 2
+
+
+class TestPassageIndexCache:
+    """Tests for the per-entry index cache."""
+
+    def test_index_reused_for_same_value(self):
+        """Test that the index is built once per cached value."""
+        cache = PassageIndexCache(max_entries=2)
+        data = dumps_json(make_payload([10, 20]))
+
+        assert cache.get("lyrics:a", data) is cache.get("lyrics:a", data)
+
+    def test_index_rebuilt_when_value_changes(self):
+        """Test that a refreshed entry gets a new index."""
+        cache = PassageIndexCache(max_entries=2)
+        first = cache.get("lyrics:a", dumps_json(make_payload([10])))
+        second = cache.get("lyrics:a", dumps_json(make_payload([10, 20])))
+
+        assert first is not second
+        assert len(second.timestamps) == 2
+
+    def test_bounded(self):
+        """Test LRU eviction past max_entries."""
+        cache = PassageIndexCache(max_entries=2)
+        data = dumps_json(make_payload([10]))
+        for key in ("a", "b", "c"):
+            cache.get(key, data)
+
+        assert list(cache._entries) == ["b", "c"]
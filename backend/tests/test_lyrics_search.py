@@ -0,0 +1,167 @@
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from app.services.codecs import dumps_json
+from app.services.lyrics_search import build_match_query, lyrics_search
+
+
+def make_payload(track, lines, artist="Artist"):
+    return {
+        "track_id": f"id-{track}",
+        "track_name": track,
+        "artist_name": artist,
+        "lyrics": {
+            "track_name": track,
+            "artist_name": artist,
+            "album_name": "Album",
+            "lines": [{"index": i, "text": text, "timestamp": None} for i, text in enumerate(lines)],
+            "synced": False,
+        },
+        "cached": False,
+        "error": None,
+    }
+
+
+class TestBuildMatchQuery:
+    """Tests for FTS5 query construction."""
+
+    def test_phrase_with_prefix(self):
+        """Test that words become a quoted phrase with a prefix last token."""
+        assert build_match_query("Hello dar") == '"Hello dar"*'
+
+    def test_syntax_is_neutralized(self):
+        """Test that FTS5 operators and quotes in user input are dropped."""
+        assert build_match_query('love" OR NEAR(x') == '"love OR NEAR x"*'
+        assert build_match_query("*** ()") is None
+
+
+class TestLyricsSearchIndex:
+    """Tests for the local lyrics full-text index."""
+
+    @pytest.mark.asyncio
+    async def test_writes_are_batched(self):
+        """Test that submitted payloads are only searchable after a flush."""
+        lyrics_search.submit("lyrics:a", make_payload("Song A", ["Hello darkness my old friend"]))
+
+        assert await lyrics_search.search("darkness", 10) == []
+        assert await lyrics_search.flush() == 1
+
+        (match,) = await lyrics_search.search("darkness", 10)
+        assert match.track_name == "Song A"
+        assert match.lines == [(0, "Hello darkness my old friend")]
+
+    @pytest.mark.asyncio
+    async def test_phrase_and_prefix_matching(self):
+        """Test in-order phrase matching with a partial last word."""
+        lyrics_search.submit("lyrics:a", make_payload("Song A", ["old friend of mine", "friend old"]))
+        await lyrics_search.flush()
+
+        (match,) = await lyrics_search.search("old fri", 10)
+        assert match.lines == [(0, "old friend of mine")]
+        assert await lyrics_search.search("mine old", 10) == []
+
+    @pytest.mark.asyncio
+    async def test_accents_and_case_ignored(self):
+        """Test diacritics and case folding."""
+        lyrics_search.submit("lyrics:a", make_payload("Chanson", ["Je suis à l'Été"]))
+        await lyrics_search.flush()
+
+        assert len(await lyrics_search.search("a l ete", 10)) == 1
+
+    @pytest.mark.asyncio
+    async def test_reindex_replaces_lines(self):
+        """Test that a refreshed entry replaces its previous lines."""
+        lyrics_search.submit("lyrics:a", make_payload("Song A", ["first version"]))
+        await lyrics_search.flush()
+        lyrics_search.submit("lyrics:a", dumps_json(make_payload("Song A", ["second version"])))
+        await lyrics_search.flush()
+
+        assert await lyrics_search.search("first", 10) == []
+        assert len(await lyrics_search.search("second", 10)) == 1
+
+    @pytest.mark.asyncio
+    async def test_missing_lyrics_skipped(self):
+        """Test that not-found payloads are not indexed."""
+        payload = make_payload("Song A", [])
+        payload["lyrics"] = None
+        lyrics_search.submit("lyrics:a", payload)
+
+        assert await lyrics_search.flush() == 0
+
+    @pytest.mark.asyncio
+    async def test_groups_lines_by_track(self):
+        """Test grouping, per-track line order and the track limit."""
+        lyrics_search.submit("lyrics:a", make_payload("Song A", ["la la land", "nothing", "la la again"]))
+        lyrics_search.submit("lyrics:b", make_payload("Song B", ["la la"]))
+        await lyrics_search.flush()
+
+        matches = await lyrics_search.search("la la", 10)
+        by_track = {match.track_name: match.lines for match in matches}
+        assert [index for index, _ in by_track["Song A"]] == [0, 2]
+        assert len(await lyrics_search.search("la la", 1)) == 1
+
+    def test_pending_is_bounded(self):
+        """Test that the queue drops new keys past max_pending."""
+        with patch.object(lyrics_search, "max_pending", 2):
+            for key in ("a", "b", "c"):
+                lyrics_search.submit(key, {})
+
+        assert list(lyrics_search._pending) == ["a", "b"]
+
+    @pytest.mark.asyncio
+    async def test_known_keys_are_bounded(self):
+        """Test that known keys are kept in a bounded LRU, most recent first."""
+        with patch.object(lyrics_search, "max_known", 2):
+            lyrics_search._open()
+            for key in ("lyrics:a", "lyrics:b", "lyrics:c"):
+                lyrics_search.submit(key, make_payload(key, ["la la"]))
+            await lyrics_search.flush()
+
+            assert not lyrics_search.is_known("lyrics:a")
+            assert lyrics_search.is_known("lyrics:b") and lyrics_search.is_known("lyrics:c")
+
+            # Rechargement depuis la base : seules les clés les plus récentes
+            lyrics_search._disconnect()
+            lyrics_search._open()
+            assert list(lyrics_search._known) == ["lyrics:b", "lyrics:c"]
+
+    @pytest.mark.asyncio
+    async def test_backfill_skips_indexed_keys(self):
+        """Test that a backfill submit only indexes keys missing from the index."""
+        lyrics_search.submit("lyrics:a", make_payload("Song A", ["first version"]))
+        await lyrics_search.flush()
+
+        lyrics_search.submit("lyrics:a", make_payload("Song A", ["second version"]), replace=False)
+        lyrics_search.submit("lyrics:b", make_payload("Song B", ["second verse"]), replace=False)
+
+        assert await lyrics_search.flush() == 1
+        assert len(await lyrics_search.search("first", 10)) == 1
+        assert [m.track_name for m in await lyrics_search.search("second", 10)] == ["Song B"]
+
+
+class TestSearchLyricsEndpoint:
+    """Tests for /api/search/lyrics endpoint."""
+
+    @pytest.mark.asyncio
+    async def test_lyrics_fetched_then_searchable(self, async_client, mock_lrclib_response):
+        """Test that lyrics served by /api/lyrics become searchable without upstream calls."""
+        with patch("app.api.lyrics.lrclib_client") as mock_lrclib:
+            mock_lrclib.get_lyrics = AsyncMock(return_value=mock_lrclib_response)
+            await async_client.get("/api/lyrics", params={"track": "Test Song", "artist": "Test Artist"})
+        await lyrics_search.flush()
+
+        with patch("app.api.search.genius_client") as mock_genius:
+            response = await async_client.get("/api/search/lyrics", params={"q": "second li"})
+            mock_genius.search_songs.assert_not_called()
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["total"] == 1
+        assert data["results"][0]["track_name"] == "Test Song"
+        assert data["results"][0]["lines"][0]["index"] == 1
+
+    @pytest.mark.asyncio
+    async def test_query_validation(self, async_client):
+        """Test minimum query length."""
+        response = await async_client.get("/api/search/lyrics", params={"q": "a"})
+        assert response.status_code == 422
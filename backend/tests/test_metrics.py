@@ -0,0 +1,175 @@
+import os
+import time
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+from app.services.cache import cache_service
+from app.services.http import HttpClientRegistry
+from app.services.metrics import MetricsRegistry, metrics
+
+PNG_BYTES = b"\x89PNG\r\n\x1a\n" + b"\x00" * 1024
+
+
+def sample_registry(directory=None) -> MetricsRegistry:
+    registry = MetricsRegistry(directory=directory, flush_interval=5)
+    registry.counter("requests_total", "Requests", ("route",))
+    registry.gauge("in_flight", "In flight")
+    registry.histogram("latency_seconds", "Latency", ("route",), buckets=(0.1, 1.0))
+    return registry
+
+
+def metric_value(text: str, line_prefix: str) -> float | None:
+    for line in text.splitlines():
+        if line.startswith(line_prefix + " "):
+            return float(line.rsplit(" ", 1)[1])
+    return None
+
+
+class TestMetricsRegistry:
+    """Tests for the in-process metrics registry and Prometheus rendering."""
+
+    @pytest.mark.asyncio
+    async def test_render_prometheus_text(self):
+        """Test counters, gauges and cumulative histogram buckets in text format."""
+        registry = sample_registry()
+        registry._metrics["requests_total"].inc("/api/lyrics", amount=2)
+        registry._metrics["in_flight"].inc()
+        histogram = registry._metrics["latency_seconds"]
+        for value in (0.05, 0.5, 0.5, 3):
+            histogram.observe(value, "/api/lyrics")
+
+        text = await registry.render()
+
+        assert "# TYPE requests_total counter" in text
+        assert 'requests_total{route="/api/lyrics"} 2' in text
+        assert "in_flight 1" in text
+        assert 'latency_seconds_bucket{route="/api/lyrics",le="0.1"} 1' in text
+        assert 'latency_seconds_bucket{route="/api/lyrics",le="1"} 3' in text
+        assert 'latency_seconds_bucket{route="/api/lyrics",le="+Inf"} 4' in text
+        assert 'latency_seconds_count{route="/api/lyrics"} 4' in text
+        assert 'latency_seconds_sum{route="/api/lyrics"} 4.05' in text
+
+    @pytest.mark.asyncio
+    async def test_label_escaping(self):
+        """Test that quotes and backslashes in label values are escaped."""
+        registry = sample_registry()
+        registry._metrics["requests_total"].inc('a"b\\c')
+
+        assert 'requests_total{route="a\\"b\\\\c"} 1' in await registry.render()
+
+    @pytest.mark.asyncio
+    async def test_workers_are_aggregated(self, tmp_path):
+        """Test that snapshots from other workers are summed into one exposition."""
+        worker_a = sample_registry(tmp_path)
+        worker_b = sample_registry(tmp_path)
+        worker_a._metrics["requests_total"].inc("/x", amount=3)
+        worker_a._metrics["latency_seconds"].observe(0.05, "/x")
+        worker_a._metrics["in_flight"].inc(amount=2)
+        worker_b._metrics["requests_total"].inc("/x")
+        worker_b._metrics["latency_seconds"].observe(0.5, "/x")
+        worker_b._metrics["in_flight"].inc()
+        await worker_a.flush()
+
+        text = await worker_b.render()
+
+        assert metric_value(text, 'requests_total{route="/x"}') == 4
+        assert metric_value(text, 'latency_seconds_count{route="/x"}') == 2
+        assert metric_value(text, 'latency_seconds_bucket{route="/x",le="0.1"}') == 1
+        assert metric_value(text, "in_flight") == 3
+
+    @pytest.mark.asyncio
+    async def test_stale_worker_gauges_ignored(self, tmp_path):
+        """Test that a silent worker keeps its counters but not its gauges."""
+        worker_a = sample_registry(tmp_path)
+        worker_b = sample_registry(tmp_path)
+        worker_a._metrics["requests_total"].inc("/x", amount=3)
+        worker_a._metrics["in_flight"].inc(amount=2)
+        await worker_a.flush()
+        old = time.time() - 60
+        os.utime(tmp_path / f"{worker_a.worker_id}.json", (old, old))
+
+        text = await worker_b.render()
+
+        assert metric_value(text, 'requests_total{route="/x"}') == 3
+        assert metric_value(text, "in_flight") is None
+
+
+class TestMetricsEndpoint:
+    """Tests for /metrics and the recorded application metrics."""
+
+    def test_http_requests_recorded_by_route(self, client):
+        """Test per-route request counts and latency, labelled by route template."""
+        client.get("/api/search/suggest", params={"q": "daft"})
+        client.get("/api/search/suggest", params={"q": "punk"})
+
+        response = client.get("/metrics")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+        text = response.text
+        assert metric_value(text, 'lyriks_http_requests_total{method="GET",route="/api/search/suggest",status="200"}') == 2
+        assert metric_value(text, 'lyriks_http_request_duration_seconds_count{method="GET",route="/api/search/suggest"}') == 2
+        # La requête /metrics elle-même est en cours
+        assert metric_value(text, "lyriks_http_requests_in_flight") == 1
+
+    def test_disabled(self, client):
+        """Test that /metrics can be turned off."""
+        with patch("app.api.metrics.settings.metrics_enabled", False):
+            assert client.get("/metrics").status_code == 404
+
+    @pytest.mark.asyncio
+    async def test_upstream_latency_and_errors(self):
+        """Test that every upstream call is timed and failures are counted by kind."""
+        def handler(request: httpx.Request) -> httpx.Response:
+            if request.url.path == "/down":
+                raise httpx.ConnectError("refused", request=request)
+            return httpx.Response(503 if request.url.path == "/error" else 200)
+
+        registry = HttpClientRegistry()
+        registry.register("genius", timeout=5.0, transport=httpx.MockTransport(handler))
+        client = registry.get("genius")
+        await client.get("https://genius.test/ok")
+        await client.get("https://genius.test/error")
+        with pytest.raises(httpx.ConnectError):
+            await client.get("https://genius.test/down")
+
+        text = await metrics.render()
+
+        assert metric_value(text, 'lyriks_upstream_request_duration_seconds_count{upstream="genius"}') == 2
+        assert metric_value(text, 'lyriks_upstream_errors_total{upstream="genius",kind="5xx"}') == 1
+        assert metric_value(text, 'lyriks_upstream_errors_total{upstream="genius",kind="transport"}') == 1
+        assert metric_value(text, 'lyriks_upstream_requests_in_flight{upstream="genius"}') == 0
+
+    @pytest.mark.asyncio
+    async def test_cache_hits_and_misses_by_prefix(self):
+        """Test cache counters labelled by key prefix and tier."""
+        await cache_service.get("lyrics:missing")
+        await cache_service.set("lyrics:a", {"x": 1})
+        await cache_service.get("lyrics:a")
+        cache_service._local.clear()
+        await cache_service.get_many(["lyrics:a", "search:genius:b"])
+
+        text = await metrics.render()
+
+        assert metric_value(text, 'lyriks_cache_misses_total{prefix="lyrics"}') == 1
+        assert metric_value(text, 'lyriks_cache_misses_total{prefix="search"}') == 1
+        assert metric_value(text, 'lyriks_cache_hits_total{prefix="lyrics",tier="local"}') == 1
+        assert metric_value(text, 'lyriks_cache_hits_total{prefix="lyrics",tier="redis"}') == 1
+
+    @pytest.mark.asyncio
+    async def test_image_bytes_proxied(self, async_client):
+        """Test that image bytes are counted for upstream streams and disk cache hits."""
+        def handler(request: httpx.Request) -> httpx.Response:
+            return httpx.Response(200, content=PNG_BYTES, headers={"content-type": "image/png"})
+
+        image_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        with patch("app.services.images.http_clients.get", return_value=image_client):
+            await async_client.get("/api/image", params={"url": "https://img.test/a.png"})
+            await async_client.get("/api/image", params={"url": "https://img.test/a.png"})
+
+        text = await metrics.render()
+
+        assert metric_value(text, 'lyriks_image_bytes_proxied_total{source="upstream"}') == len(PNG_BYTES)
+        assert metric_value(text, 'lyriks_image_bytes_proxied_total{source="cache"}') == len(PNG_BYTES)
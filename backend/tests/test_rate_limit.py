@@ -0,0 +1,226 @@
+from unittest.mock import patch
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from app.api.middleware import RateLimitMiddleware
+from app.config import settings
+from app.services.rate_limit import RateLimiter, consume_shared_buckets
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    fake = FakeClock()
+    with patch("app.services.rate_limit.time.monotonic", fake):
+        yield fake
+
+
+def limited_app(limiter: RateLimiter) -> httpx.AsyncClient:
+    app = FastAPI()
+
+    @app.get("/api/search")
+    async def search():
+        return {"ok": True}
+
+    @app.get("/api/search/suggest")
+    async def suggest():
+        return {"ok": True}
+
+    @app.get("/api/image")
+    async def image():
+        return {"ok": True}
+
+    @app.get("/api/health")
+    async def health():
+        return {"ok": True}
+
+    app.add_middleware(RateLimitMiddleware, limiter=limiter)
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+class TestRateLimiter:
+    """Tests for the local token bucket."""
+
+    def test_allows_burst_then_denies(self, clock):
+        """Test that a client can spend its whole budget, then gets a retry delay."""
+        limiter = RateLimiter(per_minute=60, sync_interval=1)
+
+        decisions = [limiter.consume("1.2.3.4", 3) for _ in range(21)]
+
+        assert all(d.allowed for d in decisions[:20])
+        assert decisions[19].remaining == 0
+        assert not decisions[20].allowed
+        assert decisions[20].retry_after == 3
+
+    def test_refills_over_time(self, clock):
+        """Test that tokens come back at per_minute / 60 per second."""
+        limiter = RateLimiter(per_minute=60, sync_interval=1)
+        for _ in range(60):
+            limiter.consume("client")
+        assert not limiter.consume("client").allowed
+
+        clock.now += 5
+
+        decision = limiter.consume("client")
+        assert decision.allowed
+        assert decision.remaining == 4
+        assert decision.reset == 56
+
+    def test_clients_are_independent(self, clock):
+        """Test that one client exhausting its budget does not affect another."""
+        limiter = RateLimiter(per_minute=2, sync_interval=1)
+        limiter.consume("a", 2)
+
+        assert not limiter.consume("a").allowed
+        assert limiter.consume("b").allowed
+
+    def test_cost_capped_at_capacity(self, clock):
+        """Test that a route costing more than the budget stays reachable."""
+        limiter = RateLimiter(per_minute=3, sync_interval=1)
+
+        assert limiter.consume("client", 5).allowed
+
+    @pytest.mark.asyncio
+    async def test_sync_shares_budget_between_workers(self, clock):
+        """Test that reconciliation through Redis enforces one budget across workers."""
+        worker_a = RateLimiter(per_minute=60, sync_interval=1)
+        worker_b = RateLimiter(per_minute=60, sync_interval=1)
+        for _ in range(40):
+            assert worker_a.consume("client").allowed
+            assert worker_b.consume("client").allowed
+
+        await worker_a.sync()
+        await worker_b.sync()
+
+        # 80 jetons consommés au total pour un budget de 60
+        assert not worker_b.consume("client").allowed
+        assert worker_b.consume("other").allowed
+
+    @pytest.mark.asyncio
+    async def test_sync_without_redis_keeps_local_limits(self, clock):
+        """Test that a Redis outage leaves the local buckets untouched."""
+        limiter = RateLimiter(per_minute=60, sync_interval=1)
+        limiter.consume("client", 10)
+
+        with patch("app.services.rate_limit.consume_shared_buckets", return_value=None):
+            await limiter.sync()
+
+        assert limiter.consume("client").remaining == 49
+
+    @pytest.mark.asyncio
+    async def test_sync_failure_keeps_pending_consumption(self, clock):
+        """Test that consumption not sent during a Redis outage is sent at the next sync."""
+        limiter = RateLimiter(per_minute=60, sync_interval=1)
+        limiter.consume("client", 10)
+
+        with patch("app.services.rate_limit.consume_shared_buckets", return_value=None):
+            await limiter.sync()
+        limiter.consume("client", 5)
+
+        assert limiter._pending == {"client": 15}
+        await limiter.sync()
+        other_worker = RateLimiter(per_minute=60, sync_interval=1)
+        other_worker.consume("client")
+        await other_worker.sync()
+        assert other_worker._buckets["client"].tokens < 60 - 15
+
+    @pytest.mark.asyncio
+    async def test_shared_bucket_outlives_debt(self, fake_cache_redis):
+        """Test that a bucket in debt is kept in Redis until it could have refilled."""
+        await consume_shared_buckets({"client": 200}, capacity=60, rate=1)
+
+        ttl = await fake_cache_redis.ttl("lyriks:ratelimit:client")
+        assert ttl > 120
+
+    @pytest.mark.asyncio
+    async def test_sync_prunes_idle_buckets(self, clock):
+        """Test that buckets idle for a whole window are dropped."""
+        limiter = RateLimiter(per_minute=60, sync_interval=1)
+        limiter.consume("idle")
+        await limiter.sync()
+        clock.now += 61
+
+        await limiter.sync()
+
+        assert "idle" not in limiter._buckets
+
+
+class TestRateLimitMiddleware:
+    """Tests for the rate-limit ASGI middleware."""
+
+    @pytest.mark.asyncio
+    async def test_headers_and_route_costs(self):
+        """Test RateLimit-* headers and per-route costs."""
+        async with limited_app(RateLimiter(per_minute=60, sync_interval=1)) as client:
+            search = await client.get("/api/search")
+            suggest = await client.get("/api/search/suggest")
+
+        assert search.headers["RateLimit-Limit"] == "60"
+        assert search.headers["RateLimit-Remaining"] == "57"
+        assert search.headers["RateLimit-Policy"] == "60;w=60"
+        assert suggest.headers["RateLimit-Remaining"] == "56"
+
+    @pytest.mark.asyncio
+    async def test_search_page_views_fit_default_budget(self):
+        """Test that several real result pages (type-ahead searches + 20 thumbnails) fit in a minute."""
+        assert settings.rate_limit_costs["/api/image"] > 1
+        async with limited_app(RateLimiter(per_minute=settings.rate_limit_per_minute, sync_interval=1)) as client:
+            responses = []
+            for _ in range(5):
+                # Recherches successives pendant la saisie (debounce), puis la page de 20 résultats
+                responses += [await client.get("/api/search") for _ in range(4)]
+                responses += [await client.get("/api/image", params={"url": f"https://img.test/{i}.png"}) for i in range(20)]
+
+        assert [r.status_code for r in responses] == [200] * 120
+
+    @pytest.mark.asyncio
+    async def test_too_many_requests(self):
+        """Test that an exhausted budget returns 429 with Retry-After."""
+        async with limited_app(RateLimiter(per_minute=6, sync_interval=1)) as client:
+            await client.get("/api/search")
+            await client.get("/api/search")
+            response = await client.get("/api/search")
+
+        assert response.status_code == 429
+        assert response.headers["Retry-After"] == "30"
+        assert response.headers["RateLimit-Remaining"] == "0"
+
+    @pytest.mark.asyncio
+    async def test_exempt_routes(self):
+        """Test that health checks and CORS preflights are not limited."""
+        async with limited_app(RateLimiter(per_minute=1, sync_interval=1)) as client:
+            health = [await client.get("/api/health") for _ in range(3)]
+            await client.options("/api/search")
+            search = await client.get("/api/search")
+
+        assert all(r.status_code == 200 and "RateLimit-Limit" not in r.headers for r in health)
+        assert search.status_code == 200
+
+    @pytest.mark.asyncio
+    async def test_forwarded_client_behind_proxy(self):
+        """Test that X-Forwarded-For identifies clients only when the proxy is trusted."""
+        async with limited_app(RateLimiter(per_minute=3, sync_interval=1)) as client:
+            with patch("app.api.middleware.settings.rate_limit_trust_proxy", True):
+                first = await client.get("/api/search", headers={"X-Forwarded-For": "1.1.1.1, 10.0.0.1"})
+                second = await client.get("/api/search", headers={"X-Forwarded-For": "2.2.2.2"})
+            third = await client.get("/api/search", headers={"X-Forwarded-For": "3.3.3.3"})
+
+        assert first.status_code == second.status_code == third.status_code == 200
+        assert first.headers["RateLimit-Remaining"] == second.headers["RateLimit-Remaining"] == "0"
+
+    def test_app_is_limited(self, client):
+        """Test that the application applies rate limiting to /api routes."""
+        response = client.get("/api/search/suggest", params={"q": "da"})
+
+        assert response.status_code == 200
+        assert "RateLimit-Remaining" in response.headers
+        assert "RateLimit-Limit" not in client.get("/api/health").headers
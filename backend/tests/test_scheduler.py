@@ -0,0 +1,202 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+from app.services.scheduler import (
+    BACKGROUND,
+    INTERACTIVE,
+    UpstreamBusyError,
+    UpstreamScheduler,
+    request_priority,
+    retry_after_seconds,
+)
+from app.services.singleflight import SingleFlight
+
+
+def make_scheduler(**overrides) -> UpstreamScheduler:
+    options = dict(rps=50, burst=1, max_queue=10, max_wait=1.0, background_max_wait=1.0)
+    options.update(overrides)
+    return UpstreamScheduler("test", **options)
+
+
+def status_error(status: int, headers: dict | None = None) -> httpx.HTTPStatusError:
+    request = httpx.Request("GET", "https://upstream.test")
+    response = httpx.Response(status, headers=headers, request=request)
+    return httpx.HTTPStatusError("error", request=request, response=response)
+
+
+class TestUpstreamScheduler:
+    """Tests for the outbound per-upstream scheduler."""
+
+    @pytest.mark.asyncio
+    async def test_paces_to_rps(self):
+        """Test that calls beyond the burst are spread at the configured rate."""
+        scheduler = make_scheduler(rps=100, burst=1)
+        started = time.monotonic()
+
+        await asyncio.gather(*(scheduler.call(lambda: asyncio.sleep(0)) for _ in range(11)))
+
+        assert time.monotonic() - started >= 0.09
+
+    @pytest.mark.asyncio
+    async def test_unlimited_when_rps_is_zero(self):
+        """Test that a zero budget disables scheduling."""
+        scheduler = make_scheduler(rps=0)
+
+        await asyncio.gather(*(scheduler.call(lambda: asyncio.sleep(0)) for _ in range(100)))
+
+        assert scheduler.snapshot()["queued"] == 0
+
+    @pytest.mark.asyncio
+    async def test_interactive_before_background(self):
+        """Test that queued interactive calls are served before background ones."""
+        scheduler = make_scheduler(rps=100, burst=1)
+        order = []
+
+        def record(label):
+            async def call():
+                order.append(label)
+
+            return call
+
+        await scheduler.call(record("first"))
+        waiting = [asyncio.ensure_future(scheduler.call(record(f"bg{i}"), BACKGROUND)) for i in range(3)]
+        await asyncio.sleep(0)
+        waiting.append(asyncio.ensure_future(scheduler.call(record("user"), INTERACTIVE)))
+        await asyncio.gather(*waiting)
+
+        assert order == ["first", "user", "bg0", "bg1", "bg2"]
+
+    @pytest.mark.asyncio
+    async def test_priority_from_context(self):
+        """Test that the priority defaults to the one set for the current context."""
+        scheduler = make_scheduler(rps=100, burst=1, max_queue=1)
+        await scheduler.call(lambda: asyncio.sleep(0))
+        token = request_priority.set(BACKGROUND)
+        try:
+            queued = asyncio.ensure_future(scheduler.call(lambda: asyncio.sleep(0)))
+        finally:
+            request_priority.reset(token)
+        await asyncio.sleep(0)
+
+        # La file est pleine : l'appel interactif évince l'appel d'arrière-plan
+        await scheduler.call(lambda: asyncio.sleep(0))
+
+        with pytest.raises(UpstreamBusyError):
+            await queued
+
+    @pytest.mark.asyncio
+    async def test_full_queue_rejects(self):
+        """Test that a full queue rejects calls of equal priority immediately."""
+        scheduler = make_scheduler(rps=10, burst=1, max_queue=2)
+        await scheduler.call(lambda: asyncio.sleep(0))
+        queued = [asyncio.ensure_future(scheduler.call(lambda: asyncio.sleep(0))) for _ in range(2)]
+        await asyncio.sleep(0)
+
+        with pytest.raises(UpstreamBusyError):
+            await scheduler.call(lambda: asyncio.sleep(0))
+        await asyncio.gather(*queued)
+
+    @pytest.mark.asyncio
+    async def test_deadline_drops_waiting_call(self):
+        """Test that a call still queued at its deadline is dropped without reaching the upstream."""
+        scheduler = make_scheduler(rps=1, burst=1, max_wait=0.05)
+        calls = []
+
+        async def upstream():
+            calls.append(True)
+
+        await scheduler.call(upstream)
+        started = time.monotonic()
+        with pytest.raises(UpstreamBusyError) as exc_info:
+            await scheduler.call(upstream)
+
+        assert time.monotonic() - started < 0.5
+        assert len(calls) == 1
+        assert exc_info.value.retry_after > 0
+
+    @pytest.mark.asyncio
+    async def test_429_pauses_and_retries(self):
+        """Test that a 429 with Retry-After pauses the upstream, then the call is retried once."""
+        scheduler = make_scheduler(rps=100, burst=10)
+        attempts = []
+
+        async def upstream():
+            attempts.append(time.monotonic())
+            if len(attempts) == 1:
+                raise status_error(429, {"Retry-After": "0.1"})
+            return "ok"
+
+        assert await scheduler.call(upstream) == "ok"
+        assert attempts[1] - attempts[0] >= 0.09
+
+    @pytest.mark.asyncio
+    async def test_429_beyond_deadline_raises(self):
+        """Test that a 429 is not retried when the pause exceeds the caller's deadline."""
+        scheduler = make_scheduler(max_wait=0.5)
+
+        async def upstream():
+            raise status_error(429, {"Retry-After": "30"})
+
+        with pytest.raises(httpx.HTTPStatusError):
+            await scheduler.call(upstream)
+        assert scheduler.snapshot()["paused_for"] > 29
+
+    @pytest.mark.asyncio
+    async def test_503_retry_after_pauses_without_retry(self):
+        """Test that a 503 with Retry-After pauses the upstream but is not replayed."""
+        scheduler = make_scheduler()
+        attempts = []
+
+        async def upstream():
+            attempts.append(True)
+            raise status_error(503, {"Retry-After": "5"})
+
+        with pytest.raises(httpx.HTTPStatusError):
+            await scheduler.call(upstream)
+        assert len(attempts) == 1
+        assert scheduler.snapshot()["paused_for"] > 4
+
+    def test_retry_after_formats(self):
+        """Test Retry-After parsing as seconds and as an HTTP date."""
+        later = datetime.now(timezone.utc) + timedelta(seconds=120)
+
+        assert retry_after_seconds(httpx.Response(429, headers={"Retry-After": "7"})) == 7
+        assert 110 < retry_after_seconds(httpx.Response(429, headers={"Retry-After": format_datetime(later, usegmt=True)})) <= 120
+        assert retry_after_seconds(httpx.Response(429, headers={"Retry-After": "soon"})) is None
+        assert retry_after_seconds(httpx.Response(429)) is None
+
+
+class TestBackgroundPriority:
+    """Tests for background priority propagation."""
+
+    @pytest.mark.asyncio
+    async def test_refresh_runs_in_background(self):
+        """Test that stale-while-revalidate refreshes call upstreams with background priority."""
+        seen = []
+        done = asyncio.Event()
+
+        async def loader():
+            seen.append(request_priority.get())
+            done.set()
+            return {}
+
+        flight = SingleFlight(lock_ttl=1, wait_timeout=1)
+        flight.refresh("key", loader)
+        await asyncio.wait_for(done.wait(), 1)
+
+        assert seen == [BACKGROUND]
+        assert request_priority.get() == INTERACTIVE
+
+    def test_busy_upstream_returns_503(self, client):
+        """Test that a saturated lrclib queue fails fast with Retry-After."""
+        with patch("app.api.lyrics.lrclib_client.get_lyrics", side_effect=UpstreamBusyError("lrclib", 2.5)):
+            response = client.get("/api/lyrics", params={"track": "Song", "artist": "Artist"})
+
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "3"
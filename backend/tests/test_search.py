@@ -1,7 +1,38 @@
+import json
+
 import pytest
 from unittest.mock import AsyncMock, patch
 
 from app.models.track import Track, Artist, Album, AlbumImage
+from app.api.search import rendered_search_cache, search_cache_key
+from app.services.cache import RawCacheEntry
+from app.services.codecs import loads_json
+from app.utils.text import normalize_text
+
+
+def genius_song(song_id):
+    return {
+        "id": song_id,
+        "title": f"Song {song_id}",
+        "artist_names": "Daft Punk",
+        "primary_artist": {"id": 1, "name": "Daft Punk"},
+    }
+
+
+class TestSearchCacheKey:
+    """Tests for query canonicalization."""
+
+    def test_normalize_text(self):
+        """Test NFKC, casefold, whitespace collapse and optional accent folding."""
+        assert normalize_text("  Dáft\u3000 PUNK ") == "daft punk"
+        assert normalize_text("Straße") == "strasse"
+        assert normalize_text("ﬁre", accents=True) == "fire"
+        assert normalize_text("Dáft", accents=True) == "dáft"
+
+    def test_equivalent_queries_share_a_key(self):
+        """Test that spelling variants and limits map to one cache entry."""
+        keys = {search_cache_key(q) for q in ("Daft  Punk", "daft punk ", "Dáft Punk", "DAFT PUNK")}
+        assert keys == {"search:genius:daft punk"}
 
 
 class TestSearchEndpoint:
@@ -12,7 +43,7 @@ class TestSearchEndpoint:
         """Test successful search."""
         with patch("app.api.search.spotify_client") as mock_spotify, \
              patch("app.api.search.cache_service") as mock_cache:
-            mock_cache.get = AsyncMock(return_value=None)
+            mock_cache.get_raw_entry = AsyncMock(return_value=None)
             mock_cache.set = AsyncMock()
             mock_spotify.search_tracks = AsyncMock(return_value=mock_spotify_search_response)
 
@@ -36,7 +67,7 @@ class TestSearchEndpoint:
         }
 
         with patch("app.api.search.cache_service") as mock_cache:
-            mock_cache.get = AsyncMock(return_value=cached_response)
+            mock_cache.get_raw_entry = AsyncMock(return_value=RawCacheEntry(json.dumps(cached_response).encode()))
 
             response = await async_client.get("/api/search", params={"q": "cached query"})
 
@@ -45,6 +76,47 @@ class TestSearchEndpoint:
             assert data["query"] == "cached query"
             assert data["total"] == 0
 
+    @pytest.mark.asyncio
+    async def test_search_fetches_max_once_and_slices(self, async_client):
+        """Test that variants and limits are served from one full-size Genius call."""
+        with patch("app.api.search.genius_client") as mock_genius:
+            mock_genius.search_songs = AsyncMock(return_value=[genius_song(i) for i in range(50)])
+
+            first = await async_client.get("/api/search", params={"q": "Daft Punk", "limit": 20})
+            second = await async_client.get("/api/search", params={"q": "dáft  punk", "limit": 5})
+
+            mock_genius.search_songs.assert_called_once_with("Daft Punk", 50)
+
+        assert first.headers["x-cache"] == "MISS"
+        assert first.json()["total"] == 20
+        assert second.headers["x-cache"] == "HIT"
+        assert second.json()["query"] == "dáft  punk"
+        assert [r["id"] for r in second.json()["results"]] == ["0", "1", "2", "3", "4"]
+
+    @pytest.mark.asyncio
+    async def test_search_hits_reuse_rendered_body(self, async_client):
+        """Test that repeated hits skip parsing until the cached entry changes."""
+        rendered_search_cache.clear()
+        results = [Track.from_genius(genius_song(i)).model_dump(mode="json") for i in range(3)]
+        payload = {"query": "daft punk", "results": results, "total": 3}
+        entry = RawCacheEntry(json.dumps(payload).encode())
+
+        with patch("app.api.search.cache_service") as mock_cache, \
+             patch("app.api.search.loads_json", wraps=loads_json) as parse:
+            mock_cache.get_raw_entry = AsyncMock(return_value=entry)
+            responses = [await async_client.get("/api/search", params={"q": "Daft Punk", "limit": 2}) for _ in range(3)]
+            assert parse.call_count == 1
+
+            payload["results"] = payload["results"][:1]
+            mock_cache.get_raw_entry = AsyncMock(return_value=RawCacheEntry(json.dumps(payload).encode()))
+            updated = await async_client.get("/api/search", params={"q": "Daft Punk", "limit": 2})
+            assert parse.call_count == 2
+
+        assert all(r.json() == responses[0].json() for r in responses)
+        assert [r["id"] for r in responses[0].json()["results"]] == ["0", "1"]
+        assert responses[0].json()["query"] == "Daft Punk"
+        assert updated.json()["total"] == 1
+
     @pytest.mark.asyncio
     async def test_search_empty_query_validation(self, async_client):
         """Test validation for empty query."""
@@ -62,7 +134,7 @@ class TestSearchEndpoint:
         """Test search with custom limit."""
         with patch("app.api.search.spotify_client") as mock_spotify, \
              patch("app.api.search.cache_service") as mock_cache:
-            mock_cache.get = AsyncMock(return_value=None)
+            mock_cache.get_raw_entry = AsyncMock(return_value=None)
             mock_cache.set = AsyncMock()
             mock_spotify.search_tracks = AsyncMock(return_value=mock_spotify_search_response)
 
@@ -85,7 +157,7 @@ class TestSearchEndpoint:
         """Test handling of Spotify API errors."""
         with patch("app.api.search.spotify_client") as mock_spotify, \
              patch("app.api.search.cache_service") as mock_cache:
-            mock_cache.get = AsyncMock(return_value=None)
+            mock_cache.get_raw_entry = AsyncMock(return_value=None)
             mock_spotify.search_tracks = AsyncMock(side_effect=Exception("Spotify error"))
 
             response = await async_client.get("/api/search", params={"q": "test"})
@@ -0,0 +1,127 @@
+import asyncio
+
+import pytest
+
+from app.services.cache import cache_service
+from app.services.singleflight import SingleFlight
+
+
+class TestSingleFlight:
+    """Tests for cache-miss request coalescing."""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_calls_share_one_load(self):
+        """Test that concurrent misses on the same key call the loader once."""
+        flight = SingleFlight(lock_ttl=5.0, wait_timeout=5.0)
+        calls = 0
+
+        async def loader() -> dict:
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.05)
+            payload = {"value": 42}
+            await cache_service.set("lyrics:hot", payload)
+            return payload
+
+        results = await asyncio.gather(*(flight.do("lyrics:hot", loader) for _ in range(50)))
+
+        assert calls == 1
+        assert all(result == {"value": 42} for result in results)
+
+    @pytest.mark.asyncio
+    async def test_distinct_keys_load_independently(self):
+        """Test that different keys are not coalesced together."""
+        flight = SingleFlight(lock_ttl=5.0, wait_timeout=5.0)
+        calls = []
+
+        def make_loader(key: str):
+            async def loader() -> dict:
+                calls.append(key)
+                return {"key": key}
+            return loader
+
+        results = await asyncio.gather(
+            flight.do("search:genius:a:20", make_loader("a")),
+            flight.do("search:genius:b:20", make_loader("b")),
+        )
+
+        assert sorted(calls) == ["a", "b"]
+        assert results == [{"key": "a"}, {"key": "b"}]
+
+    @pytest.mark.asyncio
+    async def test_errors_are_shared_and_not_cached(self):
+        """Test that a failed load propagates to every waiter and can be retried."""
+        flight = SingleFlight(lock_ttl=5.0, wait_timeout=5.0)
+
+        async def failing() -> dict:
+            await asyncio.sleep(0.01)
+            raise RuntimeError("upstream down")
+
+        results = await asyncio.gather(
+            *(flight.do("lyrics:down", failing) for _ in range(5)),
+            return_exceptions=True,
+        )
+        assert all(isinstance(result, RuntimeError) for result in results)
+
+        async def working() -> dict:
+            return {"ok": True}
+
+        assert await flight.do("lyrics:down", working) == {"ok": True}
+
+    @pytest.mark.asyncio
+    async def test_other_worker_waits_for_lock_holder(self):
+        """Test that a second worker reuses the result cached by the lock holder."""
+        worker_a = SingleFlight(lock_ttl=5.0, wait_timeout=5.0)
+        worker_b = SingleFlight(lock_ttl=5.0, wait_timeout=5.0)
+        calls = 0
+        started = asyncio.Event()
+
+        async def loader() -> dict:
+            nonlocal calls
+            calls += 1
+            started.set()
+            await asyncio.sleep(0.05)
+            payload = {"value": "shared"}
+            await cache_service.set("lyrics:cross", payload)
+            return payload
+
+        first = asyncio.create_task(worker_a.do("lyrics:cross", loader))
+        await started.wait()
+        second = await worker_b.do("lyrics:cross", loader)
+
+        assert await first == {"value": "shared"}
+        assert second == {"value": "shared"}
+        assert calls == 1
+
+    @pytest.mark.asyncio
+    async def test_refresh_runs_once_per_key(self):
+        """Test that background refreshes are deduplicated per key."""
+        flight = SingleFlight(lock_ttl=5.0, wait_timeout=5.0)
+        calls = 0
+
+        async def loader() -> dict:
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.02)
+            return {"v": calls}
+
+        for _ in range(10):
+            flight.refresh("lyrics:stale", loader)
+        await asyncio.sleep(0.05)
+
+        assert calls == 1
+
+    @pytest.mark.asyncio
+    async def test_refresh_failure_is_swallowed(self):
+        """Test that a failing background refresh does not raise."""
+        flight = SingleFlight(lock_ttl=5.0, wait_timeout=5.0)
+
+        async def failing() -> dict:
+            raise RuntimeError("upstream down")
+
+        flight.refresh("lyrics:stale", failing)
+        task = flight._refreshing["lyrics:stale"]
+        await asyncio.gather(task, return_exceptions=True)
+        await asyncio.sleep(0)
+
+        assert "lyrics:stale" not in flight._refreshing
@@ -0,0 +1,146 @@
+import asyncio
+
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from app.models.track import Album, Artist, Track
+from app.services.suggest import SuggestIndex, suggest_index
+
+
+def make_track(track_id, name, artist="Artist"):
+    return Track(
+        id=track_id,
+        name=name,
+        artists=[Artist(id="a", name=artist)],
+        album=Album(id=track_id, name=name, images=[]),
+    )
+
+
+def names(suggestions):
+    return [s.name for s in suggestions]
+
+
+class TestSuggestIndex:
+    """Tests for the in-memory prefix index."""
+
+    def test_prefix_on_title_and_artist(self):
+        """Test that a track is found by title prefix and by 'artist title' prefix."""
+        index = SuggestIndex(max_tracks=100, snapshot_path="unused", snapshot_interval=60)
+        index.add_tracks([make_track("1", "Bohemian Rhapsody", "Queen"), make_track("2", "Bad Guy", "Billie Eilish")])
+
+        assert names(index.suggest("boh", 5)) == ["Bohemian Rhapsody"]
+        assert names(index.suggest("queen bo", 5)) == ["Bohemian Rhapsody"]
+        assert set(names(index.suggest("b", 5))) == {"Bad Guy", "Bohemian Rhapsody"}
+        assert index.suggest("zzz", 5) == []
+
+    def test_normalized_matching(self):
+        """Test case, accent and whitespace insensitivity."""
+        index = SuggestIndex(max_tracks=100, snapshot_path="unused", snapshot_interval=60)
+        index.add_tracks([make_track("1", "Déjà  Vu", "Olivia Rodrigo")])
+
+        assert names(index.suggest("  DEJA v", 5)) == ["Déjà  Vu"]
+
+    def test_popularity_ranking(self):
+        """Test that tracks seen more often and with more pageviews rank first."""
+        index = SuggestIndex(max_tracks=100, snapshot_path="unused", snapshot_interval=60)
+        rare, common, viral = make_track("1", "Love Rare"), make_track("2", "Love Common"), make_track("3", "Love Viral")
+        index.add_tracks([rare, common, viral], [{}, {}, {"stats": {"pageviews": 10_000_000}}])
+        index.add_tracks([common])
+
+        assert names(index.suggest("love", 3)) == ["Love Viral", "Love Common", "Love Rare"]
+
+    def test_popular_term_beyond_alphabetical_candidates(self):
+        """Test that ranking covers the whole prefix range, not only the first alphabetical matches."""
+        index = SuggestIndex(max_tracks=1000, snapshot_path="unused", snapshot_interval=60)
+        index.add_tracks([make_track(str(i), f"Love {i:04d}") for i in range(400)])
+        assert names(index.suggest("l", 1)) != ["Love Zzz"]
+        hit = make_track("hit", "Love Zzz")
+        index.add_tracks([hit], [{"stats": {"pageviews": 10_000_000}}])
+
+        assert names(index.suggest("l", 1)) == ["Love Zzz"]
+        assert names(index.suggest("love", 3))[0] == "Love Zzz"
+
+    @pytest.mark.asyncio
+    async def test_concurrent_snapshots_use_distinct_temp_files(self, tmp_path):
+        """Test that two workers saving at the same time never leave a partial snapshot."""
+        path = tmp_path / "suggest.json"
+        workers = [SuggestIndex(max_tracks=100, snapshot_path=path, snapshot_interval=60) for _ in range(2)]
+        for i, worker in enumerate(workers):
+            worker.add_tracks([make_track(str(j), f"Song {i} {j}") for j in range(50)])
+
+        await asyncio.gather(*(asyncio.to_thread(w._write_snapshot, [[str(j), "x", "y", None, 1, 0] for j in range(5000)]) for w in workers))
+
+        loaded = SuggestIndex(max_tracks=10_000, snapshot_path=path, snapshot_interval=60)
+        await loaded.start()
+        await loaded.close()
+        assert len(loaded) == 5000
+        assert list(tmp_path.glob("*.tmp")) == []
+
+    def test_renamed_track_reindexed(self):
+        """Test that a changed title replaces the old terms."""
+        index = SuggestIndex(max_tracks=100, snapshot_path="unused", snapshot_interval=60)
+        index.add_tracks([make_track("1", "Old Name")])
+        index.add_tracks([make_track("1", "New Name")])
+
+        assert index.suggest("old", 5) == []
+        assert names(index.suggest("new", 5)) == ["New Name"]
+        assert len(index._terms) == 2
+
+    def test_bounded_size(self):
+        """Test that the least popular tracks are evicted past max_tracks."""
+        index = SuggestIndex(max_tracks=10, snapshot_path="unused", snapshot_interval=60)
+        index.add_tracks([make_track("keep", "Keep")] * 3)
+        index.add_tracks([make_track(str(i), f"Song {i}") for i in range(20)])
+
+        assert len(index) <= 10
+        assert names(index.suggest("keep", 1)) == ["Keep"]
+        assert len(index._terms) == len({term for term in index._terms})
+
+    @pytest.mark.asyncio
+    async def test_snapshot_round_trip(self, tmp_path):
+        """Test that a restart warms up from the disk snapshot."""
+        path = tmp_path / "suggest.json"
+        index = SuggestIndex(max_tracks=100, snapshot_path=path, snapshot_interval=60)
+        index.add_tracks([make_track("1", "Snapshot Song")])
+        await index.snapshot()
+
+        restarted = SuggestIndex(max_tracks=100, snapshot_path=path, snapshot_interval=60)
+        await restarted.start()
+        await restarted.close()
+
+        assert names(restarted.suggest("snap", 5)) == ["Snapshot Song"]
+        assert restarted._tracks["1"].seen == 1
+
+
+class TestSuggestEndpoint:
+    """Tests for /api/search/suggest endpoint."""
+
+    @pytest.mark.asyncio
+    async def test_fed_by_search_results(self, async_client):
+        """Test that tracks from a Genius search become suggestions without further upstream calls."""
+        genius_result = {
+            "id": 42,
+            "title": "Midnight City",
+            "artist_names": "M83",
+            "primary_artist": {"id": 1, "name": "M83"},
+            "song_art_image_url": "https://images.genius.com/art.jpg",
+            "stats": {"pageviews": 1000},
+        }
+        with patch("app.api.search.genius_client") as mock_genius:
+            mock_genius.search_songs = AsyncMock(return_value=[genius_result])
+            await async_client.get("/api/search", params={"q": "midnight"})
+
+            response = await async_client.get("/api/search/suggest", params={"q": "midn"})
+            assert mock_genius.search_songs.call_count == 1
+
+        assert response.status_code == 200
+        assert response.json() == {
+            "query": "midn",
+            "suggestions": [{
+                "id": "42",
+                "name": "Midnight City",
+                "artist": "M83",
+                "artwork_url": "https://images.genius.com/art.jpg",
+            }],
+        }
+        assert len(suggest_index) == 1
@@ -0,0 +1,157 @@
+import asyncio
+import pstats
+from unittest.mock import patch
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.middleware import ProfilingMiddleware
+from app.services.http import HttpClientRegistry
+from app.services.timing import RequestProfiler, RequestTimings, current_timings, span
+
+
+def server_timing(response: httpx.Response) -> dict[str, str]:
+    """Parse a Server-Timing header into {name: params}."""
+    entries = {}
+    for part in response.headers["server-timing"].split(","):
+        name, _, params = part.strip().partition(";")
+        entries[name] = params
+    return entries
+
+
+@pytest.fixture
+def lrclib_transport(mock_lrclib_response):
+    """Serve lrclib /search from a mock transport."""
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json=[mock_lrclib_response])
+
+    registry = HttpClientRegistry()
+    registry.register("lrclib", timeout=5.0, transport=httpx.MockTransport(handler))
+    with patch("app.services.lrclib.http_clients", registry):
+        yield
+
+
+class TestSpans:
+    """Tests for request timing spans."""
+
+    def test_spans_accumulate(self):
+        """Test that repeated spans of one stage are summed and counted."""
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        try:
+            for _ in range(3):
+                with span("redis"):
+                    pass
+            with span("parse"):
+                pass
+        finally:
+            current_timings.reset(token)
+
+        assert timings.spans["redis"][1] == 3
+        header = timings.header()
+        assert header.startswith("redis;dur=")
+        assert 'desc="3 calls"' in header
+        assert "parse;dur=" in header
+        assert "total;dur=" in header
+
+    def test_span_outside_request_is_noop(self):
+        """Test that spans without a current request record nothing."""
+        with span("redis"):
+            pass
+
+        assert current_timings.get() is None
+
+
+class TestServerTimingHeader:
+    """Tests for the Server-Timing response header."""
+
+    @pytest.mark.asyncio
+    async def test_lyrics_miss_breakdown(self, async_client, lrclib_transport):
+        """Test that a cache miss reports Redis, lrclib, parsing and serialization."""
+        response = await async_client.get("/api/lyrics", params={"track": "Test Song", "artist": "Test Artist"})
+
+        assert response.status_code == 200
+        entries = server_timing(response)
+        assert {"redis", "lrclib", "parse", "serialize", "total"} <= set(entries)
+        assert all(params.startswith("dur=") for params in entries.values())
+
+    @pytest.mark.asyncio
+    async def test_lyrics_hit_has_no_upstream(self, async_client, lrclib_transport):
+        """Test that a cache hit reports no upstream call."""
+        params = {"track": "Test Song", "artist": "Test Artist"}
+        await async_client.get("/api/lyrics", params=params)
+
+        response = await async_client.get("/api/lyrics", params=params)
+
+        assert response.headers["X-Cache"] == "HIT"
+        assert "lrclib" not in server_timing(response)
+
+    def test_disabled(self, client):
+        """Test that the header can be turned off."""
+        with patch("app.api.middleware.settings.server_timing_enabled", False):
+            response = client.get("/api/health")
+
+        assert "server-timing" not in response.headers
+
+
+class TestRequestProfiler:
+    """Tests for opt-in request profiling."""
+
+    def test_header_requires_admin_token(self, tmp_path):
+        """Test that X-Profile only triggers with the admin token."""
+        profiler = RequestProfiler(tmp_path, sample_rate=0, token="secret", max_files=10)
+
+        assert profiler.wanted([(b"x-profile", b"secret")])
+        assert not profiler.wanted([(b"x-profile", b"guess")])
+        assert not profiler.wanted([])
+        assert not RequestProfiler(tmp_path, sample_rate=0, token="", max_files=10).enabled
+
+    def test_sample_rate(self, tmp_path):
+        """Test random sampling without any header."""
+        assert RequestProfiler(tmp_path, sample_rate=1, token="", max_files=10).wanted([])
+        assert not RequestProfiler(tmp_path, sample_rate=0, token="secret", max_files=10).wanted([])
+
+    def test_one_profile_at_a_time(self, tmp_path):
+        """Test that a second profile is refused while one is running."""
+        profiler = RequestProfiler(tmp_path, sample_rate=1, token="", max_files=10)
+        profile = profiler.start()
+        try:
+            assert profile is not None
+            assert profiler.start() is None
+        finally:
+            profiler.stop(profile)
+
+        profiler.stop(profiler.start())
+
+    def test_profiled_request_written(self, tmp_path):
+        """Test that a requested profile is written as a pstats file."""
+        app = FastAPI()
+
+        @app.get("/api/slow")
+        async def slow():
+            await asyncio.sleep(0.01)
+            return {"ok": True}
+
+        profiler = RequestProfiler(tmp_path, sample_rate=0, token="secret", max_files=10)
+        client = TestClient(ProfilingMiddleware(app, profiler))
+        client.get("/api/slow", headers={"X-Profile": "secret"})
+        client.get("/api/slow")
+
+        files = list(tmp_path.glob("*.prof"))
+        assert len(files) == 1
+        assert "GET-api_slow" in files[0].name
+        assert pstats.Stats(str(files[0])).total_calls > 0
+
+    @pytest.mark.asyncio
+    async def test_keeps_most_recent_files(self, tmp_path):
+        """Test that old profiles are removed beyond max_files."""
+        profiler = RequestProfiler(tmp_path, sample_rate=1, token="", max_files=2)
+        for i in range(4):
+            profile = profiler.start()
+            await asyncio.sleep(0)
+            profiler.stop(profile)
+            await profiler.save(profile, "GET", f"/api/{i}", 0.01)
+
+        assert len(list(tmp_path.glob("*.prof"))) == 2